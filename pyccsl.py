@@ -13,13 +13,29 @@ Exit Codes:
 """
 
 import sys
+import io
 import json
 import os
 import subprocess
+import select
+import threading
+import hashlib
+import time
+import zlib
+import math
+import array
+import heapq
+import mmap
+import contextlib
 from datetime import datetime, timedelta
 import argparse
 
-__version__ = "0.9.36"
+try:
+    import fcntl
+except ImportError:  # Windows - no advisory locking, atomic renames still apply
+    fcntl = None
+
+__version__ = "0.10.0"
 
 # Pricing data embedded from https://docs.anthropic.com/en/docs/about-claude/pricing
 # All prices in USD per million tokens
@@ -215,17 +231,33 @@ def get_field_color(field, theme_colors):
     elif field in ["git"]:
         return theme_colors.get("git")
     elif field in ["model", "perf-cache-rate", "perf-response-time", 
+                   "perf-response-p50", "perf-response-p95",
                    "perf-session-time", "perf-message-count",
-                   "perf-all-metrics"]:
+                   "perf-throughput", "perf-slowest-tool", "perf-subagents", "perf-all-metrics",
+                   "cache-ttl", "cache-breaks"]:
         return theme_colors.get("model")
     elif field in ["input"]:
         return theme_colors.get("input")
-    elif field in ["output", "tokens"]:
+    elif field in ["output", "tokens", "window-tokens"]:
         return theme_colors.get("output")
-    elif field in ["cost"]:
+    elif field in ["cost", "subagent-cost", "spend-today"]:
         return theme_colors.get("cost")
+    elif field in PLUGIN_FIELDS and PLUGIN_FIELDS[field]["color"]:
+        return theme_colors.get(PLUGIN_FIELDS[field]["color"])
     return None
 
+def get_cache_ttl_color(metrics):
+    """Return the cache-ttl field's urgency color: green, yellow, orange as expiry nears, red once expired."""
+    remaining = metrics["cache_expires_at"] - time.time()
+    fraction = remaining / metrics["cache_ttl"]
+    if fraction > 0.5:
+        return 82
+    elif fraction > 0.2:
+        return 220
+    elif remaining > 0:
+        return 208
+    return 196
+
 # Default field list
 DEFAULT_FIELDS = ["badge", "folder", "git", "model", "tokens", "cost"]
 
@@ -237,13 +269,23 @@ FIELD_ORDER = [
     "model",
     "perf-cache-rate",
     "perf-response-time",
+    "perf-response-p50",
+    "perf-response-p95",
     "perf-session-time",
     "perf-message-count",
+    "perf-throughput",
+    "perf-slowest-tool",
+    "perf-subagents",
     "perf-all-metrics",
+    "cache-ttl",
+    "cache-breaks",
     "input",
     "output",
     "tokens",
-    "cost"
+    "cost",
+    "subagent-cost",
+    "spend-today",
+    "window-tokens"
 ]
 
 def parse_env_file(filepath):
@@ -292,11 +334,26 @@ def parse_env_file(filepath):
     
     return env_vars
 
-def parse_arguments():
-    """Parse command-line arguments."""
-    # Debug: print raw sys.argv
-    if "--debug" in sys.argv:
-        sys.stderr.write(f"DEBUG: sys.argv = {sys.argv}\n")
+# Response time statistics the badge can be driven by (--perf-response prefix) and their metric keys
+RESPONSE_STATS = {
+    "mean": "avg_response_time",
+    "p50": "response_p50",
+    "p95": "response_p95",
+    "p99": "response_p99"
+}
+
+def parse_arguments(argv=None):
+    """Parse command-line arguments.
+    
+    Args:
+        argv: Argument list (default: sys.argv[1:])
+    """
+    if argv is None:
+        argv = sys.argv[1:]
+    
+    # Debug: print raw arguments
+    if "--debug" in argv:
+        sys.stderr.write(f"DEBUG: argv = {argv}\n")
     
     parser = argparse.ArgumentParser(
         description="Claude Code status line generator",
@@ -360,7 +417,109 @@ def parse_arguments():
     parser.add_argument(
         "--perf-response",
         default=os.environ.get("PYCCSL_PERF_RESPONSE", "10,30,60"),
-        help="Response time thresholds (green,yellow,orange) (default: 10,30,60)"
+        help="Response time thresholds [mean|p50|p95|p99:]green,yellow,orange (default: 10,30,60)"
+    )
+    
+    # Performance thresholds - output throughput (optional third badge input)
+    parser.add_argument(
+        "--perf-throughput",
+        default=os.environ.get("PYCCSL_PERF_THROUGHPUT", ""),
+        help="Output tokens/sec thresholds (green,yellow,orange) also driving the badge (default: not used)"
+    )
+    
+    # Watch mode - follow transcript and git index, keep status file current
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Watch transcript and git index, re-render into the session status file on change"
+    )
+    
+    # Watch poll/wake-up interval
+    parser.add_argument(
+        "--watch-interval",
+        default=os.environ.get("PYCCSL_WATCH_INTERVAL", "1.0"),
+        help="Watch mode wake-up interval in seconds (default: 1.0)"
+    )
+    
+    # Debounce window for repeated renders of the same session
+    parser.add_argument(
+        "--debounce-ms",
+        default=os.environ.get("PYCCSL_DEBOUNCE_MS", "0"),
+        help="Reuse a render of the same session with unchanged inputs if it finished within this many ms (default: 0, off)"
+    )
+    
+    # Overall latency budget
+    parser.add_argument(
+        "--deadline-ms",
+        default=os.environ.get("PYCCSL_DEADLINE_MS", "0"),
+        help="Render within this many ms, using cached or placeholder values for late providers (default: 0, off)"
+    )
+    
+    # Fields rendered from cache while a background worker recomputes them
+    parser.add_argument(
+        "--async-fields",
+        default=os.environ.get("PYCCSL_ASYNC_FIELDS", ""),
+        help="Comma-separated fields (or 'all') shown from cache and recomputed in the background (default: none)"
+    )
+    
+    # Background worker cap
+    parser.add_argument(
+        "--async-workers",
+        default=os.environ.get("PYCCSL_ASYNC_WORKERS", "1"),
+        help="Maximum concurrent background workers per session (default: 1)"
+    )
+    
+    # Sampled estimates for huge transcripts that are not yet ingested
+    parser.add_argument(
+        "--approximate-mb",
+        default=os.environ.get("PYCCSL_APPROXIMATE_MB", "0"),
+        help="Estimate transcript metrics by sampling when at least this many MB are not yet ingested (default: 0, off)"
+    )
+    
+    # Batch mode - one payload per stdin line
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Read one JSON payload per stdin line and write one result per line"
+    )
+    
+    # Batch worker processes
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Worker processes for --batch (default: 1)"
+    )
+    
+    # Output format
+    parser.add_argument(
+        "--format",
+        choices=["text", "json", "both"],
+        default=os.environ.get("PYCCSL_FORMAT", "text"),
+        help="Output the rendered line, a JSON object with every metric, or both (line first) (default: text)"
+    )
+    
+    # Record payloads for later replay
+    parser.add_argument(
+        "--record",
+        metavar="DIR",
+        default=os.environ.get("PYCCSL_RECORD_DIR"),
+        help="Record each payload with transcript length and git state into DIR (for 'replay')"
+    )
+    
+    # OpenMetrics textfile export
+    parser.add_argument(
+        "--metrics-dir",
+        metavar="DIR",
+        default=os.environ.get("PYCCSL_METRICS_DIR"),
+        help="Write session metrics as OpenMetrics textfiles into DIR (node_exporter textfile collector)"
+    )
+    
+    # Minimum seconds between textfile exports per session
+    parser.add_argument(
+        "--metrics-interval",
+        default=os.environ.get("PYCCSL_METRICS_INTERVAL", "30"),
+        help="Minimum seconds between metrics exports of a session (default: 30)"
     )
     
     # Fields to display (positional argument)
@@ -371,7 +530,7 @@ def parse_arguments():
         help="Comma-separated list of fields to display"
     )
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     
     # Load environment file if specified
     env_vars = {}
@@ -394,8 +553,33 @@ def parse_arguments():
         args.perf_cache = env_vars['PYCCSL_PERF_CACHE']
     if 'PYCCSL_PERF_RESPONSE' in env_vars:
         args.perf_response = env_vars['PYCCSL_PERF_RESPONSE']
+    if 'PYCCSL_PERF_THROUGHPUT' in env_vars:
+        args.perf_throughput = env_vars['PYCCSL_PERF_THROUGHPUT']
     if 'PYCCSL_FIELDS' in env_vars:
         args.fields = env_vars['PYCCSL_FIELDS']
+    if 'PYCCSL_WATCH_INTERVAL' in env_vars:
+        args.watch_interval = env_vars['PYCCSL_WATCH_INTERVAL']
+    if 'PYCCSL_DEBOUNCE_MS' in env_vars:
+        args.debounce_ms = env_vars['PYCCSL_DEBOUNCE_MS']
+    if 'PYCCSL_DEADLINE_MS' in env_vars:
+        args.deadline_ms = env_vars['PYCCSL_DEADLINE_MS']
+    if 'PYCCSL_ASYNC_FIELDS' in env_vars:
+        args.async_fields = env_vars['PYCCSL_ASYNC_FIELDS']
+    if 'PYCCSL_ASYNC_WORKERS' in env_vars:
+        args.async_workers = env_vars['PYCCSL_ASYNC_WORKERS']
+    if 'PYCCSL_APPROXIMATE_MB' in env_vars:
+        args.approximate_mb = env_vars['PYCCSL_APPROXIMATE_MB']
+    if 'PYCCSL_FORMAT' in env_vars:
+        args.format = env_vars['PYCCSL_FORMAT']
+    if 'PYCCSL_RECORD_DIR' in env_vars:
+        args.record = env_vars['PYCCSL_RECORD_DIR']
+    if os.environ.get("PYCCSL_REPLAY"):
+        # Calls re-run by 'replay' must not append to the recording being replayed
+        args.record = None
+    if 'PYCCSL_METRICS_DIR' in env_vars:
+        args.metrics_dir = env_vars['PYCCSL_METRICS_DIR']
+    if 'PYCCSL_METRICS_INTERVAL' in env_vars:
+        args.metrics_interval = env_vars['PYCCSL_METRICS_INTERVAL']
     
     # Parse fields
     if args.fields:
@@ -403,14 +587,18 @@ def parse_arguments():
         fields = [f.strip() for f in args.fields.split(",") if f.strip()]
         # If all fields were empty/whitespace, use defaults
         if not fields:
-            if "--debug" in sys.argv:
+            if "--debug" in argv:
                 sys.stderr.write(f"DEBUG: Empty fields specified, using defaults\n")
             fields = DEFAULT_FIELDS.copy()
     else:
-        if "--debug" in sys.argv:
+        if "--debug" in argv:
             sys.stderr.write(f"DEBUG: No fields specified, using defaults\n")
         fields = DEFAULT_FIELDS.copy()
     
+    if any(field not in FIELD_ORDER for field in fields):
+        # Only look for plugins when a field is not built in
+        load_plugins(debug=args.debug)
+    
     # Parse threshold values
     try:
         cache_thresholds = [float(x) for x in args.perf_cache.split(",")]
@@ -421,13 +609,78 @@ def parse_arguments():
         sys.exit(1)
     
     try:
-        response_thresholds = [float(x) for x in args.perf_response.split(",")]
+        # Optional statistic prefix, e.g. "p95:20,60,120"
+        response_stat, _, response_values = args.perf_response.rpartition(":")
+        response_stat = response_stat or "mean"
+        if response_stat not in RESPONSE_STATS:
+            raise ValueError(f"Unknown response statistic: {response_stat}")
+        response_thresholds = [float(x) for x in response_values.split(",")]
         if len(response_thresholds) != 3:
             raise ValueError("Need exactly 3 response thresholds")
     except (ValueError, AttributeError):
-        print("Error: Invalid response thresholds format. Expected: three comma-separated numbers (e.g., 3,5,8)", file=sys.stderr)
+        print("Error: Invalid response thresholds format. Expected: [mean|p50|p95|p99:]three comma-separated numbers (e.g., 3,5,8 or p95:10,30,60)", file=sys.stderr)
+        sys.exit(1)
+    
+    throughput_thresholds = None
+    if args.perf_throughput:
+        try:
+            throughput_thresholds = [float(x) for x in args.perf_throughput.split(",")]
+            if len(throughput_thresholds) != 3:
+                raise ValueError("Need exactly 3 throughput thresholds")
+        except (ValueError, AttributeError):
+            print("Error: Invalid throughput thresholds format. Expected: three comma-separated numbers (e.g., 60,40,20)", file=sys.stderr)
+            sys.exit(1)
+    
+    try:
+        watch_interval = float(args.watch_interval)
+        if watch_interval <= 0:
+            raise ValueError("Watch interval must be positive")
+    except (ValueError, TypeError):
+        print("Error: Invalid watch interval. Expected a positive number of seconds (e.g., 0.5)", file=sys.stderr)
+        sys.exit(1)
+    
+    try:
+        debounce_ms = float(args.debounce_ms)
+        if debounce_ms < 0:
+            raise ValueError("Debounce must not be negative")
+    except (ValueError, TypeError):
+        print("Error: Invalid debounce. Expected a non-negative number of milliseconds (e.g., 300)", file=sys.stderr)
+        sys.exit(1)
+    
+    try:
+        metrics_interval = float(args.metrics_interval)
+        if metrics_interval < 0:
+            raise ValueError("Metrics interval must not be negative")
+    except (ValueError, TypeError):
+        print("Error: Invalid metrics interval. Expected a non-negative number of seconds (e.g., 30)", file=sys.stderr)
         sys.exit(1)
     
+    try:
+        deadline_ms = float(args.deadline_ms)
+        if deadline_ms < 0:
+            raise ValueError("Deadline must not be negative")
+    except (ValueError, TypeError):
+        print("Error: Invalid deadline. Expected a non-negative number of milliseconds (e.g., 150)", file=sys.stderr)
+        sys.exit(1)
+    
+    try:
+        async_workers = int(args.async_workers)
+        if async_workers < 1:
+            raise ValueError("Need at least one worker")
+    except (ValueError, TypeError):
+        print("Error: Invalid async workers. Expected a positive integer (e.g., 2)", file=sys.stderr)
+        sys.exit(1)
+    
+    try:
+        approximate_mb = float(args.approximate_mb)
+        if approximate_mb < 0:
+            raise ValueError("Threshold must not be negative")
+    except (ValueError, TypeError):
+        print("Error: Invalid approximate threshold. Expected a non-negative number of MB (e.g., 100)", file=sys.stderr)
+        sys.exit(1)
+    
+    async_fields = [f.strip() for f in args.async_fields.split(",") if f.strip()]
+    
     return {
         "theme": args.theme,
         "numbers": args.numbers,
@@ -436,7 +689,23 @@ def parse_arguments():
         "debug": args.debug,
         "cache_thresholds": cache_thresholds,
         "response_thresholds": response_thresholds,
-        "fields": fields
+        "response_stat": response_stat,
+        "throughput_thresholds": throughput_thresholds,
+        "fields": fields,
+        "env": args.env,
+        "watch": args.watch,
+        "watch_interval": watch_interval,
+        "debounce_ms": debounce_ms,
+        "deadline_ms": deadline_ms,
+        "async_fields": async_fields,
+        "async_workers": async_workers,
+        "approximate_mb": approximate_mb,
+        "batch": args.batch,
+        "jobs": max(1, args.jobs),
+        "format": args.format,
+        "record_dir": args.record,
+        "metrics_dir": args.metrics_dir,
+        "metrics_interval": metrics_interval
     }
 
 def read_input():
@@ -481,12 +750,16 @@ def extract_model_info(data):
     except Exception:
         return {"display_name": "Unknown", "id": None}
 
-def extract_git_status(input_data):
+def extract_git_status(input_data, debug=False):
     """Extract git status information from the current directory.
     
     Returns a dict with:
     - branch: Current branch name or None
     - modified_count: Number of modified/staged files or 0
+    - ahead, behind: Commits ahead of/behind the upstream, or None
+    - stash_count: Number of stash entries
+    - operation: In-progress rebase/merge/etc. label or None
+    - rebase_branch: Branch being rebased (HEAD is detached meanwhile) or None
     """
     try:
         # Get working directory from input or use current
@@ -521,7 +794,16 @@ def extract_git_status(input_data):
         if status_result.returncode == 0:
             modified_count = len([line for line in status_result.stdout.splitlines() if line.strip()])
         
-        return {"branch": branch, "modified_count": modified_count}
+        git_info = {"branch": branch, "modified_count": modified_count}
+        # The rest is read from .git directly rather than by more git calls; if that
+        # fails, branch and file count are still worth showing
+        try:
+            git_info.update(read_git_extras(cwd, debug))
+        except Exception as e:
+            if debug:
+                sys.stderr.write(f"DEBUG: Cannot read git extras: {e}\n")
+            git_info.update(GIT_EXTRAS_DEFAULTS)
+        return git_info
         
     except (subprocess.TimeoutExpired, FileNotFoundError):
         # Git not available or timeout
@@ -542,6 +824,9 @@ def get_model_pricing(model_id):
 def load_transcript(transcript_path, debug=False):
     """Load and parse a Claude Code transcript JSONL file.
     
+    Compressed transcripts (.jsonl.gz, .jsonl.bz2, .jsonl.xz, .jsonl.zst)
+    are decompressed transparently.
+    
     Args:
         transcript_path: Path to the transcript file
         debug: Whether to output debug information
@@ -561,7 +846,7 @@ def load_transcript(transcript_path, debug=False):
     
     try:
         entries = []
-        with open(transcript_path, 'r', encoding='utf-8') as f:
+        with io.TextIOWrapper(open_transcript_stream(transcript_path), encoding='utf-8') as f:
             for line_num, line in enumerate(f, 1):
                 line = line.strip()
                 if not line:
@@ -602,32 +887,10 @@ def calculate_token_usage(transcript_entries):
         Dict with token totals: input_tokens, output_tokens, 
         cache_creation_tokens, cache_read_tokens
     """
-    totals = {
-        "input_tokens": 0,
-        "output_tokens": 0,
-        "cache_creation_tokens": 0,
-        "cache_read_tokens": 0
-    }
-    
+    state = new_transcript_state()
     for entry in transcript_entries:
-        usage = None
-        
-        # Check for usage in assistant messages
-        if entry.get("type") == "assistant" and "message" in entry:
-            usage = entry["message"].get("usage", {})
-        
-        # Check for usage in tool use results (only if it's a dict)
-        elif "toolUseResult" in entry and isinstance(entry["toolUseResult"], dict):
-            usage = entry["toolUseResult"].get("usage", {})
-        
-        if usage:
-            # Add tokens to totals
-            totals["input_tokens"] += usage.get("input_tokens", 0)
-            totals["output_tokens"] += usage.get("output_tokens", 0)
-            totals["cache_creation_tokens"] += usage.get("cache_creation_input_tokens", 0)
-            totals["cache_read_tokens"] += usage.get("cache_read_input_tokens", 0)
-    
-    return totals
+        ingest_transcript_entry(state, entry)
+    return dict(state["tokens"])
 
 def get_model_from_transcript(transcript_entries):
     """Extract the model ID from transcript entries.
@@ -672,87 +935,811 @@ def calculate_cost_per_entry(usage, model_id):
     
     return cost
 
-def calculate_total_cost(transcript_entries, debug=False):
-    """Calculate total session cost by summing per-entry costs using each entry's model.
+def percentile(sorted_values, q):
+    """Return the q-th quantile (0-1) of an ascending list by linear interpolation."""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+def p2_new(quantile):
+    """Create the state of a P² streaming quantile estimator (Jain & Chlamtac, 1985).
+    
+    The estimator tracks one quantile with five markers, so its memory is
+    constant no matter how many observations are added. The state is a
+    plain dict so it can be persisted with the transcript checkpoint.
     
     Args:
-        transcript_entries: List of parsed transcript entries
+        quantile: Quantile to estimate (0-1), e.g. 0.95
+    """
+    return {
+        "q": quantile,
+        "count": 0,
+        "heights": [],
+        "positions": [1, 2, 3, 4, 5],
+        "desired": [1, 1 + 2 * quantile, 1 + 4 * quantile, 3 + 2 * quantile, 5],
+        "increments": [0, quantile / 2, quantile, (1 + quantile) / 2, 1]
+    }
+
+def p2_add(state, value):
+    """Add one observation to a P² estimator state."""
+    heights = state["heights"]
+    state["count"] += 1
+    if state["count"] <= 5:
+        heights.append(value)
+        heights.sort()
+        return
+    
+    # Find the cell containing the value, extending the extremes if needed
+    if value < heights[0]:
+        heights[0] = value
+        cell = 0
+    elif value >= heights[4]:
+        heights[4] = value
+        cell = 3
+    else:
+        cell = 0
+        while cell < 3 and value >= heights[cell + 1]:
+            cell += 1
+    
+    positions = state["positions"]
+    desired = state["desired"]
+    for i in range(cell + 1, 5):
+        positions[i] += 1
+    for i in range(5):
+        desired[i] += state["increments"][i]
+    
+    # Move the middle markers toward their desired positions
+    for i in (1, 2, 3):
+        offset = desired[i] - positions[i]
+        if (offset >= 1 and positions[i + 1] - positions[i] > 1) or \
+           (offset <= -1 and positions[i - 1] - positions[i] < -1):
+            step = 1 if offset > 0 else -1
+            # Piecewise-parabolic prediction, falling back to linear
+            candidate = heights[i] + step / (positions[i + 1] - positions[i - 1]) * (
+                (positions[i] - positions[i - 1] + step) * (heights[i + 1] - heights[i]) / (positions[i + 1] - positions[i]) +
+                (positions[i + 1] - positions[i] - step) * (heights[i] - heights[i - 1]) / (positions[i] - positions[i - 1])
+            )
+            if not heights[i - 1] < candidate < heights[i + 1]:
+                candidate = heights[i] + step * (heights[i + step] - heights[i]) / (positions[i + step] - positions[i])
+            heights[i] = candidate
+            positions[i] += step
+
+def p2_value(state):
+    """Return the current quantile estimate (exact for five or fewer observations)."""
+    if state["count"] == 0:
+        return 0.0
+    if state["count"] <= 5:
+        return percentile(state["heights"], state["q"])
+    return state["heights"][2]
+
+# Bump when the transcript state layout changes; older checkpoints are rebuilt
+TRANSCRIPT_STATE_VERSION = 6
+
+# Assistant uuid -> model entries kept for attributing tool results to their parent's model
+RECENT_MODEL_LIMIT = 64
+
+# Bytes at the start of the transcript hashed to detect a rewritten file
+TRANSCRIPT_HEAD_BYTES = 1024
+
+# Response times outside (0, RESPONSE_TIME_LIMIT) seconds are treated as idle gaps, not responses
+RESPONSE_TIME_LIMIT = 300
+
+# Prompt cache lifetimes: the default 5-minute cache and the extended 1-hour cache
+PROMPT_CACHE_TTL = 300
+PROMPT_CACHE_TTL_EXTENDED = 3600
+
+# A cache break needs at least this many previously cached tokens, of which less than
+# CACHE_BREAK_READ_FRACTION are read back
+CACHE_BREAK_MIN_TOKENS = 2048
+CACHE_BREAK_READ_FRACTION = 0.5
+
+# Most recent cache breaks kept in the state for the report
+CACHE_BREAK_LOG_LIMIT = 100
+
+# Turns in the recent output throughput window
+THROUGHPUT_WINDOW = 10
+
+# Assistant entries with unanswered tool calls kept for pairing, tool runs in the recent
+# window, and the longest tool run (seconds) that is not treated as an abandoned call
+PENDING_TOOL_LIMIT = 64
+TOOL_WINDOW = 20
+TOOL_TIME_LIMIT = 3600
+
+# Tools that run a subagent, sidechain uuid -> subagent entries kept to follow each
+# subagent's chain, and subagents whose last input time is remembered
+SUBAGENT_TOOLS = ("Task", "Agent")
+SIDECHAIN_UUID_LIMIT = 256
+SUBAGENT_CHAIN_LIMIT = 64
+
+def new_transcript_state():
+    """Create an empty incremental transcript state.
+    
+    The state holds only compact aggregates (token totals, per-model cost,
+    timing sums and quantile sketches), never the entries themselves, and
+    is JSON-serializable so it can be checkpointed between invocations.
+    """
+    return {
+        "version": TRANSCRIPT_STATE_VERSION,
+        "offset": 0,
+        "inode": None,
+        "head_length": 0,
+        "head_hash": None,
+        "lines": 0,
+        "entries": 0,
+        "tokens": {
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "cache_creation_tokens": 0,
+            "cache_read_tokens": 0
+        },
+        "cost": 0.0,
+        "model_costs": {},
+        "first_model_id": None,
+        "last_model_id": None,
+        "recent_models": {},
+        "first_time": None,
+        "last_time": None,
+        "timestamp_count": 0,
+        "message_count": 0,
+        "last_user_time": None,
+        "response_count": 0,
+        "response_total": 0.0,
+        "response_quantiles": {
+            "p50": p2_new(0.50),
+            "p95": p2_new(0.95),
+            "p99": p2_new(0.99)
+        },
+        "throughput_message_id": None,
+        "throughput_tokens": 0,
+        "throughput_seconds": 0.0,
+        "throughput_recent": [],
+        "pending_tools": {},
+        "tools": {},
+        "tool_recent": [],
+        "cache_context": None,
+        "cache_breaks": 0,
+        "cache_break_tokens": 0,
+        "cache_break_cost": 0.0,
+        "cache_break_log": [],
+        "sidechain_tokens": {
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "cache_creation_tokens": 0,
+            "cache_read_tokens": 0
+        },
+        "sidechain_cost": 0.0,
+        "sidechain_chains": {},
+        "chain_input_times": {},
+        "main_response_count": 0,
+        "main_response_total": 0.0,
+        "sidechain_response_count": 0,
+        "sidechain_response_total": 0.0,
+        "subagent_chains": 0,
+        "subagent_calls": 0,
+        "active_subagents": {},
+        "peak_subagents": 0,
+        "subagent_run_count": 0,
+        "subagent_run_total": 0.0,
+        "daily": {},
+        "hourly": {},
+        "rollup_offset": 0
+    }
+
+def get_entry_model_id(message):
+    """Return the model ID of an assistant message (string or {"id": ...} form)."""
+    model_info = message.get("model")
+    if isinstance(model_info, dict):
+        return model_info.get("id")
+    return model_info
+
+def parse_entry_time(entry):
+    """Return an entry's timestamp as epoch seconds, or None if absent or invalid."""
+    timestamp_str = entry.get("timestamp")
+    if not timestamp_str:
+        return None
+    try:
+        # Parse ISO format timestamp
+        return datetime.fromisoformat(timestamp_str.replace('Z', '+00:00')).timestamp()
+    except (ValueError, TypeError, AttributeError):
+        return None
+
+def ingest_transcript_entry(state, entry, debug=False):
+    """Fold one parsed transcript entry into an incremental transcript state.
+    
+    Token totals count usage from assistant messages and from dict-valued
+    toolUseResult entries. Tool results are priced with their parent
+    assistant message's model, falling back to the last model seen.
+    Sidechain turns and tool results (a Task result reports its subagent's
+    usage) are also totalled separately as subagent usage.
+    A response time is the gap between an assistant entry and the latest
+    preceding user entry.
+    
+    Args:
+        state: State from new_transcript_state(), updated in place
+        entry: Parsed transcript entry
         debug: Whether to output debug information
+    """
+    state["entries"] += 1
+    usage = None
+    model_id = None
+    entry_type = entry.get("type")
+    
+    # Check for usage and model in assistant messages
+    if entry_type == "assistant" and "message" in entry:
+        message = entry["message"]
+        usage = message.get("usage", {})
+        model_id = get_entry_model_id(message)
+        if model_id:
+            state["last_model_id"] = model_id  # Remember this model
+            if not state["first_model_id"]:
+                state["first_model_id"] = model_id
+            uuid = entry.get("uuid")
+            if uuid:
+                recent_models = state["recent_models"]
+                recent_models[uuid] = model_id
+                if len(recent_models) > RECENT_MODEL_LIMIT:
+                    del recent_models[next(iter(recent_models))]
+    
+    # Check for usage in tool use results (only if it's a dict)
+    elif "toolUseResult" in entry and isinstance(entry["toolUseResult"], dict):
+        usage = entry["toolUseResult"].get("usage", {})
+        # Model from parent assistant message, falling back to last seen model
+        model_id = state["recent_models"].get(entry.get("parentUuid")) or state["last_model_id"]
+    
+    # Timing metrics only consider user and assistant entries
+    entry_time = parse_entry_time(entry) if entry_type in ("user", "assistant") else None
+    
+    if usage:
+        tokens = state["tokens"]
+        tokens["input_tokens"] += usage.get("input_tokens", 0)
+        tokens["output_tokens"] += usage.get("output_tokens", 0)
+        tokens["cache_creation_tokens"] += usage.get("cache_creation_input_tokens", 0)
+        tokens["cache_read_tokens"] += usage.get("cache_read_input_tokens", 0)
+        
+        entry_cost = 0.0
+        if model_id:
+            entry_cost = calculate_cost_per_entry(usage, model_id)
+            state["cost"] += entry_cost
+            state["model_costs"][model_id] = state["model_costs"].get(model_id, 0.0) + entry_cost
+        elif debug:
+            # Log entries with usage but no model
+            sys.stderr.write(f"DEBUG: Entry with usage but no model: {(entry.get('uuid') or 'unknown')[:8]}\n")
+        
+        if entry.get("isSidechain") or entry_type != "assistant":
+            sidechain = state["sidechain_tokens"]
+            sidechain["input_tokens"] += usage.get("input_tokens", 0)
+            sidechain["output_tokens"] += usage.get("output_tokens", 0)
+            sidechain["cache_creation_tokens"] += usage.get("cache_creation_input_tokens", 0)
+            sidechain["cache_read_tokens"] += usage.get("cache_read_input_tokens", 0)
+            state["sidechain_cost"] += entry_cost
+        
+        if entry_time is not None:
+            # Per-day (local date) and per-hour buckets feed the cross-session rollups
+            entry_tokens = (usage.get("input_tokens", 0) + usage.get("cache_creation_input_tokens", 0) +
+                            usage.get("output_tokens", 0))
+            day = datetime.fromtimestamp(entry_time).strftime("%Y-%m-%d")
+            hour = str(int(entry_time // 3600))
+            for buckets, bucket_key in ((state["daily"], day), (state["hourly"], hour)):
+                bucket = buckets.setdefault(bucket_key, {"cost": 0.0, "tokens": 0})
+                bucket["cost"] += entry_cost
+                bucket["tokens"] += entry_tokens
+    
+    if usage and entry_type == "assistant" and not entry.get("isSidechain"):
+        detect_cache_break(state, entry, usage, model_id, entry_time)
+    
+    if entry_time is not None:
+        track_tool_latency(state, entry, entry_time)
+        track_subagents(state, entry, entry_time)
+    
+    if entry_time is None:
+        return
+    
+    state["timestamp_count"] += 1
+    if state["first_time"] is None or entry_time < state["first_time"]:
+        state["first_time"] = entry_time
+    if state["last_time"] is None or entry_time > state["last_time"]:
+        state["last_time"] = entry_time
+    
+    if entry_type == "user":
+        state["message_count"] += 1
+        if state["last_user_time"] is None or entry_time > state["last_user_time"]:
+            state["last_user_time"] = entry_time
+    elif state["last_user_time"] is not None:
+        response_time = entry_time - state["last_user_time"]
+        if 0 < response_time < RESPONSE_TIME_LIMIT:
+            state["response_count"] += 1
+            state["response_total"] += response_time
+            for estimator in state["response_quantiles"].values():
+                p2_add(estimator, response_time)
+            
+            # Output throughput: a message's output tokens over the time since the preceding
+            # user or tool result entry, counted once per message
+            message_id = entry["message"].get("id") if isinstance(entry.get("message"), dict) else None
+            output_tokens = usage.get("output_tokens", 0) if usage else 0
+            if output_tokens > 0 and (message_id is None or message_id != state["throughput_message_id"]):
+                state["throughput_message_id"] = message_id
+                state["throughput_tokens"] += output_tokens
+                state["throughput_seconds"] += response_time
+                state["throughput_recent"].append([output_tokens, response_time])
+                del state["throughput_recent"][:-THROUGHPUT_WINDOW]
+
+def detect_cache_break(state, entry, usage, model_id, entry_time):
+    """Track the main conversation's cached prefix and record turns that lost it.
+    
+    A turn breaks the cache when the previous turn left a cached prefix of at
+    least CACHE_BREAK_MIN_TOKENS but this turn reads back less than
+    CACHE_BREAK_READ_FRACTION of it and writes the rest again. The waste is
+    the re-written tokens priced at the cache write rate minus the read rate.
+    Repeated entries of one message (one per content block) are counted
+    once; subagent (sidechain) turns have their own caches and are skipped.
+    """
+    message_id = entry["message"].get("id")
+    previous = state["cache_context"]
+    if message_id and previous and previous.get("message_id") == message_id:
+        return
+    
+    cache_read = usage.get("cache_read_input_tokens", 0)
+    cache_write = usage.get("cache_creation_input_tokens", 0)
+    if previous and previous["tokens"] >= CACHE_BREAK_MIN_TOKENS and \
+            cache_read < previous["tokens"] * CACHE_BREAK_READ_FRACTION and cache_write > 0:
+        wasted = min(cache_write, previous["tokens"] - cache_read)
+        pricing = get_model_pricing(model_id) or {}
+        wasted_cost = wasted * (pricing.get("cache_write_5m", 0) - pricing.get("cache_read", 0)) / 1_000_000
+        expired = entry_time is not None and previous["time"] is not None and \
+            entry_time - previous["time"] > PROMPT_CACHE_TTL
+        state["cache_breaks"] += 1
+        state["cache_break_tokens"] += wasted
+        state["cache_break_cost"] += wasted_cost
+        state["cache_break_log"].append({
+            "time": entry_time,
+            "uuid": entry.get("uuid"),
+            "parent_uuid": entry.get("parentUuid"),
+            "reason": "expired" if expired else "invalidated",
+            "tokens": wasted,
+            "cost": wasted_cost
+        })
+        del state["cache_break_log"][:-CACHE_BREAK_LOG_LIMIT]
+    
+    state["cache_context"] = {
+        "message_id": message_id,
+        "tokens": cache_read + cache_write,
+        "time": entry_time if entry_time is not None else (previous or {}).get("time")
+    }
+
+def track_tool_latency(state, entry, entry_time):
+    """Pair tool_use blocks with their tool results and record each tool's latency.
+    
+    An assistant entry's tool_use blocks wait in pending_tools under the
+    entry's uuid; the user entry carrying the tool_result names that uuid
+    as its parentUuid. The latency is the time between the two entries.
+    """
+    message = entry.get("message")
+    content = message.get("content") if isinstance(message, dict) else None
+    if not isinstance(content, list):
+        return
+    
+    if entry.get("type") == "assistant":
+        calls = {block.get("id"): block.get("name") or "unknown" for block in content
+                 if isinstance(block, dict) and block.get("type") == "tool_use"}
+        if calls and entry.get("uuid"):
+            pending = state["pending_tools"]
+            pending[entry["uuid"]] = {"time": entry_time, "calls": calls}
+            if len(pending) > PENDING_TOOL_LIMIT:
+                del pending[next(iter(pending))]
+        return
+    
+    pending = state["pending_tools"]
+    for block in content:
+        if not isinstance(block, dict) or block.get("type") != "tool_result":
+            continue
+        tool_use_id = block.get("tool_use_id")
+        parent_uuid = entry.get("parentUuid")
+        if parent_uuid not in pending or tool_use_id not in pending[parent_uuid]["calls"]:
+            # Parallel calls can be answered from a sibling entry of the same message
+            parent_uuid = next((uuid for uuid, item in pending.items() if tool_use_id in item["calls"]), None)
+            if parent_uuid is None:
+                continue
+        call = pending[parent_uuid]
+        name = call["calls"].pop(tool_use_id)
+        if not call["calls"]:
+            del pending[parent_uuid]
+        
+        latency = entry_time - call["time"]
+        if not 0 <= latency < TOOL_TIME_LIMIT:
+            continue
+        stats = state["tools"].get(name)
+        if stats is None:
+            stats = state["tools"][name] = {"count": 0, "total": 0.0, "max": 0.0, "p95": p2_new(0.95)}
+        stats["count"] += 1
+        stats["total"] += latency
+        stats["max"] = max(stats["max"], latency)
+        p2_add(stats["p95"], latency)
+        state["tool_recent"].append([name, latency])
+        del state["tool_recent"][:-TOOL_WINDOW]
+
+def track_subagents(state, entry, entry_time):
+    """Attribute an entry's timing to the main conversation or its subagent, and track subagent runs.
+    
+    A sidechain entry belongs to the subagent whose chain its parentUuid
+    continues; one with an unknown parent starts a new subagent. Response
+    times are measured within each chain, so parallel subagents do not
+    distort each other or the main conversation. A subagent run spans from
+    a Task tool_use to its tool_result; the most runs open at once is the
+    peak concurrency.
+    """
+    entry_type = entry.get("type")
+    chain = "main"
+    if entry.get("isSidechain"):
+        chains = state["sidechain_chains"]
+        chain = chains.get(entry.get("parentUuid"))
+        if chain is None:
+            state["subagent_chains"] += 1
+            chain = entry.get("uuid") or f"subagent-{state['subagent_chains']}"
+        if entry.get("uuid"):
+            chains[entry["uuid"]] = chain
+            if len(chains) > SIDECHAIN_UUID_LIMIT:
+                del chains[next(iter(chains))]
+    
+    input_times = state["chain_input_times"]
+    if entry_type == "user":
+        if chain != "main":
+            # Keep recently active subagents last so the longest idle one is dropped first
+            input_times.pop(chain, None)
+        input_times[chain] = entry_time
+        if len(input_times) > SUBAGENT_CHAIN_LIMIT:
+            del input_times[next(key for key in input_times if key != "main")]
+    elif chain in input_times:
+        response_time = entry_time - input_times[chain]
+        if 0 < response_time < RESPONSE_TIME_LIMIT:
+            kind = "main" if chain == "main" else "sidechain"
+            state[f"{kind}_response_count"] += 1
+            state[f"{kind}_response_total"] += response_time
+    
+    active = state["active_subagents"]
+    if entry_type != "assistant" and not active:
+        return
+    message = entry.get("message")
+    content = message.get("content") if isinstance(message, dict) else None
+    if not isinstance(content, list):
+        return
+    if entry_type == "assistant":
+        started = [block.get("id") for block in content if isinstance(block, dict) and
+                   block.get("type") == "tool_use" and block.get("name") in SUBAGENT_TOOLS]
+        if not started:
+            return
+        # Runs without a result for longer than TOOL_TIME_LIMIT were abandoned
+        for tool_use_id in [key for key, start in active.items() if entry_time - start >= TOOL_TIME_LIMIT]:
+            del active[tool_use_id]
+        for tool_use_id in started:
+            active[tool_use_id] = entry_time
+        state["subagent_calls"] += len(started)
+        state["peak_subagents"] = max(state["peak_subagents"], len(active))
+        return
+    for block in content:
+        if isinstance(block, dict) and block.get("type") == "tool_result" and block.get("tool_use_id") in active:
+            run_time = entry_time - active.pop(block["tool_use_id"])
+            if 0 <= run_time < TOOL_TIME_LIMIT:
+                state["subagent_run_count"] += 1
+                state["subagent_run_total"] += run_time
+
+def get_tool_latency(state):
+    """Return per-tool latency statistics, slowest cumulative time first.
     
     Returns:
-        Total cost in dollars (float)
+        Dict of tool name to {"count", "total", "mean", "p95", "max"} (seconds)
+    """
+    tools = sorted(state["tools"].items(), key=lambda item: item[1]["total"], reverse=True)
+    return {name: {
+        "count": stats["count"],
+        "total": stats["total"],
+        "mean": stats["total"] / stats["count"],
+        "p95": p2_value(stats["p95"]),
+        "max": stats["max"]
+    } for name, stats in tools}
+
+def calculate_cache_hit_rate(token_totals):
+    """Return cache reads as a fraction of all input tokens (0.0 if there are none)."""
+    total_input = (token_totals.get("input_tokens", 0) +
+                   token_totals.get("cache_creation_tokens", 0) +
+                   token_totals.get("cache_read_tokens", 0))
+    if total_input > 0:
+        return token_totals.get("cache_read_tokens", 0) / total_input
+    return 0.0
+
+def get_transcript_metrics(state):
+    """Derive the status line's transcript metrics from an incremental state.
+    
+    Returns:
+        Dict of JSON-serializable metrics (empty if no entries were ingested)
     """
-    total_cost = 0.0
-    model_costs = {}  # Track costs per model for debugging
+    if not state["entries"]:
+        return {}
     
-    # Build UUID lookup for finding parent models
-    uuid_lookup = {}
-    for entry in transcript_entries:
-        uuid = entry.get("uuid")
-        if uuid:
-            uuid_lookup[uuid] = entry
+    tokens = state["tokens"]
+    metrics = dict(tokens)
     
-    # Track the last seen model for tool results that don't specify one
-    last_model_id = None
+    # Payloads without a model (e.g. hook events feeding --watch) fall back to the transcript
+    transcript_model = get_model_pricing(state["first_model_id"])
+    if transcript_model:
+        metrics["transcript_model_name"] = transcript_model["name"]
     
-    for entry in transcript_entries:
-        usage = None
-        model_id = None
+    # Calculate tokens (all non-cached tokens: input + cache_creation + output)
+    # This represents the actual token usage that counts toward context
+    metrics["context_size"] = (tokens["input_tokens"] +
+                               tokens["cache_creation_tokens"] +
+                               tokens["output_tokens"])
+    metrics["cost"] = state["cost"]
+    metrics["model_costs"] = dict(state["model_costs"])
+    metrics["cache_hit_rate"] = calculate_cache_hit_rate(tokens)
+    
+    if state["response_count"]:
+        metrics["avg_response_time"] = state["response_total"] / state["response_count"]
+        for name, estimator in state["response_quantiles"].items():
+            metrics[f"response_{name}"] = p2_value(estimator)
+    else:
+        metrics["avg_response_time"] = 0.0
+    
+    metrics["message_count"] = state["message_count"]
+    if state["throughput_seconds"] > 0:
+        metrics["throughput"] = state["throughput_tokens"] / state["throughput_seconds"]
+        recent_seconds = sum(seconds for _, seconds in state["throughput_recent"])
+        metrics["throughput_recent"] = sum(tokens for tokens, _ in state["throughput_recent"]) / recent_seconds
+    if state["tools"]:
+        metrics["tool_latency"] = get_tool_latency(state)
+    if state["tool_recent"]:
+        name, latency = max(state["tool_recent"], key=lambda item: item[1])
+        metrics["slowest_tool"] = name
+        metrics["slowest_tool_time"] = latency
+    metrics["cache_breaks"] = state["cache_breaks"]
+    metrics["cache_break_tokens"] = state["cache_break_tokens"]
+    metrics["cache_break_cost"] = state["cache_break_cost"]
+    
+    # Main conversation versus subagents (sidechains and Task results)
+    sidechain = state["sidechain_tokens"]
+    metrics["subagent_cost"] = state["sidechain_cost"]
+    metrics["main_cost"] = state["cost"] - state["sidechain_cost"]
+    metrics["subagent_tokens"] = (sidechain["input_tokens"] + sidechain["cache_creation_tokens"] +
+                                  sidechain["output_tokens"])
+    metrics["main_tokens"] = metrics["context_size"] - metrics["subagent_tokens"]
+    metrics["subagents"] = max(state["subagent_calls"], state["subagent_chains"])
+    metrics["peak_subagents"] = max(state["peak_subagents"], min(state["subagent_chains"], 1))
+    if state["main_response_count"]:
+        metrics["main_response_time"] = state["main_response_total"] / state["main_response_count"]
+    if state["sidechain_response_count"]:
+        metrics["subagent_response_time"] = state["sidechain_response_total"] / state["sidechain_response_count"]
+    if state["subagent_run_count"]:
+        metrics["subagent_run_time"] = state["subagent_run_total"] / state["subagent_run_count"]
+    if state["timestamp_count"] >= 2:
+        metrics["session_duration"] = state["last_time"] - state["first_time"]
+    else:
+        metrics["session_duration"] = 0.0
+    return metrics
+
+# Transcript bytes read per chunk when catching up
+TRANSCRIPT_READ_CHUNK = 1 << 20
+
+# Seconds between checkpoint saves while a long catch-up is in progress
+TRANSCRIPT_SAVE_INTERVAL = 1.0
+# Longest wait at exit for abandoned providers to stop and checkpoint
+INGEST_STOP_WAIT = 0.2
+
+# Set when the process is about to exit: resumable ingests stop at the next chunk
+# so their progress can be checkpointed (see main())
+_ingest_stop = threading.Event()
+
+# Compressed transcript suffixes and the module providing each codec (zstandard is optional)
+TRANSCRIPT_CODECS = {
+    ".gz": "gzip",
+    ".bz2": "bz2",
+    ".xz": "lzma",
+    ".zst": "zstandard"
+}
+
+def get_transcript_codec(transcript_path):
+    """Return the codec module name for a compressed transcript path, or None for plain files."""
+    for suffix, codec in TRANSCRIPT_CODECS.items():
+        if transcript_path.endswith(suffix):
+            return codec
+    return None
+
+def open_transcript_stream(transcript_path):
+    """Open a transcript for binary streaming reads, decompressing transparently.
+    
+    Compressed files are decoded incrementally as they are read, never
+    inflated whole in memory.
+    
+    Raises:
+        OSError: If the file cannot be opened or its codec is unavailable
+    """
+    codec = get_transcript_codec(transcript_path)
+    if codec is None:
+        return open(transcript_path, "rb")
+    if codec == "gzip":
+        import gzip
+        return gzip.open(transcript_path, "rb")
+    if codec == "bz2":
+        import bz2
+        return bz2.open(transcript_path, "rb")
+    if codec == "lzma":
+        import lzma
+        return lzma.open(transcript_path, "rb")
+    try:
+        import zstandard
+    except ImportError:
+        raise OSError(f"Reading {transcript_path} requires the 'zstandard' package")
+    return zstandard.ZstdDecompressor().stream_reader(open(transcript_path, "rb"), closefd=True)
+
+def ingest_transcript_stream(state, stream, debug=False, progress=None):
+    """Fold every complete line from a binary stream into the state, chunk by chunk.
+    
+    Advances state["offset"] by the bytes consumed. An incomplete trailing
+    line is left unconsumed unless it already parses as JSON.
+    
+    Args:
+        progress: Optional callback run every TRANSCRIPT_SAVE_INTERVAL seconds
+                  with the state consumed so far. Only resumable (plain)
+                  streams pass one; they also stop early, leaving the rest
+                  for the next call, once _ingest_stop is set.
+    """
+    pending = b""
+    saved = time.monotonic()
+    while True:
+        chunk = stream.read(TRANSCRIPT_READ_CHUNK)
+        if not chunk:
+            break
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            state["offset"] += len(line) + 1
+            ingest_transcript_line(state, line, debug=debug)
+        if progress is not None:
+            if _ingest_stop.is_set():
+                return
+            if time.monotonic() - saved >= TRANSCRIPT_SAVE_INTERVAL:
+                progress(state)
+                saved = time.monotonic()
+    
+    if pending.strip():
+        # Keep a trailing fragment for next time unless it is already complete
+        try:
+            entry = json.loads(pending)
+        except ValueError:
+            entry = None
+        if isinstance(entry, dict):
+            state["offset"] += len(pending)
+            state["lines"] += 1
+            ingest_transcript_entry(state, entry, debug=debug)
+
+def update_transcript_state(transcript_path, state=None, debug=False, progress=None):
+    """Bring an incremental transcript state up to date, reading only new bytes.
+    
+    The state records the byte offset it has consumed. A state whose file
+    was replaced (different inode), truncated, or rewritten (different
+    leading bytes) is discarded and the transcript is re-read from the
+    start. An incomplete trailing line is left for the next call unless it
+    already parses as JSON.
+    
+    Compressed transcripts (see TRANSCRIPT_CODECS) cannot be resumed
+    mid-stream: they are treated as archives, re-used while the compressed
+    file's size and mtime are unchanged and otherwise re-read in full.
+    
+    Args:
+        transcript_path: Path to the transcript file
+        state: State from a previous call (or None)
+        debug: Whether to output debug information
+        progress: Optional callback receiving the partial state every
+                  TRANSCRIPT_SAVE_INTERVAL seconds of a long catch-up, so it
+                  can be checkpointed (plain transcripts only)
+    
+    Returns:
+        Updated state (a new one if the old one could not be continued)
+    
+    Raises:
+        OSError: If the transcript cannot be read
+    """
+    if get_transcript_codec(transcript_path):
+        st = os.stat(transcript_path)
+        if (state is not None and state.get("version") == TRANSCRIPT_STATE_VERSION and
+                state.get("inode") == st.st_ino and state.get("source_size") == st.st_size and
+                state.get("source_mtime") == st.st_mtime_ns):
+            return state
+        state = new_transcript_state()
+        state.update(inode=st.st_ino, source_size=st.st_size, source_mtime=st.st_mtime_ns)
+        with open_transcript_stream(transcript_path) as stream:
+            ingest_transcript_stream(state, stream, debug=debug)
+        if debug:
+            sys.stderr.write(f"DEBUG: Ingested compressed transcript ({state['offset']} bytes, "
+                             f"{state['entries']} entries)\n")
+        return state
+    
+    with open(transcript_path, "rb") as f:
+        st = os.fstat(f.fileno())
         
-        # Check for usage and model in assistant messages
-        if entry.get("type") == "assistant" and "message" in entry:
-            message = entry["message"]
-            usage = message.get("usage", {})
-            model_info = message.get("model")
-            
-            # Handle both string and dict formats for model
-            if isinstance(model_info, dict):
-                model_id = model_info.get("id")
-            else:
-                model_id = model_info
-                
-            if model_id:
-                last_model_id = model_id  # Remember this model
+        if state is not None:
+            valid = (state.get("version") == TRANSCRIPT_STATE_VERSION and
+                     state.get("inode") == st.st_ino and
+                     state.get("offset", 0) <= st.st_size)
+            if valid and state["head_length"]:
+                head = f.read(state["head_length"])
+                valid = hashlib.sha1(head).hexdigest() == state["head_hash"]
+            if not valid:
+                if debug:
+                    sys.stderr.write(f"DEBUG: Transcript checkpoint invalid, re-reading {transcript_path}\n")
+                state = None
+        if state is None:
+            state = new_transcript_state()
+            state["inode"] = st.st_ino
         
-        # Check for usage in tool use results
-        elif "toolUseResult" in entry and isinstance(entry["toolUseResult"], dict):
-            usage = entry["toolUseResult"].get("usage", {})
-            
-            # Try to find model from parent assistant message
-            parent_uuid = entry.get("parentUuid")
-            if parent_uuid and parent_uuid in uuid_lookup:
-                parent = uuid_lookup[parent_uuid]
-                if parent.get("type") == "assistant" and "message" in parent:
-                    parent_model = parent["message"].get("model")
-                    # Extract model ID from dict if needed
-                    if isinstance(parent_model, dict):
-                        model_id = parent_model.get("id")
-                    else:
-                        model_id = parent_model
-            
-            # Fallback to last seen model if parent lookup fails
-            if not model_id:
-                model_id = last_model_id
+        if state["offset"] == st.st_size:
+            return state
         
-        if usage and model_id:
-            entry_cost = calculate_cost_per_entry(usage, model_id)
-            total_cost += entry_cost
-            
-            # Track per-model costs for debugging
-            if model_id not in model_costs:
-                model_costs[model_id] = 0.0
-            model_costs[model_id] += entry_cost
-        elif usage and not model_id and debug:
-            # Log entries with usage but no model
-            sys.stderr.write(f"DEBUG: Entry with usage but no model: {entry.get('uuid', 'unknown')[:8]}\n")
+        def record_head(state):
+            if state["head_length"] < TRANSCRIPT_HEAD_BYTES and state["offset"] > state["head_length"]:
+                position = f.tell()
+                f.seek(0)
+                head = f.read(min(state["offset"], TRANSCRIPT_HEAD_BYTES))
+                state["head_length"] = len(head)
+                state["head_hash"] = hashlib.sha1(head).hexdigest()
+                f.seek(position)
+        
+        def save_progress(state):
+            # A checkpoint is only valid once it carries the head hash
+            record_head(state)
+            progress(state)
+        
+        start_offset = state["offset"]
+        f.seek(start_offset)
+        ingest_transcript_stream(state, f, debug=debug, progress=save_progress if progress else None)
+        record_head(state)
+    
+    if debug:
+        sys.stderr.write(f"DEBUG: Ingested transcript bytes {start_offset}-{state['offset']} "
+                         f"({state['entries']} entries total)\n")
+    return state
+
+def ingest_transcript_line(state, line, debug=False):
+    """Parse one raw transcript line and fold it into the state (blank lines are skipped)."""
+    state["lines"] += 1
+    line = line.strip()
+    if not line:
+        return
+    try:
+        entry = json.loads(line)
+    except ValueError as e:
+        # Log error but continue processing other lines
+        print(f"Warning: Invalid JSON at line {state['lines']} in transcript: {e}", file=sys.stderr)
+        return
+    if isinstance(entry, dict):
+        ingest_transcript_entry(state, entry, debug=debug)
+
+def calculate_total_cost(transcript_entries, debug=False):
+    """Calculate total session cost by summing per-entry costs using each entry's model.
+    
+    Args:
+        transcript_entries: List of parsed transcript entries
+        debug: Whether to output debug information
+    
+    Returns:
+        Total cost in dollars (float)
+    """
+    state = new_transcript_state()
+    for entry in transcript_entries:
+        ingest_transcript_entry(state, entry, debug=debug)
     
-    if debug and model_costs:
-        sys.stderr.write(f"DEBUG: Cost breakdown by model:\n")
-        for model_id, cost in model_costs.items():
-            sys.stderr.write(f"DEBUG:   {model_id}: ${cost:.4f}\n")
-        sys.stderr.write(f"DEBUG:   Total: ${total_cost:.4f}\n")
+    if debug and state["model_costs"]:
+        log_model_costs(state)
     
-    return total_cost
+    return state["cost"]
+
+def log_model_costs(state):
+    """Write the per-model cost breakdown of a transcript state to stderr."""
+    sys.stderr.write(f"DEBUG: Cost breakdown by model:\n")
+    for model_id, cost in state["model_costs"].items():
+        sys.stderr.write(f"DEBUG:   {model_id}: ${cost:.4f}\n")
+    sys.stderr.write(f"DEBUG:   Total: ${state['cost']:.4f}\n")
 
 def format_cost(cost):
     """Format cost as dollars or cents.
@@ -791,7 +1778,8 @@ def format_number(value, style="compact"):
     else:  # raw
         return str(value)
 
-def calculate_performance_badge(cache_hit_rate, avg_response_time, cache_thresholds, response_thresholds, colored=False, powerline=False, no_emoji=False):
+def calculate_performance_badge(cache_hit_rate, avg_response_time, cache_thresholds, response_thresholds, colored=False, powerline=False, no_emoji=False,
+                                throughput=None, throughput_thresholds=None):
     """Calculate performance badge based on metrics and thresholds.
     
     Args:
@@ -801,6 +1789,8 @@ def calculate_performance_badge(cache_hit_rate, avg_response_time, cache_thresho
         response_thresholds: List of [green, yellow, orange] thresholds for response time
         colored: Whether to apply colors to the badge
         powerline: Whether this is for powerline style (different coloring)
+        throughput: Optional output tokens per second
+        throughput_thresholds: Optional [green, yellow, orange] thresholds for throughput
     
     Returns:
         Badge string (e.g., "●○○○", "○●○○", "○○●○", "○○○●")
@@ -826,8 +1816,20 @@ def calculate_performance_badge(cache_hit_rate, avg_response_time, cache_thresho
     else:
         response_level = 3  # Red
     
-    # Combine metrics (take the worse of the two)
-    overall_level = max(cache_level, response_level)
+    # Calculate performance level for throughput if configured (higher is better)
+    throughput_level = 0
+    if throughput is not None and throughput_thresholds:
+        if throughput >= throughput_thresholds[0]:
+            throughput_level = 0  # Green
+        elif throughput >= throughput_thresholds[1]:
+            throughput_level = 1  # Yellow
+        elif throughput >= throughput_thresholds[2]:
+            throughput_level = 2  # Orange
+        else:
+            throughput_level = 3  # Red
+    
+    # Combine metrics (take the worst)
+    overall_level = max(cache_level, response_level, throughput_level)
     
     # Choose characters based on emoji preference and color availability
     active_char = "*" if no_emoji else "●"
@@ -886,89 +1888,16 @@ def calculate_performance_metrics(transcript_entries, token_totals, debug=False)
     Returns:
         Dict with performance metrics
     """
-    metrics = {}
-    
-    # Calculate cache hit rate
-    total_input = (token_totals.get("input_tokens", 0) + 
-                   token_totals.get("cache_creation_tokens", 0) + 
-                   token_totals.get("cache_read_tokens", 0))
-    if total_input > 0:
-        cache_hit_rate = token_totals.get("cache_read_tokens", 0) / total_input
-        metrics["cache_hit_rate"] = cache_hit_rate
-    else:
-        metrics["cache_hit_rate"] = 0.0
-    
-    # Build UUID lookup map for parent-child relationships
-    uuid_lookup = {}
+    state = new_transcript_state()
     for entry in transcript_entries:
-        uuid = entry.get("uuid")
-        if uuid:
-            uuid_lookup[uuid] = entry
-    
-    if debug:
-        sys.stderr.write(f"DEBUG: Built UUID lookup with {len(uuid_lookup)} entries\n")
-    
-    # Calculate response times and count messages
-    user_timestamps = []
-    assistant_timestamps = []
-    response_times = []
+        ingest_transcript_entry(state, entry)
     
-    # Process entries to collect basic metrics
-    for entry in transcript_entries:
-        timestamp_str = entry.get("timestamp")
-        if not timestamp_str:
-            continue
-            
-        try:
-            # Parse ISO format timestamp
-            timestamp = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
-        except:
-            continue
-            
-        entry_type = entry.get("type")
-        
-        # Track user timestamps
-        if entry_type == "user":
-            user_timestamps.append(timestamp)
-        
-        # Track assistant timestamps
-        elif entry_type == "assistant":
-            assistant_timestamps.append(timestamp)
-    
-    
-    # Average response time (simplified - just based on consecutive user/assistant pairs)
-    if user_timestamps and assistant_timestamps:
-        # Match user and assistant messages in order
-        paired_responses = []
-        for i, assistant_ts in enumerate(assistant_timestamps):
-            # Find the most recent user timestamp before this assistant
-            prior_users = [u for u in user_timestamps if u < assistant_ts]
-            if prior_users:
-                user_ts = max(prior_users)
-                response_time = (assistant_ts - user_ts).total_seconds()
-                if 0 < response_time < 300:  # Sanity check: between 0 and 5 minutes
-                    paired_responses.append(response_time)
-        
-        if paired_responses:
-            metrics["avg_response_time"] = sum(paired_responses) / len(paired_responses)
-        else:
-            metrics["avg_response_time"] = 0.0
-    else:
-        metrics["avg_response_time"] = 0.0
-    
-    # Message count
-    metrics["message_count"] = len(user_timestamps)
-    
-    # Session duration
-    all_timestamps = user_timestamps + assistant_timestamps
-    if len(all_timestamps) >= 2:
-        all_timestamps.sort()
-        session_duration = (all_timestamps[-1] - all_timestamps[0]).total_seconds()
-        metrics["session_duration"] = session_duration
-    else:
-        metrics["session_duration"] = 0.0
-    
-    return metrics
+    metrics = get_transcript_metrics(state)
+    perf_keys = ("avg_response_time", "response_p50", "response_p95", "response_p99",
+                 "message_count", "session_duration")
+    perf_metrics = {key: metrics[key] for key in perf_keys if key in metrics}
+    perf_metrics["cache_hit_rate"] = calculate_cache_hit_rate(token_totals)
+    return perf_metrics
 
 def format_duration(seconds):
     """Format duration in seconds to human-readable format."""
@@ -1040,7 +1969,10 @@ def format_output(config, model_info, input_data, metrics=None):
         field_content = None
         
         # Handle different fields
-        if field == "badge":
+        if FIELD_SOURCES.get(field) in metrics.get("pending", ()):
+            # Provider missed the deadline and nothing is cached yet
+            field_content = PENDING_MARKER if not config["no_emoji"] else "..."
+        elif field == "badge":
             if "badge" in metrics:
                 field_content = metrics["badge"]
             elif debug:
@@ -1079,15 +2011,46 @@ def format_output(config, model_info, input_data, metrics=None):
                 field_content = metrics["cost_formatted"]
             elif debug:
                 sys.stderr.write(f"DEBUG: Cost not available - need model_id and token data\n")
+        elif field == "subagent-cost" and "subagent_cost" in metrics:
+            # Cost of subagent work and its share of the session cost
+            prefix = "Sub:" if config["no_emoji"] else "🧩"
+            field_content = f"{prefix} {format_cost(metrics['subagent_cost'])}"
+            if metrics["cost"] > 0:
+                field_content += f" ({metrics['subagent_cost'] / metrics['cost'] * 100:.0f}%)"
+        elif field == "spend-today" and "spend_today" in metrics:
+            prefix = "Today:" if config["no_emoji"] else "📅"
+            field_content = f"{prefix} {format_cost(metrics['spend_today'])}"
+        elif field == "window-tokens" and "window_tokens" in metrics:
+            # Tokens in the current 5-hour window and time until it resets
+            prefix = "5h:" if config["no_emoji"] else "⏳"
+            field_content = f"{prefix} {format_number(metrics['window_tokens'], config['numbers'])}"
+            if metrics["window_remaining"] > 0:
+                field_content += f" ({format_duration(metrics['window_remaining'])} left)"
+        elif field in PLUGIN_FIELDS and field in metrics.get("plugins", {}):
+            field_content = metrics["plugins"][field]
         elif field == "git" and "git_info" in metrics:
             # Format git status: "branch ●" if modified, "branch" if clean
-            branch = metrics["git_info"]["branch"]
-            modified = metrics["git_info"]["modified_count"]
+            git_info = metrics["git_info"]
+            branch = git_info["branch"]
+            if branch == "HEAD" and git_info.get("rebase_branch"):
+                branch = git_info["rebase_branch"]
+            modified = git_info["modified_count"]
             if modified > 0:
                 indicator = "*" if config["no_emoji"] else "●"
                 field_content = f"{branch} {indicator}"
             else:
                 field_content = branch
+            # Upstream divergence, stashes and in-progress operation, when present
+            ahead, behind = git_info.get("ahead"), git_info.get("behind")
+            if ahead or behind:
+                if config["no_emoji"]:
+                    field_content += f" +{ahead}/-{behind}"
+                else:
+                    field_content += " " + (f"↑{ahead}" if ahead else "") + (f"↓{behind}" if behind else "")
+            if git_info.get("stash_count"):
+                field_content += f" stash:{git_info['stash_count']}" if config["no_emoji"] else f" ⚑{git_info['stash_count']}"
+            if git_info.get("operation"):
+                field_content += f" |{git_info['operation']}"
         elif field == "perf-cache-rate" and "cache_hit_rate" in metrics:
             # Format cache hit rate as percentage
             rate = metrics["cache_hit_rate"] * 100
@@ -1102,6 +2065,14 @@ def format_output(config, model_info, input_data, metrics=None):
                 field_content = f"Response: {time_str}"
             else:
                 field_content = f"⏱ {time_str}"
+        elif field in ("perf-response-p50", "perf-response-p95") and f"response_{field[-3:]}" in metrics:
+            # Format a response time quantile
+            quantile = field[-3:]
+            time_str = format_duration(metrics[f"response_{quantile}"])
+            if config["no_emoji"]:
+                field_content = f"{quantile.upper()}: {time_str}"
+            else:
+                field_content = f"⏱ {quantile} {time_str}"
         elif field == "perf-session-time" and "session_duration" in metrics:
             # Format session duration
             time_str = format_duration(metrics["session_duration"])
@@ -1116,6 +2087,43 @@ def format_output(config, model_info, input_data, metrics=None):
                 field_content = f"Messages: {count}"
             else:
                 field_content = f"💬 {count}"
+        elif field == "perf-throughput" and "throughput" in metrics:
+            # Output tokens per second over recent turns, with the session mean
+            recent = metrics["throughput_recent"]
+            session = metrics["throughput"]
+            if config["no_emoji"]:
+                field_content = f"Speed: {recent:.0f} tok/s (avg {session:.0f})"
+            else:
+                field_content = f"⏩ {recent:.0f} tok/s (avg {session:.0f})"
+        elif field == "perf-slowest-tool" and "slowest_tool" in metrics:
+            # Slowest tool run among the recent tool calls
+            time_str = format_duration(metrics["slowest_tool_time"])
+            if config["no_emoji"]:
+                field_content = f"Slowest: {metrics['slowest_tool']} {time_str}"
+            else:
+                field_content = f"🐢 {metrics['slowest_tool']} {time_str}"
+        elif field == "perf-subagents" and "subagents" in metrics:
+            # Subagents launched, most running at once, and their mean run time
+            prefix = "Agents:" if config["no_emoji"] else "🤖"
+            field_content = f"{prefix} {metrics['subagents']}"
+            if metrics["subagents"]:
+                field_content += f" (peak {metrics['peak_subagents']})"
+            if "subagent_run_time" in metrics:
+                field_content += f" {format_duration(metrics['subagent_run_time'])}"
+        elif field == "cache-ttl" and "cache_expires_at" in metrics:
+            # Countdown until the prompt cache expires
+            remaining = int(metrics["cache_expires_at"] - time.time())
+            prefix = "TTL:" if config["no_emoji"] else "⏲"
+            if remaining > 0:
+                field_content = f"{prefix} {remaining // 60}:{remaining % 60:02d}"
+            else:
+                field_content = f"{prefix} expired"
+        elif field == "cache-breaks" and "cache_breaks" in metrics:
+            # Prompt cache breaks and the cost of re-writing the lost prefix
+            prefix = "Breaks:" if config["no_emoji"] else "✂"
+            field_content = f"{prefix} {metrics['cache_breaks']}"
+            if metrics["cache_breaks"]:
+                field_content += f" ({format_number(metrics['cache_break_tokens'], config['numbers'])}, {format_cost(metrics['cache_break_cost'])})"
         elif field == "perf-all-metrics":
             # Show all performance metrics together
             perf_parts = []
@@ -1134,6 +2142,10 @@ def format_output(config, model_info, input_data, metrics=None):
             if perf_parts:
                 field_content = " ".join(perf_parts)
         
+        # Extrapolated totals of a sampled transcript are marked as estimates
+        if field_content and metrics.get("estimated") and field in ESTIMATED_FIELDS:
+            field_content = "~" + field_content
+        
         # Add field to output
         if field_content:
             if debug:
@@ -1145,11 +2157,15 @@ def format_output(config, model_info, input_data, metrics=None):
                 if field == "badge":
                     # Badge gets 50% gray background in powerline mode for better contrast
                     bg_color = 244  # 50% gray
+                elif field == "cache-ttl":
+                    bg_color = get_cache_ttl_color(metrics)
                 segments.append((field_content, bg_color))
             else:
                 # Regular styling - apply foreground color
                 if field != "badge":
                     color = get_field_color(field, theme_colors)
+                    if field == "cache-ttl" and theme_colors:
+                        color = get_cache_ttl_color(metrics)
                     if color is not None:
                         field_content = apply_color(field_content, fg_color=color)
                 output_parts.append(field_content)
@@ -1223,105 +2239,3305 @@ def format_output(config, model_info, input_data, metrics=None):
             sys.stderr.write(f"DEBUG: Returning regular output with {len(output_parts)} parts\n")
         return result_str
 
-def main():
-    """Main entry point."""
-    # Parse arguments
-    config = parse_arguments()
-    debug = config.get("debug", False)
+# On-disk cache layout (all under get_cache_dir()):
+#   status/<session>.line, status/<session>.json  - rendered status for readers (--watch)
+#   sessions/<session>.*.json                       - per-session state, written only by that session
+#   shared/<name>.json                              - cross-session files, read-modify-write under a lock
+#   locks/<name>.lock                               - fcntl advisory lock files
+# Every file is replaced by atomic rename, so readers never need a lock and
+# never see half-written state. JSON cache files carry a checksummed header;
+# a file that fails verification is deleted and rebuilt by its owner.
+CACHE_FORMAT_VERSION = 1
+CACHE_HEADER = b"pyccsl-cache"
+
+def get_cache_dir():
+    """Return the pyccsl cache directory, creating it if needed.
     
-    if debug:
-        sys.stderr.write(f"DEBUG: Config: {config}\n")
+    Uses $PYCCSL_CACHE_DIR if set, otherwise $XDG_CACHE_HOME/pyccsl
+    (falling back to ~/.cache/pyccsl).
+    """
+    cache_dir = os.environ.get("PYCCSL_CACHE_DIR")
+    if not cache_dir:
+        xdg_cache = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+        cache_dir = os.path.join(xdg_cache, "pyccsl")
+    os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+    return cache_dir
+
+def get_cache_path(kind, name):
+    """Return the path of cache file name within the kind subdirectory (status, sessions, shared, locks)."""
+    directory = os.path.join(get_cache_dir(), kind)
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    return os.path.join(directory, name)
+
+def get_session_key(input_data):
+    """Return a filesystem-safe key identifying the session in input_data.
     
-    # Read input
-    input_data = read_input()
+    Uses session_id when present, otherwise a hash of the transcript path.
+    """
+    session_id = str(input_data.get("session_id") or "")
+    key = "".join(c for c in session_id if c.isalnum() or c in "-_")[:64]
+    if key:
+        return key
+    transcript_path = input_data.get("transcript_path")
+    if transcript_path:
+        return "t-" + hashlib.sha1(transcript_path.encode("utf-8")).hexdigest()[:16]
+    return "default"
+
+# atomic_write() calls in progress; finish_writes() waits for them before os._exit()
+_writes = threading.Condition()
+_writes_state = {"active": 0, "closed": False}
+
+def atomic_write(path, data):
+    """Write data to path atomically (temp file in same directory + rename).
+    
+    Readers see either the previous or the new content, never a partial file.
+    """
+    import tempfile
+    
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    with _writes:
+        while _writes_state["closed"]:
+            # The process is exiting; never leave a temp file behind
+            _writes.wait()
+        _writes_state["active"] += 1
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.basename(path)[-16:])
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+    finally:
+        with _writes:
+            _writes_state["active"] -= 1
+            _writes.notify_all()
+
+def finish_writes(timeout=0.5):
+    """Let in-flight atomic_write() calls complete and block new ones, before os._exit().
+    
+    Returns:
+        True if no write is still in progress
+    """
+    with _writes:
+        _writes_state["closed"] = True
+        return _writes.wait_for(lambda: not _writes_state["active"], timeout)
+
+def encode_cache_blob(data):
+    """Serialize data as a checksummed cache blob.
+    
+    Format: b"pyccsl-cache <version> <crc32> <length>\n" followed by the JSON payload.
+    """
+    payload = json.dumps(data, separators=(",", ":")).encode("utf-8")
+    header = b"%s %d %08x %d\n" % (CACHE_HEADER, CACHE_FORMAT_VERSION, zlib.crc32(payload), len(payload))
+    return header + payload
+
+def decode_cache_blob(blob):
+    """Verify and deserialize a cache blob.
+    
+    Raises:
+        ValueError: If the header, length, checksum or JSON payload is invalid
+    """
+    header, sep, payload = blob.partition(b"\n")
+    parts = header.split(b" ")
+    if not sep or len(parts) != 4 or parts[0] != CACHE_HEADER:
+        raise ValueError("bad cache header")
+    if int(parts[1]) != CACHE_FORMAT_VERSION:
+        raise ValueError("cache format version mismatch")
+    if int(parts[3]) != len(payload) or int(parts[2], 16) != zlib.crc32(payload):
+        raise ValueError("cache payload truncated or corrupt")
+    return json.loads(payload.decode("utf-8"))
+
+def write_cache_json(path, data):
+    """Atomically write data to a checksummed JSON cache file."""
+    atomic_write(path, encode_cache_blob(data))
+
+def read_cache_json(path, debug=False):
+    """Read a checksummed JSON cache file.
+    
+    Returns:
+        The cached data, or None if the file is missing or corrupt.
+        Corrupt files are removed so the caller rebuilds them.
+    """
+    try:
+        with open(path, "rb") as f:
+            blob = f.read()
+    except OSError:
+        return None
+    try:
+        return decode_cache_blob(blob)
+    except (ValueError, UnicodeDecodeError):
+        if debug:
+            sys.stderr.write(f"DEBUG: Discarding corrupt cache file {path}\n")
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+        return None
+
+@contextlib.contextmanager
+def cache_lock(name, timeout=0.05, shared=False):
+    """Hold the fcntl advisory lock locks/<name>.lock for the duration of the block.
+    
+    Never waits longer than timeout seconds. Yields True if the lock was
+    acquired and False otherwise; callers decide whether to proceed unlocked,
+    use stale data or skip the work. Without fcntl (Windows) always yields True.
+    """
+    if fcntl is None:
+        yield True
+        return
+    
+    fd = os.open(get_cache_path("locks", f"{name}.lock"), os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        mode = (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | fcntl.LOCK_NB
+        deadline = time.monotonic() + timeout
+        delay = 0.0005
+        acquired = False
+        while True:
+            try:
+                fcntl.flock(fd, mode)
+                acquired = True
+                break
+            except OSError:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                time.sleep(min(delay, remaining))
+                delay = min(delay * 2, 0.01)
+        yield acquired
+    finally:
+        # Closing the descriptor releases the lock
+        os.close(fd)
+
+def find_git_dir(cwd):
+    """Locate the .git directory for cwd without running git.
+    
+    Walks up from cwd looking for a .git directory or a .git file
+    (worktrees/submodules, "gitdir: <path>"). Returns the path or None.
+    """
+    path = os.path.abspath(cwd)
+    while True:
+        candidate = os.path.join(path, ".git")
+        if os.path.isdir(candidate):
+            return candidate
+        if os.path.isfile(candidate):
+            try:
+                with open(candidate, "r") as f:
+                    content = f.read().strip()
+                if content.startswith("gitdir:"):
+                    git_dir = content[len("gitdir:"):].strip()
+                    return os.path.normpath(os.path.join(path, git_dir))
+            except OSError:
+                pass
+            return None
+        parent = os.path.dirname(path)
+        if parent == path:
+            return None
+        path = parent
+
+def provide_git(input_data, debug=False):
+    """Git provider: branch, modified file count, upstream divergence, stashes and operation state for the payload's cwd."""
+    return extract_git_status(input_data, debug)
+
+def get_transcript_checkpoint_path(transcript_path):
+    """Return the cache path of the incremental state checkpoint for a transcript."""
+    digest = hashlib.sha1(os.path.abspath(transcript_path).encode("utf-8")).hexdigest()[:16]
+    return get_cache_path("sessions", f"t-{digest}.transcript.json")
+
+def load_transcript_state(transcript_path, debug=False, publish=False):
+    """Return the transcript's incremental state, caught up to the end of the file.
+    
+    Resumes from the cached checkpoint, so each call only parses entries
+    appended since the previous one, and saves the checkpoint if it advanced.
+    
+    Args:
+        transcript_path: Path to the transcript
+        debug: Enable debug output
+        publish: Push new usage to the cross-session rollup. Only the status
+                 line's own transcript should; analysing a copy or an archive
+                 would count its usage again under another key.
+    
+    Returns:
+        The state, or None if there is no readable transcript
+    """
+    if not transcript_path or not os.path.exists(transcript_path):
+        if debug:
+            sys.stderr.write(f"DEBUG: No transcript at: {transcript_path}\n")
+        return None
+    
+    checkpoint_path = get_transcript_checkpoint_path(transcript_path)
+    checkpoint = read_cache_json(checkpoint_path, debug=debug)
+    
+    def save_progress(state):
+        # Long catch-ups (a resumed session) are checkpointed as they go, so work cut
+        # short by the deadline or by exit is resumed rather than repeated
+        try:
+            write_cache_json(checkpoint_path, state)
+        except OSError as e:
+            if debug:
+                sys.stderr.write(f"DEBUG: Could not save transcript checkpoint: {e}\n")
+    
+    try:
+        state = update_transcript_state(transcript_path, checkpoint, debug=debug, progress=save_progress)
+    except (PermissionError, IOError) as e:
+        # File access errors
+        if debug:
+            sys.stderr.write(f"DEBUG: Cannot access transcript file: {e}\n")
+        return None
+    
+    if publish and state["rollup_offset"] != state["offset"]:
+        # Share this transcript's new usage with the cross-session rollup
+        if push_usage_rollup(os.path.basename(checkpoint_path).split(".")[0], state, debug=debug):
+            state["rollup_offset"] = state["offset"]
+    
+    if checkpoint is None or state["offset"] != checkpoint.get("offset") or state["inode"] != checkpoint.get("inode") \
+            or state["rollup_offset"] != checkpoint.get("rollup_offset"):
+        try:
+            write_cache_json(checkpoint_path, state)
+        except OSError as e:
+            if debug:
+                sys.stderr.write(f"DEBUG: Could not save transcript checkpoint: {e}\n")
+    return state
+
+def provide_transcript(input_data, debug=False):
+    """Transcript provider: token totals, cost and performance metrics.
+    
+    Returns:
+        Dict of JSON-serializable metrics (empty if there is no transcript)
+    """
+    state = load_transcript_state(input_data.get("transcript_path", None), debug=debug, publish=True)
+    if state is None:
+        return {}
     
     if debug:
-        sys.stderr.write(f"DEBUG: Input data keys: {list(input_data.keys())}\n")
-        sys.stderr.write(f"DEBUG: Model: {input_data.get('model', 'None')}\n")
-        sys.stderr.write(f"DEBUG: Transcript path: {input_data.get('transcript_path', 'None')}\n")
-        sys.stderr.write(f"DEBUG: CWD: {input_data.get('cwd', 'None')}\n")
+        sys.stderr.write(f"DEBUG: Transcript entries ingested: {state['entries']}\n")
+        sys.stderr.write(f"DEBUG: Token totals: {state['tokens']}\n")
+        if state["model_costs"]:
+            log_model_costs(state)
+        for item in state["cache_break_log"]:
+            sys.stderr.write(f"DEBUG: Cache break ({item['reason']}) at {item['time']} after {item['parent_uuid']}: "
+                             f"{item['tokens']} tokens, ${item['cost']:.4f}\n")
     
-    # Extract model info
-    model_info = extract_model_info(input_data)
+    return get_transcript_metrics(state)
+
+# Evenly spaced blocks (and bytes per block) read by the transcript estimator
+SAMPLE_BLOCKS = 64
+SAMPLE_BLOCK_BYTES = 16 * 1024
+
+# Additive transcript metrics extrapolated from the sample, and the fields showing them (cost is
+# marked in cost_formatted); rates and means are used as sampled
+SAMPLED_TOTALS = ("input_tokens", "output_tokens", "cache_creation_tokens", "cache_read_tokens", "context_size",
+                  "cost", "main_cost", "subagent_cost", "main_tokens", "subagent_tokens", "subagents",
+                  "message_count", "cache_breaks", "cache_break_tokens", "cache_break_cost")
+ESTIMATED_FIELDS = ("input", "output", "tokens", "subagent-cost", "perf-message-count", "cache-breaks")
+
+def get_transcript_backlog(transcript_path, debug=False):
+    """Return how many bytes of a plain transcript its checkpoint has not ingested yet.
+    
+    Compressed transcripts cannot be sampled by seeking and report 0.
+    """
+    if not transcript_path or get_transcript_codec(transcript_path):
+        return 0
+    try:
+        size = os.stat(transcript_path)
+    except OSError:
+        return 0
+    checkpoint = read_cache_json(get_transcript_checkpoint_path(transcript_path), debug=debug) or {}
+    if (checkpoint.get("version") != TRANSCRIPT_STATE_VERSION or checkpoint.get("inode") != size.st_ino
+            or checkpoint.get("offset", 0) > size.st_size):
+        return size.st_size
+    return size.st_size - checkpoint.get("offset", 0)
+
+def sample_transcript_state(transcript_path, blocks=SAMPLE_BLOCKS, block_bytes=SAMPLE_BLOCK_BYTES, debug=False):
+    """Ingest evenly spaced blocks of a plain transcript into a fresh state.
+    
+    Each block is trimmed to whole lines. The first block starts at the
+    beginning of the file and the last one ends at its end, so the session's
+    first and last timestamps are exact.
+    
+    Returns:
+        Tuple of (state, list of (bytes, cost) per block, file size)
+    
+    Raises:
+        OSError: If the transcript cannot be read
+    """
+    state = new_transcript_state()
+    samples = []
+    with open(transcript_path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if not size:
+            return state, samples, size
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if size <= blocks * block_bytes:
+                spans = [(0, size)]
+            else:
+                step = (size - block_bytes) / (blocks - 1)
+                spans = [(int(i * step), int(i * step) + block_bytes) for i in range(blocks)]
+            for start, end in spans:
+                if start:
+                    newline = data.find(b"\n", start, end)
+                    if newline < 0:
+                        continue
+                    start = newline + 1
+                if end < size:
+                    end = data.rfind(b"\n", start, end) + 1
+                if end <= start:
+                    continue
+                cost = state["cost"]
+                for line in data[start:end].split(b"\n"):
+                    ingest_transcript_line(state, line, debug=debug)
+                samples.append((end - start, state["cost"] - cost))
+    return state, samples, size
+
+def estimate_transcript_metrics(transcript_path, blocks=SAMPLE_BLOCKS, block_bytes=SAMPLE_BLOCK_BYTES, debug=False):
+    """Estimate a transcript's metrics from evenly spaced samples, without reading it all.
     
+    Additive totals (SAMPLED_TOTALS, per-model cost) are scaled by file size
+    over sampled bytes, a ratio estimator; rates, means and quantiles are
+    taken from the sample. estimate_error is the 95% relative error bound of
+    the cost, from the spread of cost per byte across blocks.
+    
+    Returns:
+        Dict of metrics as from get_transcript_metrics() plus estimated=True
+        (empty if the transcript cannot be read or has no entries)
+    """
+    started = time.perf_counter()
+    try:
+        state, samples, size = sample_transcript_state(transcript_path, blocks, block_bytes, debug=debug)
+    except (OSError, ValueError) as e:
+        if debug:
+            sys.stderr.write(f"DEBUG: Cannot sample transcript: {e}\n")
+        return {}
+    metrics = get_transcript_metrics(state)
+    sampled = sum(length for length, _ in samples)
+    if not metrics or not sampled:
+        return {}
+    
+    scale = size / sampled
+    for key in SAMPLED_TOTALS:
+        if key in metrics:
+            metrics[key] = metrics[key] * scale if isinstance(metrics[key], float) else round(metrics[key] * scale)
+    metrics["model_costs"] = {model_id: cost * scale for model_id, cost in metrics["model_costs"].items()}
+    metrics["estimated"] = True
+    metrics["sampled_fraction"] = sampled / size
+    
+    count = len(samples)
+    rate = state["cost"] / sampled
+    if count > 1 and rate > 0 and sampled < size:
+        residuals = sum((cost - rate * length) ** 2 for length, cost in samples)
+        standard_error = math.sqrt(residuals / (count * (count - 1)) * (1 - sampled / size)) / (sampled / count)
+        metrics["estimate_error"] = 1.96 * standard_error / rate
     if debug:
-        sys.stderr.write(f"DEBUG: Model info: {model_info}\n")
+        sys.stderr.write(f"DEBUG: Estimated transcript from {count} blocks ({sampled} of {size} bytes) in "
+                         f"{(time.perf_counter() - started) * 1000:.1f}ms, error bound {metrics.get('estimate_error')}\n")
+    return metrics
+
+# Rollup retention: local days kept for "today" and hours kept for the usage window
+ROLLUP_DAYS = 8
+ROLLUP_HOURS = 24
+
+# Length of a usage window in hours
+USAGE_WINDOW_HOURS = 5
+
+def push_usage_rollup(transcript_key, state, debug=False):
+    """Publish a transcript's per-day and per-hour usage to the shared rollup.
+    
+    The rollup stores each transcript's own bucket totals (not increments),
+    so pushing is idempotent: a rebuilt checkpoint or a retried push can
+    never double-count. Old buckets are pruned from both the session state
+    and the rollup, keeping both small.
+    
+    Returns:
+        True if the rollup was updated, False if the lock was busy
+    """
+    now = time.time()
+    oldest_day = datetime.fromtimestamp(now - ROLLUP_DAYS * 86400).strftime("%Y-%m-%d")
+    oldest_hour = int(now // 3600) - ROLLUP_HOURS
+    state["daily"] = {day: bucket for day, bucket in state["daily"].items() if day >= oldest_day}
+    state["hourly"] = {hour: bucket for hour, bucket in state["hourly"].items() if int(hour) >= oldest_hour}
+    
+    rollup_path = get_cache_path("shared", "usage-rollup.json")
+    with cache_lock("usage-rollup") as acquired:
+        if not acquired:
+            if debug:
+                sys.stderr.write("DEBUG: Usage rollup lock busy, will retry next refresh\n")
+            return False
+        rollup = read_cache_json(rollup_path, debug=debug) or {"days": {}, "hours": {}}
+        for section, buckets in (("days", state["daily"]), ("hours", state["hourly"])):
+            for bucket_key, bucket in buckets.items():
+                rollup[section].setdefault(bucket_key, {})[transcript_key] = bucket
+        rollup["days"] = {day: v for day, v in rollup["days"].items() if day >= oldest_day}
+        rollup["hours"] = {hour: v for hour, v in rollup["hours"].items() if int(hour) >= oldest_hour}
+        write_cache_json(rollup_path, rollup)
+    return True
+
+def provide_usage(input_data, debug=False):
+    """Usage provider: today's spend and the current 5-hour window across all sessions.
+    
+    Reads only the shared rollup - never other sessions' transcripts. The
+    current window starts at the first active hour after the previous
+    window ended (windows are tracked at hour granularity).
+    """
+    rollup = read_cache_json(get_cache_path("shared", "usage-rollup.json"), debug=debug) or {}
+    now = time.time()
+    today = datetime.fromtimestamp(now).strftime("%Y-%m-%d")
+    usage = {
+        "spend_today": sum(b["cost"] for b in rollup.get("days", {}).get(today, {}).values()),
+        "window_tokens": 0,
+        "window_cost": 0.0,
+        "window_remaining": 0.0
+    }
+    
+    hours = {int(hour): sessions for hour, sessions in rollup.get("hours", {}).items()}
+    window_start = None
+    for hour in sorted(hours):
+        if window_start is None or hour >= window_start + USAGE_WINDOW_HOURS:
+            window_start = hour
+    if window_start is not None and now < (window_start + USAGE_WINDOW_HOURS) * 3600:
+        for hour in range(window_start, window_start + USAGE_WINDOW_HOURS):
+            for bucket in hours.get(hour, {}).values():
+                usage["window_tokens"] += bucket["tokens"]
+                usage["window_cost"] += bucket["cost"]
+        usage["window_remaining"] = (window_start + USAGE_WINDOW_HOURS) * 3600 - now
+    return usage
+
+# Bytes first read from the end of the transcript when looking for the last cache use, and the most ever read
+TRANSCRIPT_TAIL_BYTES = 64 * 1024
+TRANSCRIPT_TAIL_LIMIT = 4 * 1024 * 1024
+
+def find_last_cache_use(transcript_path):
+    """Find the last assistant turn that wrote or read the prompt cache.
+    
+    Only the end of the transcript is read: a small tail first, growing
+    up to TRANSCRIPT_TAIL_LIMIT bytes if it holds no such turn, so the cost
+    does not depend on the transcript's length.
+    
+    Returns:
+        Tuple of (turn time as epoch seconds, cache TTL in seconds), or None
+    
+    Raises:
+        OSError: If the transcript cannot be read
+    """
+    with open(transcript_path, "rb") as f:
+        size = f.seek(0, os.SEEK_END)
+        window = TRANSCRIPT_TAIL_BYTES
+        while True:
+            start = max(0, size - window)
+            f.seek(start)
+            lines = f.read(size - start).split(b"\n")
+            if start > 0:
+                lines = lines[1:]  # Starts mid-line
+            for line in reversed(lines):
+                if b'"cache_' not in line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                # Subagents keep their own prompt caches; only the main conversation's matters here
+                if not isinstance(entry, dict) or entry.get("type") != "assistant" or entry.get("isSidechain"):
+                    continue
+                message = entry.get("message")
+                usage = message.get("usage") if isinstance(message, dict) else None
+                if not isinstance(usage, dict) or not (usage.get("cache_creation_input_tokens") or usage.get("cache_read_input_tokens")):
+                    continue
+                entry_time = parse_entry_time(entry)
+                if entry_time is None:
+                    continue
+                # A turn that wrote to the 1-hour cache keeps the prefix for an hour; reads are assumed 5-minute
+                creation = usage.get("cache_creation")
+                extended = isinstance(creation, dict) and creation.get("ephemeral_1h_input_tokens", 0) > 0
+                return entry_time, PROMPT_CACHE_TTL_EXTENDED if extended else PROMPT_CACHE_TTL
+            if start == 0 or window >= TRANSCRIPT_TAIL_LIMIT:
+                return None
+            window *= 4
+
+def provide_cache_ttl(input_data, debug=False):
+    """Cache TTL provider: when the session's prompt cache expires, from a tail read.
     
-    # Extract git status
-    git_info = extract_git_status(input_data)
+    Compressed transcripts are archives of finished sessions and are skipped.
     
+    Returns:
+        Dict with cache_expires_at (epoch seconds) and cache_ttl, empty if unknown
+    """
+    transcript_path = input_data.get("transcript_path")
+    if not transcript_path or get_transcript_codec(transcript_path) or not os.path.isfile(transcript_path):
+        return {}
+    try:
+        last_use = find_last_cache_use(transcript_path)
+    except OSError as e:
+        if debug:
+            sys.stderr.write(f"DEBUG: Cannot read transcript tail: {e}\n")
+        return {}
+    if last_use is None:
+        return {}
     if debug:
-        sys.stderr.write(f"DEBUG: Git info: {git_info}\n")
+        sys.stderr.write(f"DEBUG: Last prompt cache use at {last_use[0]}, TTL {last_use[1]}s\n")
+    return {"cache_expires_at": last_use[0] + last_use[1], "cache_ttl": last_use[1]}
+
+# Metric providers, run concurrently under --deadline-ms
+PROVIDERS = {
+    "git": provide_git,
+    "transcript": provide_transcript,
+    "usage": provide_usage,
+    "cache_ttl": provide_cache_ttl
+}
+
+# Which provider each field's content comes from (folder and model come from the payload)
+FIELD_SOURCES = {
+    "badge": "transcript",
+    "git": "git",
+    "perf-cache-rate": "transcript",
+    "perf-response-time": "transcript",
+    "perf-response-p50": "transcript",
+    "perf-response-p95": "transcript",
+    "perf-session-time": "transcript",
+    "perf-message-count": "transcript",
+    "perf-throughput": "transcript",
+    "perf-slowest-tool": "transcript",
+    "perf-subagents": "transcript",
+    "perf-all-metrics": "transcript",
+    "cache-ttl": "cache_ttl",
+    "cache-breaks": "transcript",
+    "input": "transcript",
+    "output": "transcript",
+    "tokens": "transcript",
+    "cost": "transcript",
+    "subagent-cost": "transcript",
+    "spend-today": "usage",
+    "window-tokens": "usage"
+}
+
+# Fields whose value changes with the clock alone (plugin fields too, through their TTL);
+# --watch re-renders them every WATCH_TICK seconds even if no watched file changed
+TIME_BASED_FIELDS = ("cache-ttl", "spend-today", "window-tokens")
+WATCH_TICK = 1.0
+
+# Shown in place of a field whose provider missed the deadline and has no cached value
+PENDING_MARKER = "…"
+
+# Seconds after which a deferred (--async-fields) value is refreshed even if its inputs look unchanged
+ASYNC_REFRESH_AFTER = 10
+
+# Module load time - the command-line --deadline-ms budget is measured from here
+START_TIME = time.monotonic()
+
+# Fields contributed by plugins: {field name: spec}, see register_field()
+PLUGIN_FIELDS = {}
+
+# Entry point group scanned for installed plugin packages
+PLUGIN_ENTRY_POINT_GROUP = "pyccsl.plugins"
+
+# Plugin inputs derived by pyccsl rather than taken from the payload
+PLUGIN_DERIVED_INPUTS = ("git_branch", "git_head")
+
+_plugins_loaded = False
+
+def get_plugin_dir():
+    """Return the directory scanned for plugin files (*.py)."""
+    plugin_dir = os.environ.get("PYCCSL_PLUGIN_DIR")
+    if plugin_dir:
+        return plugin_dir
+    config_home = os.environ.get("XDG_CONFIG_HOME") or os.path.join(os.path.expanduser("~"), ".config")
+    return os.path.join(config_home, "pyccsl", "plugins")
+
+def register_field(name, provider, inputs=("cwd",), ttl=30, timeout=0.5, expensive=False, color=None):
+    """Register a plugin field. Passed to each plugin's register() function.
+    
+    Args:
+        name: Field name used in the field list (must not shadow a built-in field)
+        provider: Callable taking a dict of the declared inputs and returning
+                  the text to display, or None to hide the field
+        inputs: Payload keys (e.g. "cwd", "session_id") and derived inputs
+                ("git_branch", "git_head") the result depends on; results
+                are cached per distinct input values
+        ttl: Seconds a result stays fresh
+        timeout: Seconds an inline call may take before its cached value is
+                 used instead and the call is finished in the background
+        expensive: Always refresh in a background process, never inline
+        color: Theme color category ("folder", "git", "model", "input",
+               "output" or "cost"); uncolored if None
+    """
+    if name in FIELD_ORDER and name not in PLUGIN_FIELDS:
+        raise ValueError(f"Plugin field {name} shadows a built-in field")
+    if not callable(provider):
+        raise ValueError(f"Plugin field {name} has no callable provider")
+    PLUGIN_FIELDS[name] = {
+        "name": name,
+        "provider": provider,
+        "inputs": tuple(inputs),
+        "ttl": float(ttl),
+        "timeout": float(timeout),
+        "expensive": bool(expensive),
+        "color": color
+    }
+    source = f"plugin:{name}"
+    PROVIDERS[source] = lambda input_data, debug=False: provide_plugin(name, input_data, debug)
+    FIELD_SOURCES[name] = source
+    if name not in FIELD_ORDER:
+        # Plugin fields display after the built-in ones, in registration order
+        FIELD_ORDER.append(name)
+
+def load_plugins(debug=False):
+    """Import plugins from the plugin directory and installed entry points, once.
     
-    # Load transcript if provided
-    transcript_path = input_data.get("transcript_path", None)
-    transcript_entries = load_transcript(transcript_path, debug=debug)
+    A plugin is a module with a register(register_field) function. A plugin
+    that fails to load is skipped with a warning.
+    """
+    global _plugins_loaded
+    if _plugins_loaded:
+        return
+    _plugins_loaded = True
     
-    # Calculate metrics from transcript
-    metrics = {}
+    registrars = []
+    plugin_dir = get_plugin_dir()
+    if os.path.isdir(plugin_dir):
+        import importlib.util
+        for filename in sorted(os.listdir(plugin_dir)):
+            if not filename.endswith(".py") or filename.startswith("_"):
+                continue
+            path = os.path.join(plugin_dir, filename)
+            try:
+                spec = importlib.util.spec_from_file_location(f"pyccsl_plugin_{filename[:-3]}", path)
+                module = importlib.util.module_from_spec(spec)
+                spec.loader.exec_module(module)
+                registrars.append((path, module.register))
+            except Exception as e:
+                sys.stderr.write(f"Warning: Could not load plugin {path}: {e}\n")
+    
+    try:
+        from importlib.metadata import entry_points
+        try:
+            found = entry_points(group=PLUGIN_ENTRY_POINT_GROUP)
+        except TypeError:  # Python < 3.10
+            found = entry_points().get(PLUGIN_ENTRY_POINT_GROUP, [])
+        for entry_point in found:
+            try:
+                registrars.append((entry_point.name, entry_point.load()))
+            except Exception as e:
+                sys.stderr.write(f"Warning: Could not load plugin {entry_point.name}: {e}\n")
+    except ImportError:
+        pass
+    
+    for origin, register in registrars:
+        try:
+            register(register_field)
+        except Exception as e:
+            sys.stderr.write(f"Warning: Plugin {origin} failed to register: {e}\n")
     
     if debug:
-        sys.stderr.write(f"DEBUG: Transcript entries loaded: {len(transcript_entries)}\n")
+        sys.stderr.write(f"DEBUG: Plugin fields: {list(PLUGIN_FIELDS)}\n")
+
+def get_plugin_inputs(spec, input_data):
+    """Return the declared inputs of a plugin field for this payload."""
+    inputs = {}
+    for name in spec["inputs"]:
+        if name in PLUGIN_DERIVED_INPUTS:
+            git_dir = find_git_dir(input_data.get("cwd") or os.getcwd())
+            branch, head = read_git_head(git_dir) if git_dir else (None, None)
+            inputs[name] = branch if name == "git_branch" else head
+        else:
+            inputs[name] = input_data.get(name)
+    return inputs
+
+def get_plugin_cache_key(inputs):
+    """Return the TTL cache key for a set of plugin inputs."""
+    return hashlib.sha1(json.dumps(inputs, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+def read_plugin_value(name, cache_key, debug=False):
+    """Return the cached {"value", "at"} item of a plugin field, or None."""
+    values = read_cache_json(get_cache_path("shared", f"plugin-{name}.json"), debug=debug) or {}
+    item = values.get(cache_key)
+    return item if isinstance(item, dict) else None
+
+def store_plugin_value(name, cache_key, value, ttl):
+    """Store a plugin result in the field's shared TTL cache, pruning expired entries."""
+    path = get_cache_path("shared", f"plugin-{name}.json")
+    with cache_lock(f"plugin-{name}") as acquired:
+        if not acquired:
+            return
+        now = time.time()
+        values = read_cache_json(path) or {}
+        values = {k: v for k, v in values.items() if isinstance(v, dict) and now - v.get("at", 0) < ttl}
+        values[cache_key] = {"value": value, "at": now}
+        write_cache_json(path, values)
+
+def refresh_plugin_in_background(name, cache_key, input_data):
+    """Start a background refresh of a plugin field unless one is already running."""
+    with cache_lock(f"plugin-{name}-{cache_key}.refresh", timeout=0) as acquired:
+        if not acquired:
+            return
+    spawn_background(["_plugin", name], input_data)
+
+def provide_plugin(name, input_data, debug=False):
+    """Plugin provider: the field's text, from its TTL cache or a bounded call.
     
-    if transcript_entries:
-        # Calculate token usage
-        token_totals = calculate_token_usage(transcript_entries)
-        metrics.update(token_totals)
-        
-        if debug:
-            sys.stderr.write(f"DEBUG: Token totals: {token_totals}\n")
-        
-        # Calculate tokens (all non-cached tokens: input + cache_creation + output)
-        # This represents the actual token usage that counts toward context
-        context_size = (token_totals.get("input_tokens", 0) + 
-                       token_totals.get("cache_creation_tokens", 0) + 
-                       token_totals.get("output_tokens", 0))
-        metrics["context_size"] = context_size  # Keep internal name for compatibility
-        
-        # Calculate cost using per-entry models
-        cost = calculate_total_cost(transcript_entries, debug=debug)
-        metrics["cost"] = cost
-        metrics["cost_formatted"] = format_cost(cost)
+    Fresh cached values are returned directly. Otherwise cheap plugins are
+    called inline for at most their timeout; expensive plugins, and cheap
+    ones that overrun, are refreshed by a detached process while the last
+    cached value (or the pending marker) is shown.
+    
+    Returns:
+        Dict with "text" (None to hide the field) and "pending"
+    """
+    spec = PLUGIN_FIELDS[name]
+    inputs = get_plugin_inputs(spec, input_data)
+    cache_key = get_plugin_cache_key(inputs)
+    cached = read_plugin_value(name, cache_key, debug=debug)
+    if cached and time.time() - cached.get("at", 0) < spec["ttl"]:
+        return {"text": cached["value"], "pending": False}
+    
+    if not spec["expensive"]:
+        result = {}
         
-        # Calculate performance metrics
-        perf_metrics = calculate_performance_metrics(transcript_entries, token_totals, debug=debug)
-        metrics.update(perf_metrics)
+        def call():
+            try:
+                result["value"] = spec["provider"](dict(inputs))
+            except Exception as e:
+                result["error"] = e
         
-        # Calculate performance badge
-        if "cache_hit_rate" in metrics and "avg_response_time" in metrics:
-            # Badge should be colored unless theme is "none"
-            colored = config["theme"] != "none"
-            is_powerline = config["style"] == "powerline"
-            badge = calculate_performance_badge(
-                metrics["cache_hit_rate"],
-                metrics["avg_response_time"],
-                config["cache_thresholds"],
-                config["response_thresholds"],
-                colored=colored,
-                powerline=is_powerline,
-                no_emoji=config["no_emoji"]
-            )
-            metrics["badge"] = badge
+        thread = threading.Thread(target=call, name=f"pyccsl-plugin-{name}", daemon=True)
+        thread.start()
+        thread.join(spec["timeout"])
+        if "value" in result:
+            value = None if result["value"] is None else str(result["value"])
+            store_plugin_value(name, cache_key, value, spec["ttl"])
+            return {"text": value, "pending": False}
+        if "error" in result:
             if debug:
-                sys.stderr.write(f"DEBUG: Badge created: {badge[:20]}...\n")
-        elif debug:
-            has_cache = "cache_hit_rate" in metrics
-            has_response = "avg_response_time" in metrics
-            sys.stderr.write(f"DEBUG: Badge not created - cache_hit_rate:{has_cache}, avg_response_time:{has_response}\n")
+                sys.stderr.write(f"DEBUG: Plugin {name} failed: {result['error']}\n")
+            return {"text": cached["value"] if cached else None, "pending": False}
+        if debug:
+            sys.stderr.write(f"DEBUG: Plugin {name} exceeded its {spec['timeout']}s timeout\n")
     
-    # Add git info to metrics
-    if git_info["branch"]:
-        metrics["git_info"] = git_info
+    refresh_plugin_in_background(name, cache_key, input_data)
+    if cached:
+        return {"text": cached["value"], "pending": False}
+    return {"text": None, "pending": True}
+
+def run_plugin_refresh(argv):
+    """Internal command: call one plugin field's provider and cache the result.
     
-    # Format and output (pass metrics for field display)
-    output = format_output(config, model_info, input_data, metrics)
-    # Only add reset if colors were used (to prevent terminal color bleed)
-    if config["theme"] != "none":
-        print(output + RESET)
-    else:
-        print(output)
+    Reads the status payload from stdin. The call is not time-bounded.
+    """
+    if not argv:
+        return 1
+    name = argv[0]
+    load_plugins()
+    if name not in PLUGIN_FIELDS:
+        return 1
+    spec = PLUGIN_FIELDS[name]
+    input_data = read_input()
+    inputs = get_plugin_inputs(spec, input_data)
+    cache_key = get_plugin_cache_key(inputs)
+    
+    with cache_lock(f"plugin-{name}-{cache_key}.refresh", timeout=0) as acquired:
+        if not acquired:
+            return 0
+        try:
+            value = spec["provider"](dict(inputs))
+        except Exception as e:
+            sys.stderr.write(f"Warning: Plugin {name} failed: {e}\n")
+            return 4
+        store_plugin_value(name, cache_key, None if value is None else str(value), spec["ttl"])
+    return 0
+
+def get_required_providers(config):
+    """Return the provider names needed for the configured fields, in PROVIDERS order."""
+    needed = {FIELD_SOURCES.get(field) for field in config["fields"]}
+    if config.get("metrics_dir"):
+        # Exported metrics come from the transcript whether or not they are displayed
+        needed.add("transcript")
+    if config.get("format", "text") != "text":
+        # JSON consumers get token, cost, timing and git metrics whatever the displayed fields
+        needed.update(("transcript", "git"))
+    return [name for name in PROVIDERS if name in needed]
+
+def get_deferred_providers(config, names):
+    """Return the providers that --async-fields moves to a background worker.
+    
+    A provider is deferred only if every configured field that needs it is
+    listed; a provider that must run inline anyway keeps its fields fresh.
+    """
+    async_fields = config.get("async_fields") or []
+    if not async_fields:
+        return []
+    deferred = []
+    for name in names:
+        fields = [field for field in config["fields"] if FIELD_SOURCES.get(field) == name]
+        if fields and all(field in async_fields or "all" in async_fields for field in fields):
+            deferred.append(name)
+    return deferred
+
+def get_provider_memo_key(name, input_data):
+    """Return a key that changes whenever the provider's result could change.
+    
+    Git results depend on cwd and the repository's HEAD/index, refs and
+    operation markers; transcript results on the transcript file's stat
+    signature.
+    """
+    if name == "usage":
+        return (name, stat_signature([get_cache_path("shared", "usage-rollup.json")]))
+    if name.startswith("plugin:"):
+        field = name[len("plugin:"):]
+        return (name, get_plugin_cache_key(get_plugin_inputs(PLUGIN_FIELDS[field], input_data)))
+    if name == "git":
+        cwd = input_data.get("cwd") or os.getcwd()
+        git_dir = find_git_dir(cwd)
+        paths = []
+        if git_dir:
+            common_dir = get_git_common_dir(git_dir)
+            paths = [os.path.join(git_dir, marker) for marker in ("HEAD", "index", "MERGE_HEAD", "rebase-merge", "rebase-apply")]
+            # Fetches and stashes move refs without touching HEAD or the index
+            paths += [os.path.join(common_dir, ref) for ref in ("packed-refs", "FETCH_HEAD", os.path.join("logs", "refs", "stash"))]
+        return (name, cwd, stat_signature(paths))
+    transcript_path = input_data.get("transcript_path") or ""
+    return (name, transcript_path, stat_signature([transcript_path]))
+
+def run_providers(names, input_data, deadline_ms=0, debug=False, memo=None, started=None):
+    """Run the named providers, bounded by an overall deadline.
+    
+    Without a deadline providers run sequentially in-process. With one, each
+    runs in a daemon thread and gets whatever remains of the budget (minus a
+    small reserve for formatting); late providers are abandoned. A provider
+    that raises is left out of the results (logged with debug).
+    
+    Args:
+        memo: Optional dict shared across calls (batch mode); results are
+              reused while get_provider_memo_key() is unchanged
+        started: time.monotonic() value the deadline is measured from
+                 (default: now)
+    
+    Returns:
+        Tuple of (results dict, list of provider names that missed the deadline)
+    """
+    results = {}
+    
+    def run(name):
+        try:
+            results[name] = PROVIDERS[name](input_data, debug)
+        except Exception as e:
+            if debug:
+                sys.stderr.write(f"DEBUG: Provider {name} failed: {e}\n")
+    
+    if memo is not None:
+        for name in names:
+            memo_key = get_provider_memo_key(name, input_data)
+            if memo_key in memo:
+                results[name] = memo[memo_key]
+                continue
+            run(name)
+            # Failures are not memoized, so the next payload retries the provider
+            if name in results:
+                memo[memo_key] = results[name]
+        return results, []
+    
+    if not deadline_ms:
+        for name in names:
+            run(name)
+        return results, []
+    
+    if started is None:
+        started = time.monotonic()
+    
+    threads = []
+    for name in names:
+        thread = threading.Thread(target=run, args=(name,), name=f"pyccsl-{name}", daemon=True)
+        thread.start()
+        threads.append(thread)
+    
+    reserve = min(0.005, deadline_ms / 10000)
+    deadline = started + deadline_ms / 1000 - reserve
+    for thread in threads:
+        thread.join(max(0.0, deadline - time.monotonic()))
+    
+    missed = [name for name in names if name not in results]
+    if debug:
+        elapsed_ms = (time.monotonic() - started) * 1000
+        sys.stderr.write(f"DEBUG: Providers done at {elapsed_ms:.1f}ms, missed deadline: {missed}\n")
+    return results, missed
+
+def spawn_background(command_args, input_data):
+    """Start a detached pyccsl subcommand that receives input_data on stdin.
+    
+    The child runs in its own session with no inherited output, so the
+    caller can exit immediately.
+    
+    Returns:
+        True if the process was started
+    """
+    try:
+        process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__)] + list(command_args),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            close_fds=True,
+            start_new_session=True
+        )
+        process.stdin.write(json.dumps(input_data).encode("utf-8"))
+        process.stdin.close()
+        return True
+    except (OSError, ValueError):
+        return False
+
+@contextlib.contextmanager
+def worker_slot(key, workers):
+    """Hold one of a session's background worker slots.
+    
+    Yields:
+        True if one of the session's `workers` slots was free, else False
+    """
+    for slot in range(max(1, workers)):
+        with cache_lock(f"{key}.warm-{slot}", timeout=0) as acquired:
+            if acquired:
+                yield True
+                return
+    yield False
+
+def spawn_warm(names, input_data, workers=1):
+    """Start a background _warm worker for the named providers, unless the session's worker slots are all busy."""
+    with worker_slot(get_session_key(input_data), workers) as free:
+        if not free:
+            return False
+    return spawn_background(["_warm", ",".join(names), str(workers)], input_data)
+
+def run_warm(argv):
+    """Internal command: compute providers in the background and store their values.
+    
+    Reads the status payload from stdin. Used to finish work abandoned by
+    --deadline-ms or deferred by --async-fields so the next render finds
+    fresh cached values. At most as many workers as the session allows
+    (second argument, default 1) run at once; extra ones exit immediately.
+    """
+    requested = argv[0].split(",") if argv else list(PROVIDERS)
+    workers = int(argv[1]) if len(argv) > 1 and argv[1].isdigit() else 1
+    if any(name.startswith("plugin:") for name in requested):
+        load_plugins()
+    names = [name for name in requested if name in PROVIDERS]
+    warm_providers(names, read_input(), workers)
+    return 0
+
+def warm_providers(names, input_data, workers=1):
+    """Compute the named providers and store them as the session's last-known values.
+    
+    Returns:
+        False if all of the session's worker slots were busy
+    """
+    key = get_session_key(input_data)
+    with worker_slot(key, workers) as acquired:
+        if not acquired:
+            return False
+        # Fingerprint the inputs before computing, so changes made meanwhile trigger another refresh
+        fingerprints = {name: get_provider_fingerprint(name, input_data) for name in names}
+        results, _ = run_providers(names, input_data)
+        # Background work: worth waiting for the lock rather than losing the results
+        store_provider_values(key, results, fingerprints, timeout=1.0)
+    return True
+
+def run_prewarm(argv):
+    """Build a session's caches before its first render (for a SessionStart hook).
+    
+    Takes the render's options and fields and the hook's stdin payload,
+    then detaches at once: the transcript checkpoint, git status and every
+    other provider the configuration needs are computed by a background
+    process, so session startup is never delayed.
+    
+    Returns:
+        Exit code
+    """
+    config = parse_arguments(argv)
+    input_data = read_input()
+    names = get_required_providers(config)
+    if "transcript" not in names:
+        # The transcript checkpoint is the expensive cache on resumed sessions
+        names.append("transcript")
+    
+    if not hasattr(os, "fork"):
+        spawn_background(["_warm", ",".join(names), str(config["async_workers"])], input_data)
+        return 0
+    
+    # Double fork: the hook returns as soon as the first child exists, and the
+    # worker is reparented to init in its own session with no inherited output
+    if os.fork() > 0:
+        return 0
+    os.setsid()
+    if os.fork() > 0:
+        os._exit(0)
+    devnull = os.open(os.devnull, os.O_RDWR)
+    for fd in (0, 1, 2):
+        os.dup2(devnull, fd)
+    try:
+        warm_providers(names, input_data, config["async_workers"])
+    finally:
+        os._exit(0)
+
+def get_provider_fingerprint(name, input_data):
+    """Return a short string that changes whenever the provider's result could change."""
+    return hashlib.sha1(repr(get_provider_memo_key(name, input_data)).encode("utf-8")).hexdigest()[:16]
+
+def store_provider_values(key, results, fingerprints=None, timeout=0.05):
+    """Merge provider results into the session's last-known-values cache.
+    
+    The read-modify-write holds the session's values lock, so concurrent
+    workers storing different providers never drop each other's values.
+    
+    Args:
+        fingerprints: Optional {name: get_provider_fingerprint()} of the inputs the results were computed from
+        timeout: Longest wait for the lock, in seconds
+    
+    Returns:
+        False if the lock was busy and nothing was stored
+    """
+    path = get_cache_path("sessions", f"{key}.values.json")
+    with cache_lock(f"{key}.values", timeout=timeout) as acquired:
+        if not acquired:
+            return False
+        values = read_cache_json(path) or {}
+        for name, value in results.items():
+            values[name] = {"value": value, "at": time.time(), "fingerprint": (fingerprints or {}).get(name)}
+        write_cache_json(path, values)
+    return True
+
+def load_provider_records(key, debug=False):
+    """Return the session's last-known provider records ({name: {"value", "at", "fingerprint"}})."""
+    values = read_cache_json(get_cache_path("sessions", f"{key}.values.json"), debug=debug) or {}
+    return {name: item for name, item in values.items() if isinstance(item, dict)}
+
+def load_provider_values(key, debug=False):
+    """Return the session's last-known provider values ({name: value})."""
+    return {name: item.get("value") for name, item in load_provider_records(key, debug=debug).items()}
+
+def get_git_common_dir(git_dir):
+    """Return the directory holding shared refs, config and objects (worktrees point elsewhere)."""
+    try:
+        with open(os.path.join(git_dir, "commondir"), "r") as f:
+            return os.path.normpath(os.path.join(git_dir, f.read().strip()))
+    except OSError:
+        return git_dir
+
+def resolve_git_ref(git_dir, ref, depth=0):
+    """Resolve a full ref name (e.g. refs/heads/main) from loose refs or packed-refs.
+    
+    Returns:
+        Commit sha, or None if the ref does not exist
+    """
+    common_dir = get_git_common_dir(git_dir)
+    for base in (git_dir, common_dir):
+        try:
+            with open(os.path.join(base, ref), "r") as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        if value.startswith("ref:"):
+            # Symbolic ref (e.g. refs/remotes/origin/HEAD)
+            return resolve_git_ref(git_dir, value[len("ref:"):].strip(), depth + 1) if depth < 5 else None
+        return value or None
+    try:
+        with open(os.path.join(common_dir, "packed-refs"), "r") as f:
+            for line in f:
+                parts = line.strip().split(" ", 1)
+                if len(parts) == 2 and parts[1] == ref:
+                    return parts[0]
+    except OSError:
+        pass
+    return None
+
+def read_git_head(git_dir):
+    """Resolve HEAD by reading the git directory directly.
+    
+    Returns:
+        Tuple of (branch name or None if detached, commit sha or None)
+    """
+    try:
+        with open(os.path.join(git_dir, "HEAD"), "r") as f:
+            head = f.read().strip()
+    except OSError:
+        return None, None
+    if not head.startswith("ref:"):
+        return None, head or None
+    
+    ref = head[len("ref:"):].strip()
+    branch = ref[len("refs/heads/"):] if ref.startswith("refs/heads/") else ref
+    return branch, resolve_git_ref(git_dir, ref)
+
+def read_git_upstream(git_dir, branch):
+    """Return the upstream ref of a branch from the repository config.
+    
+    Follows branch.<name>.remote and branch.<name>.merge the way git does for
+    the default fetch refspec (refs/heads/X -> refs/remotes/<remote>/X); a
+    remote of "." tracks a local branch.
+    
+    Returns:
+        Full ref name, or None if the branch has no upstream
+    """
+    section = f'branch "{branch}"'
+    current = None
+    values = {}
+    try:
+        with open(os.path.join(get_git_common_dir(git_dir), "config"), "r") as f:
+            for line in f:
+                line = line.strip()
+                if line.startswith("["):
+                    current = line[1:line.find("]")].strip()
+                elif current == section and "=" in line:
+                    name, value = line.split("=", 1)
+                    values[name.strip().lower()] = value.split("#", 1)[0].strip().strip('"')
+    except OSError:
+        return None
+    remote = values.get("remote")
+    merge = values.get("merge")
+    if not remote or not merge:
+        return None
+    if remote == ".":
+        return merge
+    if merge.startswith("refs/heads/"):
+        return f"refs/remotes/{remote}/{merge[len('refs/heads/'):]}"
+    return None
+
+def count_git_stashes(git_dir):
+    """Return the number of stash entries (lines of the refs/stash reflog)."""
+    try:
+        with open(os.path.join(get_git_common_dir(git_dir), "logs", "refs", "stash"), "rb") as f:
+            return sum(1 for line in f if line.strip())
+    except OSError:
+        return 0
+
+def read_git_operation(git_dir):
+    """Describe an in-progress rebase, merge, cherry-pick, revert or bisect.
+    
+    Labels follow git's own prompt (git-prompt.sh), e.g. "REBASE 2/5" or
+    "MERGING".
+    
+    Returns:
+        Tuple of (label or None, name of the branch being rebased or None)
+    """
+    def read(*parts):
+        try:
+            with open(os.path.join(git_dir, *parts), "r") as f:
+                return f.read().strip()
+        except OSError:
+            return ""
+    
+    for directory, step_file, total_file in (("rebase-merge", "msgnum", "end"), ("rebase-apply", "next", "last")):
+        if not os.path.isdir(os.path.join(git_dir, directory)):
+            continue
+        if directory == "rebase-merge" or os.path.exists(os.path.join(git_dir, directory, "rebasing")):
+            label = "REBASE"
+        elif os.path.exists(os.path.join(git_dir, directory, "applying")):
+            label = "AM"
+        else:
+            label = "AM/REBASE"
+        step, total = read(directory, step_file), read(directory, total_file)
+        if step and total:
+            label += f" {step}/{total}"
+        head_name = read(directory, "head-name")
+        if head_name.startswith("refs/heads/"):
+            head_name = head_name[len("refs/heads/"):]
+        return label, head_name or None
+    for marker, label in (("MERGE_HEAD", "MERGING"), ("CHERRY_PICK_HEAD", "CHERRY-PICKING"),
+                          ("REVERT_HEAD", "REVERTING"), ("BISECT_LOG", "BISECTING")):
+        if os.path.exists(os.path.join(git_dir, marker)):
+            return label, None
+    return None, None
+
+# Pack entry types (see gitformat-pack(5))
+GIT_OBJECT_TYPES = {1: "commit", 2: "tree", 3: "blob", 4: "tag"}
+GIT_OFS_DELTA = 6
+GIT_REF_DELTA = 7
+# Deepest delta chain followed when reading packed objects
+GIT_DELTA_DEPTH_LIMIT = 500
+
+def open_git_object_store(git_dir):
+    """Open the object database of a repository for read_git_object().
+    
+    Pack indexes and packs are memory-mapped so lookups only touch the pages
+    a binary search needs. Close the store with close_git_object_store().
+    """
+    objects_dir = os.path.join(get_git_common_dir(git_dir), "objects")
+    store = {"objects": objects_dir, "packs": [], "files": []}
+    pack_dir = os.path.join(objects_dir, "pack")
+    try:
+        names = sorted(name for name in os.listdir(pack_dir) if name.endswith(".idx"))
+    except OSError:
+        names = []
+    for name in names:
+        try:
+            idx_file = open(os.path.join(pack_dir, name), "rb")
+            store["files"].append(idx_file)
+            pack_file = open(os.path.join(pack_dir, name[:-len(".idx")] + ".pack"), "rb")
+            store["files"].append(pack_file)
+            idx = mmap.mmap(idx_file.fileno(), 0, access=mmap.ACCESS_READ)
+            pack = mmap.mmap(pack_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            continue
+        store["files"].extend((idx, pack))
+        # Only version 2 indexes (the default since git 1.5.2) are read
+        if idx[:8] == b"\377tOc\x00\x00\x00\x02":
+            store["packs"].append((idx, pack))
+    return store
+
+def close_git_object_store(store):
+    """Release the memory maps and files opened by open_git_object_store()."""
+    for handle in reversed(store["files"]):
+        with contextlib.suppress(Exception):
+            handle.close()
+
+def find_git_pack_offset(idx, sha):
+    """Look up an object in a version 2 pack index.
+    
+    Returns:
+        Offset of the object within the pack, or None if it is not there
+    """
+    fanout = 8
+    first = sha[0]
+    lo = int.from_bytes(idx[fanout + (first - 1) * 4:fanout + first * 4], "big") if first else 0
+    hi = int.from_bytes(idx[fanout + first * 4:fanout + first * 4 + 4], "big")
+    total = int.from_bytes(idx[fanout + 255 * 4:fanout + 256 * 4], "big")
+    names = fanout + 256 * 4
+    while lo < hi:
+        mid = (lo + hi) // 2
+        name = idx[names + mid * 20:names + mid * 20 + 20]
+        if name == sha:
+            offsets = names + total * 24
+            offset = int.from_bytes(idx[offsets + mid * 4:offsets + mid * 4 + 4], "big")
+            if offset & 0x80000000:
+                # Packs over 2GB keep a table of 64-bit offsets
+                large = offsets + total * 4 + (offset & 0x7fffffff) * 8
+                offset = int.from_bytes(idx[large:large + 8], "big")
+            return offset
+        if name < sha:
+            lo = mid + 1
+        else:
+            hi = mid
+    return None
+
+def inflate_at(data, pos, size):
+    """Decompress the zlib stream starting at pos, expecting size bytes of output."""
+    decompressor = zlib.decompressobj()
+    chunk = max(size + 64, 4096)
+    parts = []
+    while not decompressor.eof and pos < len(data):
+        parts.append(decompressor.decompress(data[pos:pos + chunk]))
+        pos += chunk
+    return b"".join(parts)
+
+def apply_git_delta(base, delta):
+    """Rebuild an object from its delta base (see gitformat-pack(5), "Deltified representation")."""
+    pos = 0
+    for _ in range(2):
+        # Source and target sizes, little-endian base-128
+        while delta[pos] & 0x80:
+            pos += 1
+        pos += 1
+    out = bytearray()
+    while pos < len(delta):
+        op = delta[pos]
+        pos += 1
+        if op & 0x80:
+            offset = size = 0
+            for i in range(4):
+                if op & (1 << i):
+                    offset |= delta[pos] << (8 * i)
+                    pos += 1
+            for i in range(3):
+                if op & (0x10 << i):
+                    size |= delta[pos] << (8 * i)
+                    pos += 1
+            out += base[offset:offset + (size or 0x10000)]
+        elif op:
+            out += delta[pos:pos + op]
+            pos += op
+        else:
+            raise ValueError("invalid delta opcode")
+    return bytes(out)
+
+def read_git_pack_object(store, pack, offset, depth=0):
+    """Read the object at offset in a pack, resolving delta chains.
+    
+    Returns:
+        Tuple of (type name, content bytes)
+    """
+    if depth > GIT_DELTA_DEPTH_LIMIT:
+        raise ValueError("delta chain too deep")
+    c = pack[offset]
+    kind = (c >> 4) & 7
+    size = c & 15
+    shift = 4
+    pos = offset + 1
+    while c & 0x80:
+        c = pack[pos]
+        pos += 1
+        size |= (c & 0x7f) << shift
+        shift += 7
+    if kind == GIT_OFS_DELTA:
+        c = pack[pos]
+        pos += 1
+        distance = c & 0x7f
+        while c & 0x80:
+            c = pack[pos]
+            pos += 1
+            distance = ((distance + 1) << 7) | (c & 0x7f)
+        base_type, base = read_git_pack_object(store, pack, offset - distance, depth + 1)
+        return base_type, apply_git_delta(base, inflate_at(pack, pos, size))
+    if kind == GIT_REF_DELTA:
+        base_object = read_git_object(store, pack[pos:pos + 20].hex(), depth + 1)
+        if base_object is None:
+            raise ValueError("missing delta base")
+        return base_object[0], apply_git_delta(base_object[1], inflate_at(pack, pos + 20, size))
+    if kind not in GIT_OBJECT_TYPES:
+        raise ValueError(f"unknown pack object type {kind}")
+    return GIT_OBJECT_TYPES[kind], inflate_at(pack, pos, size)
+
+def read_git_object(store, sha, depth=0):
+    """Read an object from loose storage or any pack.
+    
+    Returns:
+        Tuple of (type name, content bytes), or None if the object is missing
+        (e.g. beyond a shallow clone's boundary)
+    """
+    try:
+        with open(os.path.join(store["objects"], sha[:2], sha[2:]), "rb") as f:
+            raw = zlib.decompress(f.read())
+        header, _, content = raw.partition(b"\0")
+        return header.split(b" ", 1)[0].decode("ascii"), content
+    except OSError:
+        pass
+    binary = bytes.fromhex(sha)
+    for idx, pack in store["packs"]:
+        offset = find_git_pack_offset(idx, binary)
+        if offset is not None:
+            return read_git_pack_object(store, pack, offset, depth)
+    return None
+
+def read_git_commit(store, sha):
+    """Return (committer timestamp, parent shas) of a commit, or None if it is missing."""
+    found = read_git_object(store, sha)
+    if found is None or found[0] != "commit":
+        return None
+    timestamp = 0
+    parents = []
+    for line in found[1].split(b"\n"):
+        if not line:
+            break
+        if line.startswith(b"parent "):
+            parents.append(line[len(b"parent "):].decode("ascii"))
+        elif line.startswith(b"committer "):
+            with contextlib.suppress(ValueError, IndexError):
+                timestamp = int(line.rsplit(b" ", 2)[1])
+    return timestamp, parents
+
+# Most commits visited when counting ahead/behind; wider divergence is left unknown
+GIT_WALK_LIMIT = 5000
+# (HEAD, upstream) pairs kept in the shared ahead/behind cache
+GIT_AHEAD_BEHIND_CACHE_LIMIT = 64
+# Bumped when walk_ahead_behind() changes so stale counts are discarded
+GIT_AHEAD_BEHIND_CACHE_VERSION = 2
+
+def walk_ahead_behind(git_dir, head, upstream):
+    """Count commits only reachable from head (ahead) and only from upstream (behind).
+    
+    Walks both histories newest-first, painting each commit with the side(s)
+    it is reachable from, like git's merge-base search. Once every queued
+    commit is reachable from both sides the walk continues only while one of
+    them is at least as new as a commit painted by a single side, since
+    commits sharing a timestamp (scripted or rebased history) can still
+    turn out to be shared.
+    
+    Returns:
+        Tuple of (ahead, behind), or None if the walk exceeds GIT_WALK_LIMIT
+    """
+    store = open_git_object_store(git_dir)
+    try:
+        flags = {head: 1}
+        flags[upstream] = flags.get(upstream, 0) | 2
+        times = {}
+        done = {}
+        queue = []
+        for sha in flags:
+            commit = read_git_commit(store, sha)
+            if commit is not None:
+                times[sha] = commit[0]
+                heapq.heappush(queue, (-commit[0], sha, commit[1]))
+        visited = 0
+        while queue:
+            if all(flags[sha] == 3 for _, sha, _ in queue):
+                one_sided = [times[sha] for sha, flag in flags.items() if flag != 3 and sha in times]
+                if not one_sided or -queue[0][0] < min(one_sided):
+                    break
+            _, sha, parents = heapq.heappop(queue)
+            if done.get(sha) == flags[sha]:
+                continue
+            done[sha] = flags[sha]
+            visited += 1
+            if visited > GIT_WALK_LIMIT:
+                return None
+            for parent in parents:
+                painted = flags.get(parent, 0) | flags[sha]
+                if painted == flags.get(parent):
+                    continue
+                flags[parent] = painted
+                commit = read_git_commit(store, parent)
+                if commit is not None:
+                    times[parent] = commit[0]
+                    heapq.heappush(queue, (-commit[0], parent, commit[1]))
+        ahead = sum(1 for flag in flags.values() if flag == 1)
+        behind = sum(1 for flag in flags.values() if flag == 2)
+        return ahead, behind
+    finally:
+        close_git_object_store(store)
+
+def get_ahead_behind(git_dir, head, upstream, debug=False):
+    """Return (ahead, behind) for a (HEAD, upstream) pair, walking history only on a cache miss.
+    
+    Results are shared across sessions in shared/git-ahead-behind.json; a
+    pair's counts never change, so entries only leave the cache when it
+    grows past GIT_AHEAD_BEHIND_CACHE_LIMIT or GIT_AHEAD_BEHIND_CACHE_VERSION
+    changes.
+    
+    Returns:
+        Tuple of (ahead, behind), or (None, None) if history could not be walked
+    """
+    if head == upstream:
+        return 0, 0
+    path = get_cache_path("shared", "git-ahead-behind.json")
+    pair = f"{head}:{upstream}"
+    def read_pairs():
+        data = read_cache_json(path, debug=debug) or {}
+        if data.get("version") != GIT_AHEAD_BEHIND_CACHE_VERSION:
+            return {}
+        return data.get("pairs") or {}
+    
+    cached = read_pairs().get(pair)
+    if isinstance(cached, list) and len(cached) == 2:
+        return tuple(cached)
+    
+    started = time.time()
+    try:
+        counts = walk_ahead_behind(git_dir, head, upstream)
+    except (OSError, ValueError, IndexError, zlib.error) as e:
+        if debug:
+            sys.stderr.write(f"DEBUG: Could not walk git history: {e}\n")
+        return None, None
+    counts = counts or (None, None)
+    if debug:
+        sys.stderr.write(f"DEBUG: Ahead/behind {counts} walked in {(time.time() - started) * 1000:.1f}ms\n")
+    with cache_lock("git-ahead-behind") as acquired:
+        if acquired:
+            pairs = read_pairs()
+            pairs.pop(pair, None)
+            pairs[pair] = list(counts)
+            write_cache_json(path, {"version": GIT_AHEAD_BEHIND_CACHE_VERSION,
+                                    "pairs": dict(list(pairs.items())[-GIT_AHEAD_BEHIND_CACHE_LIMIT:])})
+    return counts
+
+# Git extras when there is no upstream, stash or operation, or they cannot be read
+GIT_EXTRAS_DEFAULTS = {"ahead": None, "behind": None, "stash_count": 0, "operation": None, "rebase_branch": None}
+
+def read_git_extras(cwd, debug=False):
+    """Read upstream divergence, stash count and operation state from .git directly.
+    
+    Returns:
+        Dict with ahead, behind (None without an upstream), stash_count,
+        operation (None when idle) and rebase_branch
+    """
+    extras = dict(GIT_EXTRAS_DEFAULTS)
+    git_dir = find_git_dir(cwd)
+    if not git_dir:
+        return extras
+    extras["stash_count"] = count_git_stashes(git_dir)
+    extras["operation"], extras["rebase_branch"] = read_git_operation(git_dir)
+    branch, head = read_git_head(git_dir)
+    upstream_ref = read_git_upstream(git_dir, branch) if branch else None
+    upstream = resolve_git_ref(git_dir, upstream_ref) if upstream_ref else None
+    if head and upstream and len(head) == 40 and len(upstream) == 40:
+        # SHA-256 repositories are not walked
+        extras["ahead"], extras["behind"] = get_ahead_behind(git_dir, head, upstream, debug)
+    return extras
+
+def collect_metrics(config, input_data, memo=None, started=None, provided=None):
+    """Gather model info, git status and transcript metrics for one render.
+    
+    With a deadline (config["deadline_ms"]), providers that miss it are
+    replaced by their last cached value, or marked pending if there is none,
+    and are recomputed by a detached background process for the next call.
+    
+    Args:
+        config: Configuration dict from parse_arguments()
+        input_data: Status payload from Claude Code
+        memo: Optional provider result cache shared across payloads
+        started: time.monotonic() value the deadline is measured from
+                 (default: now, i.e. each render gets the full budget)
+        provided: Optional {provider name: result} used as-is instead of
+                  running those providers
+    
+    Returns:
+        Tuple of (model_info, metrics)
+    """
+    debug = config.get("debug", False)
+    deadline_ms = config.get("deadline_ms", 0)
+    
+    # Extract model info
+    model_info = extract_model_info(input_data)
+    
+    if debug:
+        sys.stderr.write(f"DEBUG: Model info: {model_info}\n")
+    
+    names = get_required_providers(config)
+    deferred = get_deferred_providers(config, names) if memo is None and not config.get("watch") else []
+    inline = [name for name in names if name not in deferred and name not in (provided or {})]
+    transcript_path = input_data.get("transcript_path")
+    approximate = (config.get("approximate_mb") and memo is None and not config.get("watch") and "transcript" in names
+                   and get_transcript_backlog(transcript_path, debug) >= config["approximate_mb"] * 1_000_000)
+    if approximate and "transcript" in inline:
+        # Too much to ingest now: estimated below while a background worker ingests it all
+        inline.remove("transcript")
+    results, missed = run_providers(inline, input_data, deadline_ms=deadline_ms, debug=debug, memo=memo,
+                                    started=started)
+    results.update(provided or {})
+    
+    metrics = {}
+    if deadline_ms or deferred:
+        key = get_session_key(input_data)
+        workers = config.get("async_workers", 1)
+        records = load_provider_records(key, debug=debug) if missed or deferred else {}
+        refresh = list(missed)
+        for name in deferred:
+            # Deferred providers are refreshed when their inputs changed or the value is getting old
+            record = records.get(name)
+            if (record is None or record.get("fingerprint") != get_provider_fingerprint(name, input_data)
+                    or time.time() - record.get("at", 0) > ASYNC_REFRESH_AFTER):
+                refresh.append(name)
+        stale = [name for name in missed + deferred if records.get(name, {}).get("value") is not None]
+        for name in stale:
+            results[name] = records[name]["value"]
+        metrics["stale"] = [name for name in stale if name in refresh]
+        metrics["pending"] = [name for name in missed + deferred if name not in stale]
+        if refresh:
+            spawned = spawn_warm(refresh, input_data, workers)
+            if debug:
+                sys.stderr.write(f"DEBUG: Background refresh of {refresh}: {'started' if spawned else 'all worker slots busy'}\n")
+        fresh = {name: value for name, value in results.items() if name in inline and name not in missed}
+        if fresh and deadline_ms:
+            store_provider_values(key, fresh)
+    
+    if approximate and "transcript" not in results:
+        # No exact value, not even a stale one: show an estimate
+        results["transcript"] = estimate_transcript_metrics(transcript_path, debug=debug)
+        if "transcript" in metrics.get("pending", ()):
+            metrics["pending"].remove("transcript")
+        spawned = spawn_warm(["transcript"], input_data, config.get("async_workers", 1))
+        if debug:
+            sys.stderr.write(f"DEBUG: Background transcript ingestion: {'started' if spawned else 'all worker slots busy'}\n")
+    
+    # Add git info to metrics
+    git_info = results.get("git")
+    
+    if debug:
+        sys.stderr.write(f"DEBUG: Git info: {git_info}\n")
+    
+    if git_info and git_info.get("branch"):
+        metrics["git_info"] = git_info
+    
+    transcript_metrics = results.get("transcript") or {}
+    metrics.update(transcript_metrics)
+    metrics.update(results.get("usage") or {})
+    metrics.update(results.get("cache_ttl") or {})
+    
+    for name, value in results.items():
+        if name.startswith("plugin:") and value:
+            if value.get("pending"):
+                metrics.setdefault("pending", []).append(name)
+            elif value.get("text"):
+                metrics.setdefault("plugins", {})[name[len("plugin:"):]] = value["text"]
+    
+    if transcript_metrics:
+        if model_info["display_name"] == "Unknown" and "transcript_model_name" in transcript_metrics:
+            model_info["display_name"] = transcript_metrics["transcript_model_name"]
+        
+        if "cost" in metrics:
+            metrics["cost_formatted"] = ("~" if metrics.get("estimated") else "") + format_cost(metrics["cost"])
+        
+        # Calculate performance badge
+        if "cache_hit_rate" in metrics and "avg_response_time" in metrics:
+            # Badge should be colored unless theme is "none"
+            colored = config["theme"] != "none"
+            is_powerline = config["style"] == "powerline"
+            response_time = metrics.get(RESPONSE_STATS[config.get("response_stat", "mean")], metrics["avg_response_time"])
+            badge = calculate_performance_badge(
+                metrics["cache_hit_rate"],
+                response_time,
+                config["cache_thresholds"],
+                config["response_thresholds"],
+                colored=colored,
+                powerline=is_powerline,
+                no_emoji=config["no_emoji"],
+                throughput=metrics.get("throughput"),
+                throughput_thresholds=config.get("throughput_thresholds")
+            )
+            metrics["badge"] = badge
+            if debug:
+                sys.stderr.write(f"DEBUG: Badge created: {badge[:20]}...\n")
+        elif debug:
+            has_cache = "cache_hit_rate" in metrics
+            has_response = "avg_response_time" in metrics
+            sys.stderr.write(f"DEBUG: Badge not created - cache_hit_rate:{has_cache}, avg_response_time:{has_response}\n")
+    
+    return model_info, metrics
+
+def render_status(config, input_data, memo=None, started=None, provided=None):
+    """Compute metrics and render the status line for one payload.
+    
+    Args:
+        started: time.monotonic() value the deadline is measured from
+                 (default: now)
+        provided: Optional {provider name: result} used instead of running
+                  those providers (see collect_metrics())
+    
+    Returns:
+        Tuple of (output line, model_info, metrics)
+    """
+    model_info, metrics = collect_metrics(config, input_data, memo=memo, started=started, provided=provided)
+    
+    # Format and output (pass metrics for field display)
+    output = format_output(config, model_info, input_data, metrics)
+    # Only add reset if colors were used (to prevent terminal color bleed)
+    if config["theme"] != "none":
+        output += RESET
+    
+    return output, model_info, metrics
+
+# Longest time an invocation waits for a concurrent render of the same session
+DEBOUNCE_MAX_WAIT = 0.5
+
+def compute_input_fingerprint(config, input_data):
+    """Fingerprint everything a render depends on.
+    
+    Covers the payload, the effective configuration and the stat signature
+    of the transcript, git HEAD/index and env file.
+    """
+    git_dir = find_git_dir(input_data.get("cwd", os.getcwd()))
+    paths = [input_data.get("transcript_path") or "", config.get("env") or ""]
+    if git_dir:
+        paths.extend([os.path.join(git_dir, "HEAD"), os.path.join(git_dir, "index")])
+    
+    digest = hashlib.sha1()
+    digest.update(json.dumps(input_data, sort_keys=True, default=str).encode("utf-8"))
+    digest.update(json.dumps({k: v for k, v in config.items() if k != "debug"}, sort_keys=True, default=str).encode("utf-8"))
+    digest.update(repr(stat_signature(paths)).encode("utf-8"))
+    return digest.hexdigest()
+
+def render_debounced(config, input_data, started=None):
+    """Render the status line, coalescing bursts of identical refreshes.
+    
+    If a render of the same session with the same input fingerprint finished
+    less than debounce_ms ago, its output is reused. If another render of the
+    session is in flight, waits (at most DEBOUNCE_MAX_WAIT) for it and reuses
+    its result instead of duplicating the work.
+    
+    Args:
+        started: time.monotonic() value the deadline is measured from
+                 (default: now)
+    
+    Returns:
+        Tuple of (rendered status line, metrics or None if a previous render was reused,
+        status record from build_status_record())
+    """
+    debug = config.get("debug", False)
+    key = get_session_key(input_data)
+    render_path = get_cache_path("sessions", f"{key}.render.json")
+    fingerprint = compute_input_fingerprint(config, input_data)
+    window = config["debounce_ms"] / 1000
+    
+    def fresh_render():
+        cached = read_cache_json(render_path, debug=debug)
+        if (cached and cached.get("fingerprint") == fingerprint and "record" in cached
+                and 0 <= time.time() - cached.get("finished_at", 0) < window):
+            return cached
+        return None
+    
+    cached = fresh_render()
+    if cached is not None:
+        if debug:
+            sys.stderr.write(f"DEBUG: Debounce hit for session {key}\n")
+        return cached["output"], None, cached["record"]
+    
+    with cache_lock(f"{key}.render", timeout=DEBOUNCE_MAX_WAIT) as acquired:
+        if acquired:
+            # A render that was in flight while we waited may have produced our result
+            cached = fresh_render()
+            if cached is not None:
+                if debug:
+                    sys.stderr.write(f"DEBUG: Reused concurrent render for session {key}\n")
+                return cached["output"], None, cached["record"]
+        elif debug:
+            sys.stderr.write(f"DEBUG: Render lock busy for session {key}, rendering anyway\n")
+        
+        output, model_info, metrics = render_status(config, input_data, started=started)
+        record = build_status_record(model_info, input_data, metrics, output)
+        write_cache_json(render_path, {"fingerprint": fingerprint, "finished_at": time.time(),
+                                       "output": output, "record": record})
+    return output, metrics, record
+
+def build_status_record(model_info, input_data, metrics, output):
+    """Build the JSON-serializable record describing one render.
+    
+    Display-only values (badge escape codes, preformatted cost) are left out.
+    """
+    return {
+        "version": __version__,
+        "timestamp": time.time(),
+        "session_id": input_data.get("session_id"),
+        "transcript_path": input_data.get("transcript_path"),
+        "cwd": input_data.get("cwd"),
+        "model": model_info,
+        "line": output,
+        "metrics": {k: v for k, v in metrics.items() if k not in ("badge", "cost_formatted")}
+    }
+
+def get_status_paths(input_data):
+    """Return (line_path, json_path) of the shared rendered-status files for a session."""
+    key = get_session_key(input_data)
+    return get_cache_path("status", f"{key}.line"), get_cache_path("status", f"{key}.json")
+
+# inotify event masks (see inotify(7))
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+def open_inotify(directories, debug=False):
+    """Create an inotify descriptor watching the given directories.
+    
+    Directories are watched rather than files so that atomic replacements
+    (git's index.lock rename) and not-yet-created files are still seen.
+    
+    Returns:
+        File descriptor, or None if inotify is unavailable (non-Linux, no libc)
+    """
+    try:
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    except (OSError, AttributeError) as e:
+        if debug:
+            sys.stderr.write(f"DEBUG: inotify unavailable: {e}\n")
+        return None
+    if fd < 0:
+        return None
+    
+    watched = 0
+    for directory in directories:
+        if libc.inotify_add_watch(fd, os.fsencode(directory), WATCH_MASK) >= 0:
+            watched += 1
+        elif debug:
+            sys.stderr.write(f"DEBUG: Could not watch {directory}\n")
+    if not watched:
+        os.close(fd)
+        return None
+    return fd
+
+def stat_signature(paths):
+    """Return a comparable (mtime, size, inode) signature for a list of paths."""
+    signature = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            signature.append((st.st_mtime_ns, st.st_size, st.st_ino))
+        except OSError:
+            signature.append(None)
+    return tuple(signature)
+
+def run_watch(config, input_data):
+    """Follow the transcript and git index and keep the status files current.
+    
+    Re-renders when a watched file changes, and every WATCH_TICK seconds
+    while a time-based field is shown, then atomically rewrites the
+    session's .line (rendered status) and .json (structured metrics) files
+    so any number of readers (tmux, shell prompts) can cat them. Uses
+    inotify where available and stat polling otherwise.
+    """
+    debug = config.get("debug", False)
+    line_path, json_path = get_status_paths(input_data)
+    
+    # Files whose changes require a re-render
+    cwd = input_data.get("cwd", os.getcwd())
+    git_dir = find_git_dir(cwd)
+    watched_files = []
+    if input_data.get("transcript_path"):
+        watched_files.append(os.path.abspath(input_data["transcript_path"]))
+    if git_dir:
+        watched_files.extend([os.path.join(git_dir, "HEAD"), os.path.join(git_dir, "index")])
+    if config.get("env"):
+        watched_files.append(os.path.abspath(config["env"]))
+    
+    directories = sorted({os.path.dirname(path) for path in watched_files if os.path.isdir(os.path.dirname(path))})
+    inotify_fd = open_inotify(directories, debug=debug)
+    
+    if debug:
+        mode = "inotify" if inotify_fd is not None else "polling"
+        sys.stderr.write(f"DEBUG: Watching {watched_files} ({mode})\n")
+        sys.stderr.write(f"DEBUG: Status files: {line_path}, {json_path}\n")
+    
+    def is_ticking(config):
+        return any(field in TIME_BASED_FIELDS or field in PLUGIN_FIELDS for field in config["fields"])
+    
+    ticking = is_ticking(config)
+    last_signature = None
+    last_output = None
+    last_render = 0.0
+    try:
+        while True:
+            signature = stat_signature(watched_files)
+            tick = ticking and time.monotonic() - last_render >= WATCH_TICK
+            if signature != last_signature or tick:
+                # Pick up env file edits the same way a fresh invocation would
+                if config.get("env") and last_signature is not None and signature[-1] != last_signature[-1]:
+                    config = parse_arguments()
+                    ticking = is_ticking(config)
+                output, model_info, metrics = render_status(config, input_data)
+                last_render = time.monotonic()
+                if config.get("metrics_dir"):
+                    export_openmetrics(config, input_data, metrics)
+                if signature != last_signature or output != last_output:
+                    record = build_status_record(model_info, input_data, metrics, output)
+                    atomic_write(json_path, json.dumps(record))
+                    atomic_write(line_path, output + "\n")
+                    if debug:
+                        sys.stderr.write(f"DEBUG: Re-rendered status: {output}\n")
+                last_signature = signature
+                last_output = output
+            
+            timeout = config["watch_interval"]
+            if ticking:
+                timeout = min(timeout, max(0.0, last_render + WATCH_TICK - time.monotonic()))
+            if inotify_fd is not None:
+                readable, _, _ = select.select([inotify_fd], [], [], timeout)
+                if readable:
+                    try:
+                        # Drain pending events; the stat signature decides what changed
+                        while os.read(inotify_fd, 65536):
+                            pass
+                    except BlockingIOError:
+                        pass
+            else:
+                time.sleep(timeout)
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        if inotify_fd is not None:
+            os.close(inotify_fd)
+
+# Exported textfiles of sessions not refreshed for this long are removed
+METRICS_STALE_AFTER = 24 * 3600
+
+def escape_label_value(value):
+    """Escape a string for use as an OpenMetrics label value."""
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def format_openmetrics(input_data, metrics):
+    """Render a session's metrics in the OpenMetrics text format.
+    
+    Returns:
+        The exposition text, terminated by "# EOF"
+    """
+    cwd = (input_data.get("workspace") or {}).get("project_dir") or input_data.get("cwd") or ""
+    labels = f'session="{escape_label_value(input_data.get("session_id") or get_session_key(input_data))}",' \
+             f'project="{escape_label_value(os.path.basename(cwd.rstrip("/")))}"'
+    lines = []
+    
+    def family(name, metric_type, help_text, samples):
+        # Counters are declared under their sample name: node_exporter parses the
+        # Prometheus text format, which would otherwise see untyped _total samples
+        if metric_type == "counter":
+            name += "_total"
+        lines.append(f"# TYPE {name} {metric_type}")
+        lines.append(f"# HELP {name} {help_text}")
+        for extra_labels, value in samples:
+            label_str = labels + "".join(f',{k}="{escape_label_value(v)}"' for k, v in extra_labels)
+            lines.append(f"{name}{{{label_str}}} {value}")
+    
+    token_kinds = ("input", "output", "cache_creation", "cache_read")
+    family("pyccsl_tokens", "counter", "Tokens used by the session.",
+           [((("kind", kind),), metrics.get(f"{kind}_tokens", 0)) for kind in token_kinds])
+    family("pyccsl_cost_dollars", "counter", "Session cost in US dollars.",
+           [((("model", model_id),), f"{cost:.6f}") for model_id, cost in sorted(metrics.get("model_costs", {}).items())])
+    if "subagent_cost" in metrics:
+        family("pyccsl_chain_cost_dollars", "counter", "Session cost of the main conversation and of subagents.",
+               [((("chain", "main"),), f"{metrics['main_cost']:.6f}"), ((("chain", "subagent"),), f"{metrics['subagent_cost']:.6f}")])
+    family("pyccsl_cache_hit_ratio", "gauge", "Cache reads as a fraction of all input tokens.",
+           [((), f"{metrics.get('cache_hit_rate', 0.0):.6f}")])
+    family("pyccsl_avg_response_time_seconds", "gauge", "Mean time from user message to assistant response.",
+           [((), f"{metrics.get('avg_response_time', 0.0):.3f}")])
+    quantile_samples = [((("quantile", q),), f"{metrics[key]:.3f}")
+                        for q, key in (("0.5", "response_p50"), ("0.95", "response_p95"), ("0.99", "response_p99"))
+                        if key in metrics]
+    if quantile_samples:
+        family("pyccsl_response_time_quantile_seconds", "gauge", "Estimated response time quantiles.", quantile_samples)
+    if "throughput" in metrics:
+        family("pyccsl_output_tokens_per_second", "gauge", "Output tokens per second of generation time.",
+               [((("window", "session"),), f"{metrics['throughput']:.3f}"),
+                ((("window", "recent"),), f"{metrics['throughput_recent']:.3f}")])
+    family("pyccsl_session_duration_seconds", "gauge", "Time from first to last transcript entry.",
+           [((), f"{metrics.get('session_duration', 0.0):.3f}")])
+    family("pyccsl_messages", "counter", "User messages in the session.",
+           [((), metrics.get("message_count", 0))])
+    family("pyccsl_last_update_timestamp_seconds", "gauge", "When these metrics were exported.",
+           [((), f"{time.time():.3f}")])
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+def export_openmetrics(config, input_data, metrics):
+    """Atomically write the session's metrics textfile, at most once per metrics_interval.
+    
+    The rate limit costs a single stat() of the previous export. Textfiles
+    of sessions idle for over METRICS_STALE_AFTER are pruned on write.
+    """
+    debug = config.get("debug", False)
+    metrics_dir = config["metrics_dir"]
+    path = os.path.join(metrics_dir, f"pyccsl_{get_session_key(input_data)}.prom")
+    now = time.time()
+    try:
+        if now - os.stat(path).st_mtime < config["metrics_interval"]:
+            return False
+    except OSError:
+        pass
+    if "cost" not in metrics or metrics.get("estimated"):
+        # Estimates could make counters go backwards once exact values arrive
+        return False
+    
+    try:
+        atomic_write(path, format_openmetrics(input_data, metrics))
+        for name in os.listdir(metrics_dir):
+            if name.startswith("pyccsl_") and name.endswith(".prom"):
+                stale_path = os.path.join(metrics_dir, name)
+                if now - os.stat(stale_path).st_mtime > METRICS_STALE_AFTER:
+                    os.unlink(stale_path)
+    except OSError as e:
+        if debug:
+            sys.stderr.write(f"DEBUG: Metrics export failed: {e}\n")
+        return False
+    if debug:
+        sys.stderr.write(f"DEBUG: Exported metrics to {path}\n")
+    return True
+
+# Per-process state for --batch workers
+_batch_config = None
+_batch_memo = {}
+
+def _init_batch_worker(config):
+    """Process pool initializer: share the parsed config with the worker."""
+    global _batch_config
+    _batch_config = config
+    if any(field not in FIELD_ORDER for field in config["fields"]):
+        load_plugins()
+
+def render_batch_line(numbered_line):
+    """Render one --batch input line into one output line.
+    
+    Args:
+        numbered_line: Tuple of (line number, raw JSONL line)
+    
+    Returns:
+        Output line (rendered status or JSON object, without newline)
+    """
+    line_num, line = numbered_line
+    config = _batch_config
+    try:
+        input_data = json.loads(line)
+        if not isinstance(input_data, dict):
+            raise ValueError("payload is not a JSON object")
+    except ValueError as e:
+        sys.stderr.write(f"Warning: Invalid JSON payload at line {line_num}: {e}\n")
+        if config["format"] != "text":
+            return json.dumps({"line_number": line_num, "error": str(e)})
+        return ""
+    
+    output, model_info, metrics = render_status(config, input_data, memo=_batch_memo)
+    if config["format"] != "text":
+        # One line per payload: "both" uses the JSON record, which includes the rendered line
+        return json.dumps(build_status_record(model_info, input_data, metrics, output))
+    return output
+
+def run_batch(config):
+    """Render every JSONL payload on stdin, writing one result per line in input order.
+    
+    Git and transcript results are shared across payloads within a process;
+    with --jobs N the lines are fanned out over a process pool.
+    """
+    # Background warming and render coalescing make no sense for bulk rendering
+    config = dict(config, deadline_ms=0, debounce_ms=0)
+    numbered_lines = ((num, line) for num, line in enumerate(sys.stdin, 1) if line.strip())
+    
+    if config["jobs"] == 1:
+        _init_batch_worker(config)
+        for numbered_line in numbered_lines:
+            sys.stdout.write(render_batch_line(numbered_line) + "\n")
+        sys.stdout.flush()
+        return 0
+    
+    import concurrent.futures
+    import itertools
+    
+    # Submit in bounded chunks so huge inputs are streamed, not held in memory
+    chunk_size = 64 * config["jobs"]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=config["jobs"], initializer=_init_batch_worker,
+                                                initargs=(config,)) as executor:
+        while True:
+            chunk = list(itertools.islice(numbered_lines, chunk_size))
+            if not chunk:
+                break
+            for output in executor.map(render_batch_line, chunk, chunksize=16):
+                sys.stdout.write(output + "\n")
+            sys.stdout.flush()
+    return 0
+
+def record_invocation(record_dir, input_data, argv):
+    """Append one payload to a recording for the 'replay' command.
+    
+    Stores the payload, the transcript's byte length and the git HEAD at
+    this moment, and appends the transcript bytes written since the
+    previous record to the recording's own transcript copy, so the
+    recording is self-contained.
+    
+    Args:
+        record_dir: Recording directory
+        input_data: Status payload
+        argv: Command-line options of this invocation (replayed verbatim)
+    """
+    key = get_session_key(input_data)
+    transcript_path = input_data.get("transcript_path")
+    copy_name = os.path.join("transcripts", f"{key}.jsonl")
+    copy_path = os.path.join(record_dir, copy_name)
+    os.makedirs(os.path.dirname(copy_path), exist_ok=True)
+    
+    record = {
+        "time": time.time(),
+        "argv": argv,
+        "payload": input_data,
+        "transcript_copy": None,
+        "transcript_length": None,
+        "git": None
+    }
+    
+    git_dir = find_git_dir(input_data.get("cwd", os.getcwd()))
+    if git_dir:
+        branch, commit = read_git_head(git_dir)
+        index_signature = stat_signature([os.path.join(git_dir, "index")])[0]
+        record["git"] = {"branch": branch, "commit": commit, "index_mtime_ns": index_signature[0] if index_signature else None}
+    
+    # Serialize records of the same session so transcript deltas are copied exactly once
+    with cache_lock(f"record-{key}", timeout=0.2) as acquired:
+        if not acquired:
+            sys.stderr.write(f"Warning: Recording of session {key} is busy, skipping this call\n")
+            return
+        if transcript_path and os.path.isfile(transcript_path):
+            with open(transcript_path, "rb") as src:
+                src.seek(0, os.SEEK_END)
+                length = src.tell()
+                copied = os.path.getsize(copy_path) if os.path.exists(copy_path) else 0
+                if length < copied:
+                    # Transcript was rewritten; restart the copy
+                    sys.stderr.write(f"Warning: Transcript shrank, restarting recorded copy {copy_path}\n")
+                    copied = 0
+                    open(copy_path, "wb").close()
+                src.seek(copied)
+                with open(copy_path, "ab") as dst:
+                    remaining = length - copied
+                    while remaining > 0:
+                        chunk = src.read(min(remaining, 1 << 20))
+                        if not chunk:
+                            break
+                        dst.write(chunk)
+                        remaining -= len(chunk)
+            record["transcript_copy"] = copy_name
+            record["transcript_length"] = length
+        
+        with open(os.path.join(record_dir, "records.jsonl"), "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+def run_replay(argv):
+    """Replay a --record recording against one or more pyccsl builds.
+    
+    Each recorded call is re-run in order with a transcript truncated to
+    its recorded length, and per-call wall-clock latency is reported as a
+    distribution per build. Git state is live (not restored) - compare
+    builds on the same checkout.
+    
+    Returns:
+        Exit code
+    """
+    import shutil
+    import tempfile
+    
+    parser = argparse.ArgumentParser(prog="pyccsl replay", description="Replay a --record recording and report latency")
+    parser.add_argument("record_dir", help="Recording directory written by --record")
+    parser.add_argument("--build", action="append", help="pyccsl script to run (repeatable; default: this script)")
+    parser.add_argument("--realtime", action="store_true", help="Keep the recorded gaps between calls")
+    parser.add_argument("--shared-cache", action="store_true", help="Use the normal cache directory instead of a fresh one per build")
+    args = parser.parse_args(argv)
+    
+    records_path = os.path.join(args.record_dir, "records.jsonl")
+    try:
+        with open(records_path, "r") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+    except (OSError, ValueError) as e:
+        print(f"Error: Cannot read recording {records_path}: {e}", file=sys.stderr)
+        return 3
+    if not records:
+        print("Error: Recording is empty", file=sys.stderr)
+        return 2
+    
+    builds = args.build or [os.path.abspath(__file__)]
+    summaries = []
+    for build in builds:
+        work_dir = tempfile.mkdtemp(prefix="pyccsl-replay-")
+        env = dict(os.environ)
+        env.pop("PYCCSL_RECORD_DIR", None)
+        env["PYCCSL_REPLAY"] = "1"
+        if not args.shared_cache:
+            env["PYCCSL_CACHE_DIR"] = os.path.join(work_dir, "cache")
+        
+        latencies = []
+        failures = 0
+        replayed_lengths = {}
+        previous_time = None
+        try:
+            for record in records:
+                payload = dict(record["payload"])
+                copy_name = record.get("transcript_copy")
+                if copy_name:
+                    # Grow (or cut back) the working transcript to the recorded length
+                    work_path = os.path.join(work_dir, os.path.basename(copy_name))
+                    length = record["transcript_length"]
+                    current = replayed_lengths.get(work_path, 0)
+                    if length > current:
+                        with open(os.path.join(args.record_dir, copy_name), "rb") as src, open(work_path, "ab") as dst:
+                            src.seek(current)
+                            dst.write(src.read(length - current))
+                    elif length < current:
+                        os.truncate(work_path, length)
+                    replayed_lengths[work_path] = length
+                    payload["transcript_path"] = work_path
+                
+                if args.realtime and previous_time is not None:
+                    time.sleep(max(0.0, min(record["time"] - previous_time, 60.0)))
+                previous_time = record["time"]
+                
+                started = time.perf_counter()
+                result = subprocess.run([sys.executable, build] + record.get("argv", []),
+                                        input=json.dumps(payload).encode("utf-8"),
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=env)
+                latencies.append((time.perf_counter() - started) * 1000)
+                if result.returncode != 0:
+                    failures += 1
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        
+        latencies.sort()
+        summary = {
+            "build": build,
+            "calls": len(latencies),
+            "failures": failures,
+            "mean": sum(latencies) / len(latencies),
+            "p50": percentile(latencies, 0.50),
+            "p90": percentile(latencies, 0.90),
+            "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+            "max": latencies[-1]
+        }
+        summaries.append(summary)
+        print(f"{build}: calls={summary['calls']} failures={failures} mean={summary['mean']:.1f}ms "
+              f"p50={summary['p50']:.1f}ms p90={summary['p90']:.1f}ms p95={summary['p95']:.1f}ms "
+              f"p99={summary['p99']:.1f}ms max={summary['max']:.1f}ms")
+    
+    if len(summaries) > 1:
+        baseline = summaries[0]
+        for summary in summaries[1:]:
+            deltas = " ".join(f"{q}={summary[q] - baseline[q]:+.1f}ms" for q in ("p50", "p95", "p99"))
+            print(f"{summary['build']} vs {baseline['build']}: {deltas}")
+    return 0
+
+# Load-test configurations: whether each render gets an empty cache, runs as a --watch daemon, and sees a git repo
+LOADTEST_CONFIGS = {
+    "cold": {"fresh_cache": True, "daemon": False, "git": True},
+    "cached": {"fresh_cache": False, "daemon": False, "git": True},
+    "daemon": {"fresh_cache": False, "daemon": True, "git": True},
+    "no-git": {"fresh_cache": False, "daemon": False, "git": False}
+}
+
+def synthetic_transcript_lines(session, turn, count, start_time):
+    """Return `count` synthetic turns (user, assistant with a tool call, tool result) as JSONL text."""
+    lines = []
+    models = ("claude-sonnet-4-20250514", "claude-opus-4-1-20250805")
+    for i in range(turn, turn + count):
+        when = start_time + i * 20
+        stamp = lambda offset: time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(when + offset))
+        user, assistant, result = f"s{session}-u{i}", f"s{session}-a{i}", f"s{session}-r{i}"
+        usage = {"input_tokens": 5 + i % 40, "cache_creation_input_tokens": 200 + i % 900,
+                 "cache_read_input_tokens": 2000 + i * 50, "output_tokens": 50 + i % 700}
+        lines.append(json.dumps({"type": "user", "uuid": user, "parentUuid": f"s{session}-r{i - 1}", "timestamp": stamp(0),
+                                 "message": {"role": "user", "content": f"step {i}"}}))
+        lines.append(json.dumps({"type": "assistant", "uuid": assistant, "parentUuid": user, "timestamp": stamp(6),
+                                 "message": {"id": f"msg-{session}-{i}", "model": models[i % 2], "role": "assistant",
+                                             "content": [{"type": "tool_use", "id": f"toolu-{session}-{i}", "name": "Bash", "input": {}}],
+                                             "usage": usage}}))
+        lines.append(json.dumps({"type": "user", "uuid": result, "parentUuid": assistant, "timestamp": stamp(9),
+                                 "message": {"role": "user", "content": [{"type": "tool_result", "tool_use_id": f"toolu-{session}-{i}", "content": "ok"}]},
+                                 "toolUseResult": {"stdout": "ok"}}))
+    return "\n".join(lines) + "\n"
+
+def read_fork_count():
+    """Return the machine-wide number of processes created since boot (Linux), or None."""
+    try:
+        with open("/proc/stat", "r") as f:
+            for line in f:
+                if line.startswith("processes "):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+def run_loadtest_config(name, args, work_dir, build):
+    """Simulate args.sessions concurrent sessions under one configuration.
+    
+    Returns:
+        Dict with renders, cpu (child CPU seconds), latencies (seconds), forks and elapsed
+    """
+    import resource
+    import shutil
+    import tempfile
+    
+    settings = LOADTEST_CONFIGS[name]
+    config_dir = os.path.join(work_dir, name)
+    cache_dir = os.path.join(config_dir, "cache")
+    os.makedirs(cache_dir)
+    cwd = os.path.join(work_dir, "repo" if settings["git"] else "plain")
+    
+    payloads = []
+    for session in range(args.sessions):
+        transcript_path = os.path.join(config_dir, f"session-{session}.jsonl")
+        with open(transcript_path, "w") as f:
+            f.write(synthetic_transcript_lines(session, 0, args.initial_turns, time.time() - 86400))
+        payloads.append({"session_id": f"load-{name}-{session}", "transcript_path": transcript_path, "cwd": cwd,
+                         "model": {"id": "claude-sonnet-4-20250514", "display_name": "Sonnet 4"}})
+    
+    env = dict(os.environ, PYCCSL_CACHE_DIR=cache_dir)
+    command = [sys.executable, build] + args.pyccsl_args
+    daemons = []
+    if settings["daemon"]:
+        for payload in payloads:
+            daemon = subprocess.Popen(command + ["--watch"], stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                                      stderr=subprocess.DEVNULL, env=env)
+            daemon.stdin.write(json.dumps(payload).encode("utf-8"))
+            daemon.stdin.close()
+            daemons.append(daemon)
+        time.sleep(1.0)  # Let the daemons start and render once
+    
+    latencies = []
+    usage_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    forks_before = read_fork_count()
+    started = time.monotonic()
+    end = started + args.duration
+    
+    def session_loop(session):
+        payload = payloads[session]
+        data = json.dumps(payload).encode("utf-8")
+        status_path = os.path.join(cache_dir, "status", f"{payload['session_id']}.line")
+        turn = args.initial_turns
+        # Sessions are spread evenly over the refresh interval
+        next_refresh = started + args.interval * session / args.sessions
+        while next_refresh < end:
+            time.sleep(max(0.0, next_refresh - time.monotonic()))
+            with open(payload["transcript_path"], "a") as f:
+                f.write(synthetic_transcript_lines(session, turn, args.turns_per_refresh, time.time() - 86400))
+            turn += args.turns_per_refresh
+            call_started = time.monotonic()
+            if settings["daemon"]:
+                # A daemon render is done when the status file is replaced
+                before = stat_signature([status_path])
+                while stat_signature([status_path]) == before and time.monotonic() - call_started < 5:
+                    time.sleep(0.002)
+                latencies.append(time.monotonic() - call_started)
+            else:
+                run_env = env
+                if settings["fresh_cache"]:
+                    run_env = dict(env, PYCCSL_CACHE_DIR=tempfile.mkdtemp(dir=config_dir))
+                subprocess.run(command, input=data, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=run_env)
+                latencies.append(time.monotonic() - call_started)
+                if settings["fresh_cache"]:
+                    shutil.rmtree(run_env["PYCCSL_CACHE_DIR"], ignore_errors=True)
+            next_refresh += args.interval
+    
+    threads = [threading.Thread(target=session_loop, args=(session,)) for session in range(args.sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for daemon in daemons:
+        daemon.terminate()
+        daemon.wait()
+    elapsed = time.monotonic() - started
+    
+    usage_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    forks_after = read_fork_count()
+    return {
+        "renders": len(latencies),
+        "cpu": (usage_after.ru_utime - usage_before.ru_utime) + (usage_after.ru_stime - usage_before.ru_stime),
+        "latencies": sorted(latencies),
+        "forks": forks_after - forks_before if forks_before is not None and forks_after is not None else None,
+        "elapsed": elapsed
+    }
+
+def run_loadtest(argv):
+    """Simulate many concurrent sessions and measure pyccsl's aggregate cost.
+    
+    Each simulated session appends synthetic turns to its own transcript
+    every interval and refreshes its status line, under each configuration
+    in turn (see LOADTEST_CONFIGS). Reports child CPU seconds per minute,
+    render latency and process creations (machine-wide, Linux only).
+    
+    Returns:
+        Exit code
+    """
+    import shutil
+    import tempfile
+    
+    parser = argparse.ArgumentParser(prog="pyccsl loadtest", description="Multi-session load test")
+    parser.add_argument("--sessions", type=int, default=10, help="Concurrent simulated sessions (default: 10)")
+    parser.add_argument("--interval", type=float, default=1.0, help="Seconds between refreshes of a session (default: 1.0)")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to run each configuration (default: 30)")
+    parser.add_argument("--initial-turns", type=int, default=1000, help="Turns in each transcript at the start (default: 1000)")
+    parser.add_argument("--turns-per-refresh", type=int, default=1, help="Turns appended before each refresh (default: 1)")
+    parser.add_argument("--configs", default=",".join(LOADTEST_CONFIGS),
+                        help=f"Configurations to run (default: {','.join(LOADTEST_CONFIGS)})")
+    parser.add_argument("--build", default=os.path.abspath(__file__), help="pyccsl script to test (default: this one)")
+    parser.add_argument("pyccsl_args", nargs="*", help="Options and fields passed to every render (after --)")
+    args = parser.parse_args(argv)
+    
+    configs = [name.strip() for name in args.configs.split(",") if name.strip()]
+    unknown = [name for name in configs if name not in LOADTEST_CONFIGS]
+    if unknown or args.sessions < 1 or args.interval <= 0:
+        print(f"Error: Invalid load test settings (unknown configurations: {', '.join(unknown) or 'none'})", file=sys.stderr)
+        return 1
+    
+    work_dir = tempfile.mkdtemp(prefix="pyccsl-load-")
+    try:
+        repo = os.path.join(work_dir, "repo")
+        os.makedirs(os.path.join(work_dir, "plain"))
+        os.makedirs(repo)
+        for i in range(50):
+            with open(os.path.join(repo, f"file{i}.txt"), "w") as f:
+                f.write(f"content {i}\n")
+        git = ["git", "-C", repo, "-c", "user.name=pyccsl", "-c", "user.email=pyccsl@localhost"]
+        try:
+            subprocess.run(git + ["init", "-q"], check=True)
+            subprocess.run(git + ["add", "."], check=True)
+            subprocess.run(git + ["commit", "-q", "-m", "load test"], check=True)
+            with open(os.path.join(repo, "file0.txt"), "a") as f:
+                f.write("modified\n")
+        except (OSError, subprocess.CalledProcessError):
+            print("Warning: git unavailable, the repository will not be a git checkout", file=sys.stderr)
+        
+        print(f"sessions={args.sessions} interval={args.interval}s duration={args.duration}s "
+              f"initial_turns={args.initial_turns} turns_per_refresh={args.turns_per_refresh}")
+        print(f"{'config':<8}  {'renders':>7}  {'cpu_s/min':>9}  {'p50_ms':>7}  {'p99_ms':>7}  {'max_ms':>7}  {'forks':>7}  {'forks/render':>12}")
+        for name in configs:
+            result = run_loadtest_config(name, args, work_dir, args.build)
+            latencies = result["latencies"]
+            p50, p99, worst = (percentile(latencies, q) * 1000 if latencies else 0.0 for q in (0.50, 0.99, 1.0))
+            forks = result["forks"]
+            forks_text = f"{forks:>7}  {forks / max(1, result['renders']):>12.1f}" if forks is not None else f"{'n/a':>7}  {'n/a':>12}"
+            print(f"{name:<8}  {result['renders']:>7}  {result['cpu'] / result['elapsed'] * 60:>9.2f}  "
+                  f"{p50:>7.1f}  {p99:>7.1f}  {worst:>7.1f}  {forks_text}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return 0
+
+def run_bench(argv):
+    """Benchmark transcript ingestion throughput, plain versus compressed, and the sampling estimator.
+    
+    Compresses temporary copies of the given transcript with every
+    available codec and times a full streaming ingestion of each. Then
+    times estimate_transcript_metrics() at several sample sizes and
+    reports its error against the exact ingestion.
+    
+    Returns:
+        Exit code
+    """
+    import shutil
+    import tempfile
+    
+    parser = argparse.ArgumentParser(prog="pyccsl bench", description="Benchmark transcript ingestion throughput")
+    parser.add_argument("transcript", help="Plain .jsonl transcript to benchmark with")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per format, best is reported (default: 3)")
+    args = parser.parse_args(argv)
+    
+    if not os.path.isfile(args.transcript) or get_transcript_codec(args.transcript):
+        print(f"Error: {args.transcript} is not a plain transcript file", file=sys.stderr)
+        return 3
+    
+    work_dir = tempfile.mkdtemp(prefix="pyccsl-bench-")
+    try:
+        candidates = [("plain", args.transcript)]
+        for suffix, codec in TRANSCRIPT_CODECS.items():
+            try:
+                module = __import__(codec)
+            except ImportError:
+                print(f"{suffix[1:]:>6}: skipped ({codec} not installed)")
+                continue
+            path = os.path.join(work_dir, "transcript.jsonl" + suffix)
+            with open(args.transcript, "rb") as src:
+                if codec == "zstandard":
+                    with open(path, "wb") as raw:
+                        with module.ZstdCompressor().stream_writer(raw) as dst:
+                            shutil.copyfileobj(src, dst)
+                else:
+                    with module.open(path, "wb") as dst:
+                        shutil.copyfileobj(src, dst)
+            candidates.append((suffix[1:], path))
+        
+        baseline = None
+        exact = None
+        for name, path in candidates:
+            best = None
+            for _ in range(max(1, args.repeat)):
+                started = time.perf_counter()
+                state = update_transcript_state(path)
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            baseline = baseline or best
+            exact = exact or get_transcript_metrics(state)
+            megabytes = state["offset"] / 1_000_000
+            print(f"{name:>6}: {os.path.getsize(path) / 1_000_000:8.1f} MB on disk  {best * 1000:8.1f} ms  "
+                  f"{megabytes / best:7.1f} MB/s  {state['entries'] / best:9.0f} entries/s  {best / baseline:5.2f}x plain")
+        
+        if exact and exact["cost"] > 0:
+            # Estimator error: relative deviation from the exact totals, and the estimator's own 95% bound
+            print(f"\nSampling estimator ({SAMPLE_BLOCK_BYTES // 1024} KB blocks) versus full ingestion:")
+            for blocks in (16, 32, SAMPLE_BLOCKS, 4 * SAMPLE_BLOCKS):
+                best = None
+                for _ in range(max(1, args.repeat)):
+                    started = time.perf_counter()
+                    estimate = estimate_transcript_metrics(args.transcript, blocks=blocks)
+                    elapsed = time.perf_counter() - started
+                    best = elapsed if best is None else min(best, elapsed)
+                if not estimate:
+                    # Compressed or unreadable: nothing to compare
+                    print(f"{blocks:>6} blocks: no estimate  {best * 1000:8.1f} ms")
+                    continue
+                errors = "  ".join(f"{label} {estimate[key] / exact[key] - 1:+6.1%}" for key, label in
+                                   (("cost", "cost"), ("context_size", "tokens"), ("message_count", "messages"))
+                                   if exact.get(key))
+                bound = f"±{estimate['estimate_error']:.1%}" if "estimate_error" in estimate else "exact"
+                print(f"{blocks:>6} blocks: {estimate['sampled_fraction'] * 100:5.1f}% read  {best * 1000:8.1f} ms  "
+                      f"{errors}  (95% bound {bound})")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return 0
+
+def make_config(fields=None, **options):
+    """Build a render configuration for library use.
+    
+    Starts from the command line defaults (including PYCCSL_* environment
+    variables) and applies the given overrides.
+    
+    Args:
+        fields: List or comma-separated string of fields (default: PYCCSL_FIELDS or the default fields)
+        **options: Any other configuration key returned by parse_arguments(), e.g. theme="none"
+    
+    Returns:
+        Configuration dict
+    """
+    config = parse_arguments([])
+    unknown = [key for key in options if key not in config]
+    if unknown:
+        raise ValueError(f"Unknown configuration keys: {', '.join(unknown)}")
+    config.update(options)
+    if fields is not None:
+        if isinstance(fields, str):
+            fields = [f.strip() for f in fields.split(",") if f.strip()]
+        config["fields"] = list(fields)
+        if any(field not in FIELD_ORDER for field in config["fields"]):
+            load_plugins(debug=config["debug"])
+    return config
+
+def render(input_data, config=None):
+    """Render the status line for a status payload, exactly as the command line does.
+    
+    Args:
+        input_data: Status payload dict (at least transcript_path and cwd)
+        config: Configuration from make_config() (default: make_config())
+    
+    Returns:
+        The status line (including ANSI colors unless the theme is "none")
+    """
+    output, _, _ = render_status(config or make_config(), input_data)
+    return output
+
+class Session:
+    """Incremental metrics for one transcript, for use from other Python tools.
+    
+    Only the compact aggregate state is held in memory (the same state the
+    status line checkpoints), and each update() parses just the lines
+    appended since the previous call. Updating never touches the cache.
+    
+    Example:
+        session = pyccsl.Session("~/.claude/projects/x/session.jsonl")
+        session.update()
+        print(session.cost, session.output_tokens, session.response_p95)
+    """
+    
+    def __init__(self, transcript_path, cwd=None, session_id=None):
+        """
+        Args:
+            transcript_path: Path to the transcript (.jsonl, optionally compressed)
+            cwd: Working directory used for folder and git fields (default: current directory)
+            session_id: Session ID reported in rendered payloads
+        """
+        self.transcript_path = os.path.expanduser(transcript_path)
+        self.cwd = cwd or os.getcwd()
+        self.session_id = session_id
+        self.state = new_transcript_state()
+        self._metrics = {}
+    
+    def update(self):
+        """Ingest entries appended since the last update.
+        
+        A rewritten or replaced transcript is re-read from the start.
+        
+        Returns:
+            Number of entries ingested by this call
+        
+        Raises:
+            OSError: If the transcript cannot be read
+        """
+        previous, previous_entries = self.state, self.state["entries"]
+        self.state = update_transcript_state(self.transcript_path, self.state)
+        self._metrics = get_transcript_metrics(self.state)
+        if self.state is previous:
+            return self.state["entries"] - previous_entries
+        return self.state["entries"]
+    
+    @property
+    def metrics(self):
+        """All transcript metrics as a dict (the keys the status line uses)."""
+        return dict(self._metrics)
+    
+    @property
+    def entries(self):
+        """Number of transcript entries ingested (int)."""
+        return self.state["entries"]
+    
+    @property
+    def tokens(self):
+        """Token totals: input_tokens, output_tokens, cache_creation_tokens, cache_read_tokens (dict of int)."""
+        return dict(self.state["tokens"])
+    
+    @property
+    def input_tokens(self):
+        """Base input tokens (int)."""
+        return self.state["tokens"]["input_tokens"]
+    
+    @property
+    def output_tokens(self):
+        """Output tokens (int)."""
+        return self.state["tokens"]["output_tokens"]
+    
+    @property
+    def cache_creation_tokens(self):
+        """Cache write tokens (int)."""
+        return self.state["tokens"]["cache_creation_tokens"]
+    
+    @property
+    def cache_read_tokens(self):
+        """Cache read tokens (int)."""
+        return self.state["tokens"]["cache_read_tokens"]
+    
+    @property
+    def context_size(self):
+        """Non-cached tokens: input + cache write + output (int), as the tokens field shows."""
+        return self._metrics.get("context_size", 0)
+    
+    @property
+    def cost(self):
+        """Session cost in USD (float)."""
+        return self.state["cost"]
+    
+    @property
+    def model_costs(self):
+        """Cost in USD per model ID (dict of float)."""
+        return dict(self.state["model_costs"])
+    
+    @property
+    def model_id(self):
+        """Model ID of the most recent assistant message (str or None)."""
+        return self.state["last_model_id"]
+    
+    @property
+    def cache_hit_rate(self):
+        """Cache reads as a fraction of all input tokens (float, 0.0-1.0)."""
+        return self._metrics.get("cache_hit_rate", 0.0)
+    
+    @property
+    def avg_response_time(self):
+        """Mean response time in seconds (float, 0.0 without responses)."""
+        return self._metrics.get("avg_response_time", 0.0)
+    
+    @property
+    def response_p50(self):
+        """Median response time in seconds (float or None without responses)."""
+        return self._metrics.get("response_p50")
+    
+    @property
+    def response_p95(self):
+        """95th percentile response time in seconds (float or None without responses)."""
+        return self._metrics.get("response_p95")
+    
+    @property
+    def response_p99(self):
+        """99th percentile response time in seconds (float or None without responses)."""
+        return self._metrics.get("response_p99")
+    
+    @property
+    def session_duration(self):
+        """Seconds between the first and last timestamped entry (float)."""
+        return self._metrics.get("session_duration", 0.0)
+    
+    @property
+    def message_count(self):
+        """Number of user entries: prompts and tool results (int)."""
+        return self.state["message_count"]
+    
+    def payload(self):
+        """Return a status payload describing this session, as Claude Code would send it."""
+        input_data = {"transcript_path": self.transcript_path, "cwd": self.cwd}
+        if self.session_id:
+            input_data["session_id"] = self.session_id
+        return input_data
+    
+    def render(self, config=None):
+        """Render the status line from this session's in-memory state.
+        
+        Uses the same rendering path as the command line; the transcript
+        metrics are always those of the last update(), never the cache
+        checkpoint, even if the transcript has grown since. Call update()
+        first to include new entries.
+        
+        Args:
+            config: Configuration from make_config() (default: make_config())
+        
+        Returns:
+            The status line
+        """
+        output, _, _ = render_status(config or make_config(), self.payload(), memo={},
+                                     provided={"transcript": self.metrics})
+        return output
+
+def format_cache_break_report(state, numbers="compact"):
+    """Format the report's cache break section.
+    
+    Returns:
+        List of lines
+    """
+    lines = [f"Cache breaks: {state['cache_breaks']} ({format_number(state['cache_break_tokens'], numbers)} tokens "
+             f"re-written, {format_cost(state['cache_break_cost'])})"]
+    log = state["cache_break_log"]
+    if log:
+        if len(log) < state["cache_breaks"]:
+            lines.append(f"  (last {len(log)} shown)")
+        lines.append(f"  {'Time':<19}  {'Reason':<11}  {'Tokens':>8}  {'Cost':>8}  Preceding entry")
+        for item in log:
+            when = datetime.fromtimestamp(item["time"]).strftime("%Y-%m-%d %H:%M:%S") if item["time"] else "-"
+            lines.append(f"  {when:<19}  {item['reason']:<11}  {format_number(item['tokens'], numbers):>8}  "
+                         f"{format_cost(item['cost']):>8}  {item['parent_uuid'] or '-'}")
+    return lines
+
+def format_tool_report(state):
+    """Format the report's tool latency section, sorted by cumulative time.
+    
+    Returns:
+        List of lines
+    """
+    tools = get_tool_latency(state)
+    lines = [f"Tools: {sum(stats['count'] for stats in tools.values())} calls"]
+    if tools:
+        lines.append(f"  {'Tool':<24}  {'Calls':>6}  {'Total':>8}  {'Mean':>8}  {'p95':>8}  {'Max':>8}")
+        for name, stats in tools.items():
+            lines.append(f"  {name[:24]:<24}  {stats['count']:>6}  {format_duration(stats['total']):>8}  "
+                         f"{format_duration(stats['mean']):>8}  {format_duration(stats['p95']):>8}  {format_duration(stats['max']):>8}")
+    return lines
+
+def run_report(argv):
+    """Print a detailed analysis of one transcript.
+    
+    Uses (and updates) the same incremental checkpoint as the status line,
+    so reports on a live session are cheap.
+    
+    Returns:
+        Exit code
+    """
+    parser = argparse.ArgumentParser(prog="pyccsl report", description="Detailed transcript analysis")
+    parser.add_argument("transcript", help="Transcript file (.jsonl, optionally compressed)")
+    parser.add_argument("--numbers", choices=["compact", "full", "raw"], default="compact", help="Number formatting (default: compact)")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args(argv)
+    
+    state = load_transcript_state(args.transcript)
+    if state is None:
+        print(f"Error: Cannot read transcript {args.transcript}", file=sys.stderr)
+        return 3
+    metrics = get_transcript_metrics(state)
+    
+    if args.json:
+        print(json.dumps({
+            "transcript": args.transcript,
+            "metrics": metrics,
+            "cache_breaks": state["cache_break_log"],
+            "tools": get_tool_latency(state)
+        }, indent=2))
+        return 0
+    
+    lines = [
+        f"Transcript: {args.transcript}",
+        f"Entries: {state['entries']}  Cost: {format_cost(state['cost'])}  "
+        f"Cache hit rate: {metrics.get('cache_hit_rate', 0.0) * 100:.0f}%",
+        ""
+    ]
+    lines.extend(format_tool_report(state))
+    lines.append("")
+    lines.extend(format_cache_break_report(state, args.numbers))
+    print("\n".join(lines))
+    return 0
+
+# Sidechain entry uuids and subagent tracks remembered to assign later entries to their subagent's track
+TRACE_TRACK_LIMIT = 4096
+
+def iter_transcript_entries(transcript_path):
+    """Yield a transcript's entries one at a time, holding only the current line in memory."""
+    with io.TextIOWrapper(open_transcript_stream(transcript_path), encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(entry, dict):
+                yield entry
+
+def write_trace_events(entries, out):
+    """Write a transcript timeline as Chrome trace-event JSON, one event at a time.
+    
+    The main conversation and every subagent (a chain of isSidechain
+    entries) get a model track and a tool track. A model turn spans from
+    the preceding user or tool result entry to the assistant entry and
+    carries its tokens and cost; a tool span runs from the tool_use to its
+    tool_result. Only bounded lookup tables are kept, so memory does not
+    grow with the transcript: a track's pending input and message id are
+    dropped once its turn is emitted, and finished subagents are evicted
+    oldest first.
+    
+    Returns:
+        Number of events written
+    """
+    written = 0
+    
+    def emit(event):
+        nonlocal written
+        out.write((",\n" if written else "") + json.dumps(event))
+        written += 1
+    
+    agents = {}          # sidechain entry uuid -> subagent number
+    subagent_count = 0
+    last_input = {}      # subagent number (0 = main) -> time of its latest user/tool result entry not yet in a turn
+    last_message = {}    # subagent number -> id of its latest assistant message since its last input
+    
+    def name_tracks(agent):
+        label = "Main" if agent == 0 else f"Subagent {agent}"
+        emit({"ph": "M", "name": "thread_name", "pid": 1, "tid": 1 + 2 * agent, "args": {"name": f"{label}: model"}})
+        emit({"ph": "M", "name": "thread_name", "pid": 1, "tid": 2 + 2 * agent, "args": {"name": f"{label}: tools"}})
+    
+    def remember(table, agent, value):
+        # Most recently used last, so the oldest (finished) subagents are evicted first
+        table.pop(agent, None)
+        table[agent] = value
+        if len(table) > TRACE_TRACK_LIMIT:
+            del table[next(iter(table))]
+    pending = {}         # assistant entry uuid -> {"time", "tid", "calls": {tool_use_id: name}}
+    
+    out.write('{"displayTimeUnit": "ms", "traceEvents": [\n')
+    for entry in entries:
+        entry_type = entry.get("type")
+        entry_time = parse_entry_time(entry) if entry_type in ("user", "assistant") else None
+        if entry_time is None:
+            continue
+        
+        if not written:
+            emit({"ph": "M", "name": "process_name", "pid": 1, "tid": 0,
+                  "args": {"name": f"Session {entry.get('sessionId') or ''}".strip()}})
+            name_tracks(0)
+        
+        agent = 0
+        if entry.get("isSidechain"):
+            agent = agents.get(entry.get("parentUuid"))
+            if agent is None:
+                subagent_count += 1
+                agent = subagent_count
+                name_tracks(agent)
+            if entry.get("uuid"):
+                agents[entry["uuid"]] = agent
+                if len(agents) > TRACE_TRACK_LIMIT:
+                    del agents[next(iter(agents))]
+        model_tid, tool_tid = 1 + 2 * agent, 2 + 2 * agent
+        
+        timestamp = int(entry_time * 1_000_000)
+        message = entry.get("message") if isinstance(entry.get("message"), dict) else {}
+        content = message.get("content") if isinstance(message.get("content"), list) else []
+        
+        if entry_type == "user":
+            for block in content:
+                if not isinstance(block, dict) or block.get("type") != "tool_result":
+                    continue
+                tool_use_id = block.get("tool_use_id")
+                parent_uuid = entry.get("parentUuid")
+                if parent_uuid not in pending or tool_use_id not in pending[parent_uuid]["calls"]:
+                    parent_uuid = next((uuid for uuid, item in pending.items() if tool_use_id in item["calls"]), None)
+                    if parent_uuid is None:
+                        continue
+                call = pending[parent_uuid]
+                name = call["calls"].pop(tool_use_id)
+                if not call["calls"]:
+                    del pending[parent_uuid]
+                start = int(call["time"] * 1_000_000)
+                if timestamp >= start:
+                    emit({"ph": "X", "cat": "tool", "name": name, "pid": 1, "tid": call["tid"],
+                          "ts": start, "dur": timestamp - start, "args": {"tool_use_id": tool_use_id}})
+            remember(last_input, agent, entry_time)
+            # A new input starts a new turn: the next assistant message cannot repeat the last one
+            last_message.pop(agent, None)
+            continue
+        
+        message_id = message.get("id")
+        if message_id is None or last_message.get(agent) != message_id:
+            # Repeated entries of one message (one per content block) form a single turn
+            remember(last_message, agent, message_id)
+            usage = message.get("usage") if isinstance(message.get("usage"), dict) else {}
+            model_id = get_entry_model_id(message)
+            args = {
+                "model": model_id,
+                "input_tokens": usage.get("input_tokens", 0),
+                "cache_creation_tokens": usage.get("cache_creation_input_tokens", 0),
+                "cache_read_tokens": usage.get("cache_read_input_tokens", 0),
+                "output_tokens": usage.get("output_tokens", 0),
+                "cost": round(calculate_cost_per_entry(usage, model_id), 6) if model_id else 0.0,
+                "uuid": entry.get("uuid")
+            }
+            start = last_input.pop(agent, None)
+            if start is not None and 0 <= entry_time - start < RESPONSE_TIME_LIMIT:
+                emit({"ph": "X", "cat": "model", "name": "turn", "pid": 1, "tid": model_tid,
+                      "ts": int(start * 1_000_000), "dur": timestamp - int(start * 1_000_000), "args": args})
+            else:
+                # No preceding input within the response time limit (idle gap): mark the turn as an instant
+                emit({"ph": "i", "s": "t", "cat": "model", "name": "turn", "pid": 1, "tid": model_tid,
+                      "ts": timestamp, "args": args})
+        
+        calls = {block.get("id"): block.get("name") or "unknown" for block in content
+                 if isinstance(block, dict) and block.get("type") == "tool_use"}
+        if calls and entry.get("uuid"):
+            pending[entry["uuid"]] = {"time": entry_time, "tid": tool_tid, "calls": calls}
+            if len(pending) > PENDING_TOOL_LIMIT:
+                del pending[next(iter(pending))]
+    
+    out.write("\n]}\n")
+    return written
+
+def run_export_trace(argv):
+    """Export a transcript's timeline as Chrome trace-event JSON (Perfetto, chrome://tracing).
+    
+    Returns:
+        Exit code
+    """
+    parser = argparse.ArgumentParser(prog="pyccsl export-trace", description="Export a transcript as a Chrome trace")
+    parser.add_argument("transcript", help="Transcript file (.jsonl, optionally compressed)")
+    parser.add_argument("-o", "--output", default="-", help="Output file (default: stdout)")
+    args = parser.parse_args(argv)
+    
+    try:
+        if args.output == "-":
+            written = write_trace_events(iter_transcript_entries(args.transcript), sys.stdout)
+        else:
+            with open(args.output, "w", encoding="utf-8") as out:
+                written = write_trace_events(iter_transcript_entries(args.transcript), out)
+    except OSError as e:
+        print(f"Error: Cannot export trace: {e}", file=sys.stderr)
+        return 3
+    if args.output != "-":
+        print(f"Wrote {written} events to {args.output}", file=sys.stderr)
+    return 0
+
+# Token columns of the columnar usage engine and the PRICING_DATA rate each is priced at
+USAGE_COLUMNS = (
+    ("input", "input_tokens", "input"),
+    ("cache_write", "cache_creation_input_tokens", "cache_write_5m"),
+    ("cache_read", "cache_read_input_tokens", "cache_read"),
+    ("output", "output_tokens", "output")
+)
+
+def get_numpy():
+    """Return the numpy module, or None if it is not installed (the array fallback is used)."""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+def new_usage_columns():
+    """Return empty usage columns: one typed array per attribute, one row per usage entry.
+    
+    Models and projects are stored as 32-bit indexes into the models/projects
+    lists. Rows without a timestamp have a NaN time.
+    """
+    columns = {"models": [], "projects": [], "model": array.array("I"), "project": array.array("I"),
+               "time": array.array("d")}
+    for name, _, _ in USAGE_COLUMNS:
+        columns[name] = array.array("q")
+    return columns
+
+def intern_usage_label(columns, kind, label):
+    """Return the index of label in columns[kind] ("models" or "projects"), adding it if new."""
+    labels = columns[kind]
+    index = columns.setdefault(f"{kind}_index", {})
+    if label not in index:
+        index[label] = len(labels)
+        labels.append(label)
+    return index[label]
+
+def append_transcript_usage(columns, transcript_path):
+    """Append one row per usage-carrying entry of a transcript to the columns.
+    
+    Entries count exactly as in ingest_transcript_entry(): assistant messages
+    and dict-valued toolUseResult entries, the latter priced with their
+    parent message's model. Lines without "usage" are skipped before JSON
+    parsing. The project is the first cwd recorded in the transcript, or
+    its directory name.
+    
+    Returns:
+        Number of rows appended
+    
+    Raises:
+        OSError: If the transcript cannot be read
+    """
+    recent_models = {}
+    last_model_id = None
+    project = None
+    rows = 0
+    # Buffered for line iteration, which zstandard's stream reader lacks
+    with io.BufferedReader(open_transcript_stream(transcript_path)) as f:
+        for line in f:
+            if b'"usage"' not in line:
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(entry, dict):
+                continue
+            if entry.get("type") == "assistant" and "message" in entry:
+                usage = entry["message"].get("usage")
+                model_id = get_entry_model_id(entry["message"])
+                if model_id:
+                    last_model_id = model_id
+                    if entry.get("uuid"):
+                        recent_models[entry["uuid"]] = model_id
+                        if len(recent_models) > RECENT_MODEL_LIMIT:
+                            del recent_models[next(iter(recent_models))]
+            elif isinstance(entry.get("toolUseResult"), dict):
+                usage = entry["toolUseResult"].get("usage")
+                model_id = recent_models.get(entry.get("parentUuid")) or last_model_id
+            else:
+                continue
+            if not usage or not isinstance(usage, dict):
+                continue
+            if project is None:
+                project = intern_usage_label(columns, "projects", entry.get("cwd") or
+                                             os.path.basename(os.path.dirname(os.path.abspath(transcript_path))))
+            columns["model"].append(intern_usage_label(columns, "models", model_id))
+            columns["project"].append(project)
+            entry_time = parse_entry_time(entry)
+            columns["time"].append(float("nan") if entry_time is None else entry_time)
+            for name, usage_key, _ in USAGE_COLUMNS:
+                columns[name].append(usage.get(usage_key, 0) or 0)
+            rows += 1
+    return rows
+
+def build_rate_matrix(models):
+    """Return the per-model rate matrix: one row per model, one dollars-per-token rate per token column.
+    
+    Unknown models (and usage without a model) get a zero row, matching
+    calculate_cost_per_entry().
+    """
+    matrix = []
+    for model_id in models:
+        pricing = get_model_pricing(model_id) or {}
+        matrix.append([pricing.get(rate_key, 0) / 1_000_000 for _, _, rate_key in USAGE_COLUMNS])
+    return matrix
+
+def compute_column_costs(columns, numpy=None):
+    """Price every row of the usage columns.
+    
+    With numpy the token columns are viewed in place as an (n, 4) matrix and
+    multiplied row-wise against the rate matrix rows selected by the model
+    column, in one vectorized pass. Otherwise rows are priced in a loop over
+    the arrays.
+    
+    Returns:
+        Row costs in dollars (numpy array, or array("d") without numpy)
+    """
+    rates = build_rate_matrix(columns["models"])
+    if numpy is not None:
+        if not len(columns["model"]):
+            return numpy.zeros(0)
+        tokens = numpy.column_stack([numpy.frombuffer(columns[name], dtype=numpy.int64) for name, _, _ in USAGE_COLUMNS])
+        model = numpy.frombuffer(columns["model"], dtype=numpy.uint32)
+        return numpy.einsum("ij,ij->i", tokens, numpy.array(rates, dtype=numpy.float64)[model])
+    costs = array.array("d")
+    token_columns = [columns[name] for name, _, _ in USAGE_COLUMNS]
+    for model, input_tokens, write_tokens, read_tokens, output_tokens in zip(columns["model"], *token_columns):
+        rate = rates[model]
+        costs.append(input_tokens * rate[0] + write_tokens * rate[1] + read_tokens * rate[2] + output_tokens * rate[3])
+    return costs
+
+def get_usage_group_labels(columns, by):
+    """Return (row -> group index column, group labels) for a group-by of day, model or project.
+    
+    Days are local dates. They are derived per distinct hour rather than per
+    row, so a million rows cost a few thousand date conversions.
+    """
+    if by == "model":
+        return columns["model"], [model_id or "unknown" for model_id in columns["models"]]
+    if by == "project":
+        return columns["project"], list(columns["projects"])
+    days = {}
+    labels = []
+    group = array.array("I")
+    for entry_time in columns["time"]:
+        hour = -1 if entry_time != entry_time else int(entry_time // 3600)
+        if hour not in days:
+            day = datetime.fromtimestamp(hour * 3600).strftime("%Y-%m-%d") if hour >= 0 else "unknown"
+            if day not in labels:
+                labels.append(day)
+            days[hour] = labels.index(day)
+        group.append(days[hour])
+    return group, labels
+
+def group_usage_columns(columns, by, numpy=None):
+    """Sum rows, token columns and cost per group.
+    
+    Args:
+        columns: Usage columns from append_transcript_usage()
+        by: "day", "model" or "project"
+        numpy: The numpy module for vectorized sums (bincount), or None
+    
+    Returns:
+        List of {"group", "rows", "cost", <token column>...} dicts, days in
+        date order and other groups by descending cost
+    """
+    costs = compute_column_costs(columns, numpy)
+    if by == "day" and numpy is not None and len(costs):
+        # Vectorized: distinct hours first, then one date conversion per hour
+        times = numpy.frombuffer(columns["time"], dtype=numpy.float64)
+        hours = numpy.where(numpy.isnan(times), -1, numpy.floor(numpy.nan_to_num(times, nan=0.0) / 3600)).astype(numpy.int64)
+        distinct_hours, hour_group = numpy.unique(hours, return_inverse=True)
+        hour_days = [datetime.fromtimestamp(int(hour) * 3600).strftime("%Y-%m-%d") if hour >= 0 else "unknown"
+                     for hour in distinct_hours]
+        labels, day_index = numpy.unique(numpy.array(hour_days), return_inverse=True)
+        group, labels = day_index[hour_group.ravel()], [str(label) for label in labels]
+    else:
+        group, labels = get_usage_group_labels(columns, by)
+    
+    if numpy is not None:
+        group = numpy.asarray(group, dtype=numpy.int64)
+        size = len(labels)
+        sums = {"rows": numpy.bincount(group, minlength=size), "cost": numpy.bincount(group, weights=costs, minlength=size)}
+        for name, _, _ in USAGE_COLUMNS:
+            sums[name] = numpy.bincount(group, weights=numpy.frombuffer(columns[name], dtype=numpy.int64), minlength=size)
+        groups = [{"group": label, "rows": int(sums["rows"][i]), "cost": float(sums["cost"][i]),
+                   **{name: int(sums[name][i]) for name, _, _ in USAGE_COLUMNS}} for i, label in enumerate(labels)]
+    else:
+        groups = [{"group": label, "rows": 0, "cost": 0.0, **{name: 0 for name, _, _ in USAGE_COLUMNS}} for label in labels]
+        token_columns = [(name, columns[name]) for name, _, _ in USAGE_COLUMNS]
+        for row, index in enumerate(group):
+            totals = groups[index]
+            totals["rows"] += 1
+            totals["cost"] += costs[row]
+            for name, values in token_columns:
+                totals[name] += values[row]
+    
+    groups = [totals for totals in groups if totals["rows"]]
+    if by == "day":
+        return sorted(groups, key=lambda totals: totals["group"])
+    return sorted(groups, key=lambda totals: -totals["cost"])
+
+def find_transcripts(paths):
+    """Expand files and directories (searched recursively) into transcript paths."""
+    suffixes = (".jsonl",) + tuple(".jsonl" + suffix for suffix in TRANSCRIPT_CODECS)
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                found.extend(os.path.join(root, name) for name in sorted(files) if name.endswith(suffixes))
+        else:
+            found.append(path)
+    return found
+
+def run_analyze(argv):
+    """Total cost and tokens over many transcripts, grouped by day, model or project.
+    
+    Usage is loaded into typed columns and priced and grouped in bulk
+    (vectorized with numpy when it is installed).
+    
+    Returns:
+        Exit code
+    """
+    parser = argparse.ArgumentParser(prog="pyccsl analyze", description="Cost and token totals across transcripts")
+    parser.add_argument("paths", nargs="*", help="Transcript files or directories (default: ~/.claude/projects)")
+    parser.add_argument("--by", choices=["day", "model", "project"], default="day", help="Grouping (default: day)")
+    parser.add_argument("--engine", choices=["auto", "numpy", "array"], default="auto",
+                        help="Column engine: numpy, the pure-Python array fallback, or numpy when installed (default: auto)")
+    parser.add_argument("--numbers", choices=["compact", "full", "raw"], default="compact", help="Number formatting (default: compact)")
+    parser.add_argument("--json", action="store_true", help="Print the groups as JSON")
+    args = parser.parse_args(argv)
+    
+    numpy = get_numpy() if args.engine != "array" else None
+    if args.engine == "numpy" and numpy is None:
+        print("Error: --engine numpy requires the 'numpy' package", file=sys.stderr)
+        return 3
+    
+    columns = new_usage_columns()
+    transcripts = find_transcripts(args.paths or [os.path.expanduser(os.path.join("~", ".claude", "projects"))])
+    started = time.perf_counter()
+    for transcript_path in transcripts:
+        try:
+            append_transcript_usage(columns, transcript_path)
+        except (OSError, EOFError) as e:
+            sys.stderr.write(f"Warning: Skipping {transcript_path}: {e}\n")
+    loaded = time.perf_counter()
+    groups = group_usage_columns(columns, args.by, numpy)
+    grouped = time.perf_counter()
+    rows = len(columns["model"])
+    
+    if args.json:
+        print(json.dumps({"by": args.by, "transcripts": len(transcripts), "rows": rows,
+                          "engine": "numpy" if numpy is not None else "array", "groups": groups}, indent=2))
+        return 0
+    
+    width = max([len(args.by)] + [len(totals["group"]) for totals in groups])
+    lines = [f"{args.by.capitalize():<{width}}  {'Rows':>8}  {'Input':>8}  {'Output':>8}  {'Cache wr':>8}  {'Cache rd':>8}  {'Cost':>9}"]
+    for totals in groups + [{"group": "Total", "rows": rows, "cost": sum(totals["cost"] for totals in groups),
+                             **{name: sum(totals[name] for totals in groups) for name, _, _ in USAGE_COLUMNS}}]:
+        lines.append(f"{totals['group']:<{width}}  {totals['rows']:>8}  " +
+                     "  ".join(f"{format_number(totals[name], args.numbers):>8}" for name in ("input", "output", "cache_write", "cache_read")) +
+                     f"  {format_cost(totals['cost']):>9}")
+    lines.append(f"{rows} usage rows from {len(transcripts)} transcripts: loaded in {(loaded - started) * 1000:.0f} ms, "
+                 f"priced and grouped in {(grouped - loaded) * 1000:.1f} ms ({'numpy' if numpy is not None else 'array'})")
+    print("\n".join(lines))
+    return 0
+
+# Subcommands dispatched on the first argument (the default is rendering the status line)
+COMMANDS = {
+    "loadtest": run_loadtest,
+    "replay": run_replay,
+    "bench": run_bench,
+    "prewarm": run_prewarm,
+    "report": run_report,
+    "export-trace": run_export_trace,
+    "analyze": run_analyze,
+    "_warm": run_warm,
+    "_plugin": run_plugin_refresh
+}
+
+def main():
+    """Main entry point."""
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+        return COMMANDS[sys.argv[1]](sys.argv[2:])
+    
+    # Parse arguments
+    config = parse_arguments()
+    debug = config.get("debug", False)
+    
+    if debug:
+        sys.stderr.write(f"DEBUG: Config: {config}\n")
+    
+    if config["batch"]:
+        return run_batch(config)
+    
+    # Read input
+    input_data = read_input()
+    
+    if debug:
+        sys.stderr.write(f"DEBUG: Input data keys: {list(input_data.keys())}\n")
+        sys.stderr.write(f"DEBUG: Model: {input_data.get('model', 'None')}\n")
+        sys.stderr.write(f"DEBUG: Transcript path: {input_data.get('transcript_path', 'None')}\n")
+        sys.stderr.write(f"DEBUG: CWD: {input_data.get('cwd', 'None')}\n")
+    
+    if config["record_dir"]:
+        try:
+            argv = [arg for i, arg in enumerate(sys.argv[1:], 1)
+                    if not arg.startswith("--record") and sys.argv[i - 1] != "--record"]
+            record_invocation(config["record_dir"], input_data, argv)
+        except OSError as e:
+            sys.stderr.write(f"Warning: Could not record invocation: {e}\n")
+    
+    if config["watch"]:
+        return run_watch(config, input_data)
+    
+    # A one-shot render's budget includes interpreter startup
+    if config["debounce_ms"] > 0:
+        output, metrics, record = render_debounced(config, input_data, started=START_TIME)
+    else:
+        output, model_info, metrics = render_status(config, input_data, started=START_TIME)
+        record = build_status_record(model_info, input_data, metrics, output) if config["format"] != "text" else None
+    if config["format"] in ("text", "both"):
+        print(output)
+    if config["format"] in ("json", "both"):
+        print(json.dumps(record))
+    
+    if config["metrics_dir"] and metrics is not None:
+        # Export after the line is out so it never delays the status line
+        sys.stdout.flush()
+        export_openmetrics(config, input_data, metrics)
+    
+    if threading.active_count() > 1:
+        # Providers abandoned at the deadline must not delay exit; the background warmer finishes
+        # them. The line is complete once stdout is closed; then an unfinished transcript catch-up
+        # gets a moment to checkpoint its progress, and cache writes already under way complete so
+        # no temp file is left behind.
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.close(sys.stdout.fileno())
+        _ingest_stop.set()
+        stop_by = time.monotonic() + INGEST_STOP_WAIT
+        for thread in threading.enumerate():
+            if thread.name.startswith("pyccsl-"):
+                thread.join(max(0.0, stop_by - time.monotonic()))
+        finish_writes()
+        os._exit(0)
     
     return 0
 
 if __name__ == "__main__":
-    sys.exit(main())
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,57 @@
+"""Shared fixtures: import pyccsl.py from the repository root and isolate its cache."""
+import datetime
+import json
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    """Give every test its own PYCCSL_CACHE_DIR."""
+    path = tmp_path / "cache"
+    monkeypatch.setenv("PYCCSL_CACHE_DIR", str(path))
+    return path
+
+def make_transcript_lines(turns, seed=1, start=1_790_000_000.0):
+    """Return synthetic transcript lines: user prompt, assistant turn with a tool call, tool result."""
+    rng = random.Random(seed)
+    models = ["claude-sonnet-4-20250514", "claude-opus-4-1-20250805"]
+    now = start
+    parent = None
+    lines = []
+
+    def stamp(seconds):
+        return datetime.datetime.fromtimestamp(seconds, datetime.timezone.utc).isoformat().replace("+00:00", "Z")
+
+    for turn in range(turns):
+        user, assistant, result = f"u{seed}-{turn}", f"a{seed}-{turn}", f"r{seed}-{turn}"
+        lines.append(json.dumps({"type": "user", "uuid": user, "parentUuid": parent, "timestamp": stamp(now),
+                                 "message": {"role": "user", "content": f"do thing {turn}"}}))
+        now += rng.uniform(1, 20)
+        usage = {"input_tokens": rng.randint(1, 50), "cache_creation_input_tokens": rng.randint(100, 2000),
+                 "cache_read_input_tokens": rng.randint(0, 50000), "output_tokens": rng.randint(20, 800)}
+        lines.append(json.dumps({"type": "assistant", "uuid": assistant, "parentUuid": user, "timestamp": stamp(now),
+                                 "message": {"id": f"msg-{seed}-{turn}", "model": rng.choice(models), "role": "assistant",
+                                             "content": [{"type": "tool_use", "id": f"t{seed}-{turn}", "name": "Bash", "input": {}}],
+                                             "usage": usage}}))
+        now += rng.uniform(0.1, 10)
+        lines.append(json.dumps({"type": "user", "uuid": result, "parentUuid": assistant, "timestamp": stamp(now),
+                                 "message": {"role": "user", "content": [{"type": "tool_result", "tool_use_id": f"t{seed}-{turn}",
+                                                                          "content": "x" * rng.randint(0, 400)}]},
+                                 "toolUseResult": {"stdout": "x"}}))
+        parent = result
+        now += rng.uniform(1, 5)
+    return lines
+
+@pytest.fixture
+def transcript_factory(tmp_path):
+    """Write a synthetic transcript of the given number of turns and return its path."""
+    def write(turns, seed=1, name="transcript.jsonl", **kwargs):
+        path = tmp_path / name
+        path.write_text("\n".join(make_transcript_lines(turns, seed, **kwargs)) + "\n")
+        return str(path)
+    return write
@@ -0,0 +1,49 @@
+"""Columnar usage totals for the analyze command."""
+import shutil
+
+import pytest
+
+import pyccsl
+
+ENGINES = [None, pytest.param("numpy", marks=pytest.mark.skipif(pyccsl.get_numpy() is None, reason="numpy is not installed"))]
+
+def load_columns(*paths):
+    columns = pyccsl.new_usage_columns()
+    for path in paths:
+        pyccsl.append_transcript_usage(columns, path)
+    return columns
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_totals_match_incremental_ingestion(transcript_factory, engine):
+    path = transcript_factory(200)
+    numpy = pyccsl.get_numpy() if engine else None
+    groups = pyccsl.group_usage_columns(load_columns(path), "model", numpy)
+    state = pyccsl.update_transcript_state(path)
+    assert sum(group["rows"] for group in groups) == 200
+    assert sum(group["cost"] for group in groups) == pytest.approx(state["cost"])
+    assert sum(group["output"] for group in groups) == state["tokens"]["output_tokens"]
+
+def test_zstandard_transcripts_are_read(transcript_factory, tmp_path):
+    zstandard = pytest.importorskip("zstandard")
+    path = transcript_factory(50)
+    compressed = tmp_path / "compressed.jsonl.zst"
+    with open(path, "rb") as src, open(compressed, "wb") as dst:
+        zstandard.ZstdCompressor().copy_stream(src, dst)
+    assert pyccsl.append_transcript_usage(pyccsl.new_usage_columns(), str(compressed)) == 50
+    plain = pyccsl.group_usage_columns(load_columns(path), "day")
+    assert pyccsl.group_usage_columns(load_columns(str(compressed)), "day") == plain
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_more_than_65535_projects(engine):
+    columns = pyccsl.new_usage_columns()
+    count = 70000
+    for i in range(count):
+        columns["model"].append(pyccsl.intern_usage_label(columns, "models", "claude-sonnet-4-20250514"))
+        columns["project"].append(pyccsl.intern_usage_label(columns, "projects", f"project-{i}"))
+        columns["time"].append(float("nan"))
+        for name, _, _ in pyccsl.USAGE_COLUMNS:
+            columns[name].append(1)
+    numpy = pyccsl.get_numpy() if engine else None
+    groups = pyccsl.group_usage_columns(columns, "project", numpy)
+    assert len(groups) == count
+    assert {group["group"] for group in groups} == {f"project-{i}" for i in range(count)}
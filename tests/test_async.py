@@ -0,0 +1,69 @@
+"""--async-fields two-phase rendering and the per-session worker cap."""
+import contextlib
+
+import pytest
+
+import pyccsl
+from conftest import make_transcript_lines
+
+@pytest.fixture
+def spawned(monkeypatch):
+    """Record background workers instead of starting them."""
+    calls = []
+    monkeypatch.setattr(pyccsl, "spawn_background", lambda args, input_data: calls.append(args) or True)
+    return calls
+
+def payload(transcript_factory, tmp_path):
+    return {"session_id": "a1", "transcript_path": transcript_factory(10), "cwd": str(tmp_path)}
+
+def test_provider_is_deferred_only_when_all_its_fields_are_listed():
+    config = pyccsl.make_config("cost,perf-message-count,git", theme="none", async_fields=["cost"])
+    assert pyccsl.get_deferred_providers(config, ["git", "transcript"]) == []
+    config["async_fields"] = ["cost", "perf-message-count"]
+    assert pyccsl.get_deferred_providers(config, ["git", "transcript"]) == ["transcript"]
+    config["async_fields"] = ["all"]
+    assert pyccsl.get_deferred_providers(config, ["git", "transcript"]) == ["git", "transcript"]
+
+def test_deferred_field_is_pending_then_filled_by_the_worker(spawned, transcript_factory, tmp_path):
+    config = pyccsl.make_config("folder,cost", theme="none", async_fields=["cost"])
+    input_data = payload(transcript_factory, tmp_path)
+    first = pyccsl.render(input_data, config)
+    assert pyccsl.PENDING_MARKER in first
+    assert spawned == [["_warm", "transcript", "1"]]
+
+    assert pyccsl.warm_providers(["transcript"], input_data)
+    second = pyccsl.render(input_data, config)
+    assert second == pyccsl.render(input_data, pyccsl.make_config("folder,cost", theme="none"))
+    # Unchanged inputs: the stored value is used without another refresh
+    assert len(spawned) == 1
+
+def test_changed_inputs_show_the_stale_value_and_refresh(spawned, transcript_factory, tmp_path):
+    config = pyccsl.make_config("perf-message-count", theme="none", async_fields=["perf-message-count"])
+    input_data = payload(transcript_factory, tmp_path)
+    pyccsl.warm_providers(["transcript"], input_data)
+    with open(input_data["transcript_path"], "a") as f:
+        f.write("\n".join(make_transcript_lines(2, seed=2)) + "\n")
+
+    _, metrics = pyccsl.collect_metrics(config, input_data)
+    assert metrics["message_count"] == 20
+    assert metrics["stale"] == ["transcript"]
+    assert spawned == [["_warm", "transcript", "1"]]
+
+    pyccsl.warm_providers(["transcript"], input_data)
+    _, metrics = pyccsl.collect_metrics(config, input_data)
+    assert metrics["message_count"] == 24
+    assert metrics["stale"] == []
+
+def test_worker_cap_bounds_concurrent_workers(spawned):
+    input_data = {"session_id": "cap"}
+    key = pyccsl.get_session_key(input_data)
+    with contextlib.ExitStack() as stack:
+        assert stack.enter_context(pyccsl.worker_slot(key, 2))
+        assert stack.enter_context(pyccsl.worker_slot(key, 2))
+        assert not stack.enter_context(pyccsl.worker_slot(key, 2))
+        assert not pyccsl.spawn_warm(["transcript"], input_data, workers=2)
+        assert not pyccsl.warm_providers(["transcript"], input_data, workers=2)
+        # Another session has its own slots
+        assert pyccsl.spawn_warm(["transcript"], {"session_id": "other"}, workers=2)
+    assert spawned == [["_warm", "transcript", "2"]]
+    assert pyccsl.spawn_warm(["transcript"], input_data, workers=2)
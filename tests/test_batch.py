@@ -0,0 +1,75 @@
+"""Bulk rendering with --batch and --jobs."""
+import io
+import json
+
+import pytest
+
+import pyccsl
+
+@pytest.fixture(autouse=True)
+def fresh_memo(monkeypatch):
+    monkeypatch.setattr(pyccsl, "_batch_memo", {})
+
+def run_batch(monkeypatch, capsys, lines, fields="cost,messages", **options):
+    monkeypatch.setattr("sys.stdin", io.StringIO("".join(line + "\n" for line in lines)))
+    config = pyccsl.make_config(fields, theme="none", batch=True, **options)
+    assert pyccsl.run_batch(config) == 0
+    captured = capsys.readouterr()
+    return captured.out.splitlines(), captured.err
+
+def payloads(transcript_factory, tmp_path, sizes):
+    return [json.dumps({"session_id": f"b{turns}", "transcript_path": transcript_factory(turns, name=f"b{turns}.jsonl"),
+                        "cwd": str(tmp_path)}) for turns in sizes]
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_output_follows_input_order(jobs, transcript_factory, tmp_path, monkeypatch, capsys):
+    sizes = [3, 1, 7, 2, 5, 4]
+    out, _ = run_batch(monkeypatch, capsys, payloads(transcript_factory, tmp_path, sizes), format="json", jobs=jobs)
+    assert [json.loads(line)["metrics"]["message_count"] for line in out] == [2 * turns for turns in sizes]
+
+def test_provider_results_are_reused_across_payloads(transcript_factory, tmp_path, monkeypatch, capsys):
+    calls = []
+    real_provider = pyccsl.PROVIDERS["transcript"]
+
+    def counting_provider(input_data, debug=False):
+        calls.append(input_data["transcript_path"])
+        return real_provider(input_data, debug)
+
+    monkeypatch.setitem(pyccsl.PROVIDERS, "transcript", counting_provider)
+    line = payloads(transcript_factory, tmp_path, [4])[0]
+    other = payloads(transcript_factory, tmp_path, [6])[0]
+    out, _ = run_batch(monkeypatch, capsys, [line, line, other, line])
+    assert len(out) == 4
+    assert out[0] == out[1] == out[3] != out[2]
+    assert len(calls) == 2
+
+def test_malformed_line_does_not_stop_the_batch(transcript_factory, tmp_path, monkeypatch, capsys):
+    first, second = payloads(transcript_factory, tmp_path, [2, 3])
+    out, err = run_batch(monkeypatch, capsys, [first, "{not json", "[1, 2]", second], format="json")
+    assert len(out) == 4
+    assert json.loads(out[1]) == {"line_number": 2, "error": json.loads(out[1])["error"]}
+    assert json.loads(out[2])["line_number"] == 3
+    assert json.loads(out[3])["metrics"]["message_count"] == 6
+    assert "Invalid JSON payload at line 2" in err
+
+    # Text output keeps the line count aligned with an empty line
+    out, _ = run_batch(monkeypatch, capsys, [first, "{not json", second])
+    assert len(out) == 3
+    assert out[1] == ""
+    assert out[0] and out[2]
+
+def test_failing_provider_does_not_stop_the_batch(transcript_factory, tmp_path, monkeypatch, capsys):
+    real_provider = pyccsl.PROVIDERS["transcript"]
+
+    def flaky_provider(input_data, debug=False):
+        if input_data["session_id"] == "b3":
+            raise RuntimeError("boom")
+        return real_provider(input_data, debug)
+
+    monkeypatch.setitem(pyccsl.PROVIDERS, "transcript", flaky_provider)
+    out, err = run_batch(monkeypatch, capsys, payloads(transcript_factory, tmp_path, [2, 3, 4]),
+                         format="json", debug=True)
+    assert len(out) == 3
+    assert json.loads(out[0])["metrics"]["message_count"] == 4
+    assert json.loads(out[2])["metrics"]["message_count"] == 8
+    assert "Provider transcript failed: boom" in err
@@ -0,0 +1,25 @@
+"""The bench command."""
+import json
+
+import pyccsl
+from conftest import make_transcript_lines
+
+def test_bench_survives_a_transcript_it_cannot_sample(tmp_path, capsys):
+    # Lines far longer than a sample block: no sample holds a complete entry
+    lines = []
+    for line in make_transcript_lines(4):
+        entry = json.loads(line)
+        entry["padding"] = "x" * 300_000
+        lines.append(json.dumps(entry))
+    path = tmp_path / "transcript.jsonl"
+    path.write_text("\n".join(lines) + "\n")
+    assert pyccsl.estimate_transcript_metrics(str(path), blocks=16) == {}
+
+    assert pyccsl.run_bench([str(path), "--repeat", "1"]) == 0
+    assert "no estimate" in capsys.readouterr().out
+
+def test_bench_compares_the_estimator(transcript_factory, capsys):
+    assert pyccsl.run_bench([transcript_factory(30), "--repeat", "1"]) == 0
+    out = capsys.readouterr().out
+    assert "Sampling estimator" in out
+    assert "% read" in out
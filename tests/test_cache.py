@@ -0,0 +1,118 @@
+"""Cache directory safety: atomic writes, corruption recovery and locked updates under concurrency."""
+import multiprocessing
+import os
+import random
+import threading
+import time
+
+import pyccsl
+
+PROCESSES = 8
+ITERATIONS = 100
+LOCK_TIMEOUT = 0.5
+
+def stress_worker(worker_id, workers, iterations, lock_timeout, results):
+    """Hammer the cache from one process: own-session writes, cross-session reads, locked counter."""
+    stats = {"writes": 0, "reads": 0, "corrupt": 0, "increments": 0, "lock_timeouts": 0, "max_lock_wait": 0.0}
+    own_path = pyccsl.get_cache_path("sessions", f"stress-{worker_id}.json")
+    counter_path = pyccsl.get_cache_path("shared", "stress-counter.json")
+    rng = random.Random(worker_id)
+
+    for iteration in range(iterations):
+        # Per-session state: only this worker writes it
+        body = "x" * rng.randint(0, 4096)
+        pyccsl.write_cache_json(own_path, {"worker": worker_id, "iteration": iteration, "body": body, "size": len(body)})
+        stats["writes"] += 1
+
+        # Read another session's file while its owner may be replacing it
+        other_path = pyccsl.get_cache_path("sessions", f"stress-{rng.randrange(workers)}.json")
+        try:
+            with open(other_path, "rb") as f:
+                blob = f.read()
+            data = pyccsl.decode_cache_blob(blob)
+            if len(data["body"]) != data["size"]:
+                stats["corrupt"] += 1
+            stats["reads"] += 1
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError, UnicodeDecodeError):
+            stats["corrupt"] += 1
+
+        # Shared read-modify-write under the advisory lock
+        started = time.monotonic()
+        with pyccsl.cache_lock("stress-counter", timeout=lock_timeout) as acquired:
+            stats["max_lock_wait"] = max(stats["max_lock_wait"], time.monotonic() - started)
+            if acquired:
+                counter = pyccsl.read_cache_json(counter_path) or {"count": 0}
+                counter["count"] += 1
+                pyccsl.write_cache_json(counter_path, counter)
+                stats["increments"] += 1
+            else:
+                stats["lock_timeouts"] += 1
+
+    results.put(stats)
+
+def test_corrupted_file_is_discarded_and_rebuilt():
+    path = pyccsl.get_cache_path("sessions", "probe.json")
+    pyccsl.write_cache_json(path, {"ok": True})
+    with open(path, "rb") as f:
+        blob = f.read()
+    with open(path, "wb") as f:
+        f.write(blob[:-3])
+
+    assert pyccsl.read_cache_json(path) is None
+    assert not os.path.exists(path)
+    pyccsl.write_cache_json(path, {"ok": True})
+    assert pyccsl.read_cache_json(path) == {"ok": True}
+
+def test_concurrent_processes_never_tear_reads_or_lose_updates():
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=stress_worker, args=(i, PROCESSES, ITERATIONS, LOCK_TIMEOUT, results))
+                 for i in range(PROCESSES)]
+    for process in processes:
+        process.start()
+    stats = [results.get(timeout=60) for _ in processes]
+    for process in processes:
+        process.join()
+
+    totals = {key: sum(s[key] for s in stats) for key in ("writes", "reads", "corrupt", "increments", "lock_timeouts")}
+    counter = pyccsl.read_cache_json(pyccsl.get_cache_path("shared", "stress-counter.json")) or {"count": 0}
+    assert totals["writes"] == PROCESSES * ITERATIONS
+    assert totals["corrupt"] == 0
+    assert counter["count"] == totals["increments"]
+    assert max(s["max_lock_wait"] for s in stats) <= LOCK_TIMEOUT + 0.1
+
+def store_values_worker(name, iterations):
+    for i in range(iterations):
+        assert pyccsl.store_provider_values("s1", {name: i}, timeout=5.0)
+
+def test_concurrent_value_stores_keep_every_provider():
+    names = [f"provider{i}" for i in range(6)]
+    processes = [multiprocessing.Process(target=store_values_worker, args=(name, 30)) for name in names]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(60)
+        assert process.exitcode == 0
+    assert pyccsl.load_provider_values("s1") == {name: 29 for name in names}
+
+def test_finish_writes_waits_for_writes_in_progress(tmp_path, monkeypatch):
+    started = threading.Event()
+    release = threading.Event()
+    real_fdopen = os.fdopen
+
+    def slow_fdopen(fd, mode):
+        started.set()
+        release.wait(5)
+        return real_fdopen(fd, mode)
+
+    monkeypatch.setattr(pyccsl.os, "fdopen", slow_fdopen)
+    monkeypatch.setitem(pyccsl._writes_state, "closed", False)
+    writer = threading.Thread(target=pyccsl.atomic_write, args=(str(tmp_path / "out"), "data"), daemon=True)
+    writer.start()
+    assert started.wait(5)
+    assert not pyccsl.finish_writes(timeout=0.05)
+    release.set()
+    assert pyccsl.finish_writes(timeout=5)
+    assert (tmp_path / "out").read_text() == "data"
+    assert [p.name for p in tmp_path.iterdir()] == ["out"]
@@ -0,0 +1,82 @@
+"""Prompt cache break detection and the 'report' command."""
+import datetime
+import json
+
+import pytest
+
+import pyccsl
+
+MODEL = "claude-sonnet-4-20250514"
+START = 1_790_000_000.0
+
+def stamp(seconds):
+    return datetime.datetime.fromtimestamp(seconds, datetime.timezone.utc).isoformat().replace("+00:00", "Z")
+
+def turn(n, offset, cache_read, cache_write, message_id=None, **extra):
+    """An assistant entry at START + offset with the given cache usage."""
+    entry = {"type": "assistant", "uuid": f"a{n}", "parentUuid": f"u{n}", "timestamp": stamp(START + offset),
+             "message": {"id": message_id or f"msg-{n}", "model": MODEL, "role": "assistant",
+                         "content": [{"type": "text", "text": "ok"}],
+                         "usage": {"input_tokens": 5, "output_tokens": 50, "cache_read_input_tokens": cache_read,
+                                   "cache_creation_input_tokens": cache_write}}}
+    entry.update(extra)
+    return json.dumps(entry)
+
+def write(tmp_path, lines):
+    path = tmp_path / "breaks.jsonl"
+    path.write_text("\n".join(lines) + "\n")
+    return str(path)
+
+def state_of(lines):
+    state = pyccsl.new_transcript_state()
+    for line in lines:
+        pyccsl.ingest_transcript_line(state, line.encode("utf-8"))
+    return state
+
+def test_growing_prefix_is_not_a_break():
+    state = state_of([turn(1, 0, 0, 10_000), turn(2, 30, 10_000, 500), turn(3, 60, 10_500, 800)])
+    assert state["cache_breaks"] == 0
+
+def test_lost_prefix_is_an_invalidation():
+    state = state_of([turn(1, 0, 0, 10_000), turn(2, 30, 1_000, 9_500)])
+    assert state["cache_breaks"] == 1
+    assert state["cache_break_tokens"] == 9_000
+    pricing = pyccsl.get_model_pricing(MODEL)
+    assert state["cache_break_cost"] == pytest.approx(9_000 * (pricing["cache_write_5m"] - pricing["cache_read"]) / 1e6)
+    item = state["cache_break_log"][0]
+    assert (item["reason"], item["uuid"], item["parent_uuid"]) == ("invalidated", "a2", "u2")
+
+def test_break_after_the_ttl_is_an_expiry():
+    state = state_of([turn(1, 0, 0, 10_000), turn(2, pyccsl.PROMPT_CACHE_TTL + 60, 0, 10_200)])
+    assert state["cache_break_log"][0]["reason"] == "expired"
+    assert state["cache_break_tokens"] == 10_000
+
+def test_small_prefixes_and_repeated_entries_are_ignored():
+    small = state_of([turn(1, 0, 0, pyccsl.CACHE_BREAK_MIN_TOKENS - 1), turn(2, 30, 0, 3_000)])
+    assert small["cache_breaks"] == 0
+    # One message split over several entries repeats its usage
+    repeated = state_of([turn(1, 0, 0, 10_000, message_id="m"), turn(2, 1, 0, 10_000, message_id="m")])
+    assert repeated["cache_breaks"] == 0
+
+def test_subagent_turns_do_not_break_the_main_cache():
+    state = state_of([turn(1, 0, 0, 10_000), turn(2, 10, 0, 4_000, isSidechain=True),
+                      turn(3, 20, 10_000, 200)])
+    assert state["cache_breaks"] == 0
+
+def test_report_lists_the_breaks(tmp_path, capsys):
+    path = write(tmp_path, [turn(1, 0, 0, 10_000), turn(2, 30, 0, 10_000), turn(3, 60, 10_000, 100)])
+    assert pyccsl.run_report([path, "--numbers", "raw"]) == 0
+    out = capsys.readouterr().out
+    assert f"Transcript: {path}" in out
+    assert "Cache breaks: 1 (10000 tokens re-written" in out
+    assert "invalidated" in out
+    assert "u2" in out
+
+    assert pyccsl.run_report([path, "--json"]) == 0
+    report = json.loads(capsys.readouterr().out)
+    assert report["metrics"]["cache_breaks"] == 1
+    assert [item["uuid"] for item in report["cache_breaks"]] == ["a2"]
+
+def test_report_on_a_missing_transcript_fails(tmp_path, capsys):
+    assert pyccsl.run_report([str(tmp_path / "missing.jsonl")]) == 3
+    assert "Cannot read transcript" in capsys.readouterr().err
@@ -0,0 +1,66 @@
+"""The cache-ttl field: prompt cache expiry from the transcript tail."""
+import datetime
+import json
+import re
+import time
+
+import pyccsl
+from conftest import make_transcript_lines
+
+def stamp(seconds):
+    return datetime.datetime.fromtimestamp(seconds, datetime.timezone.utc).isoformat().replace("+00:00", "Z")
+
+def last_assistant_time(lines):
+    entry = next(json.loads(line) for line in reversed(lines) if json.loads(line)["type"] == "assistant")
+    return pyccsl.parse_entry_time(entry)
+
+def write(tmp_path, lines, name="t.jsonl"):
+    path = tmp_path / name
+    path.write_text("\n".join(lines) + "\n")
+    return str(path)
+
+def test_expiry_follows_the_last_cache_use(tmp_path):
+    lines = make_transcript_lines(5, start=time.time() - 120)
+    result = pyccsl.provide_cache_ttl({"transcript_path": write(tmp_path, lines)})
+    assert result["cache_ttl"] == pyccsl.PROMPT_CACHE_TTL
+    assert result["cache_expires_at"] == last_assistant_time(lines) + pyccsl.PROMPT_CACHE_TTL
+
+def test_one_hour_cache_writes_extend_the_ttl(tmp_path):
+    lines = make_transcript_lines(3, start=time.time() - 120)
+    entry = json.loads(lines[-2])
+    entry["message"]["usage"]["cache_creation"] = {"ephemeral_1h_input_tokens": 500, "ephemeral_5m_input_tokens": 0}
+    lines[-2] = json.dumps(entry)
+    result = pyccsl.provide_cache_ttl({"transcript_path": write(tmp_path, lines)})
+    assert result["cache_ttl"] == pyccsl.PROMPT_CACHE_TTL_EXTENDED
+
+def test_subagent_turns_are_ignored(tmp_path):
+    lines = make_transcript_lines(3, start=time.time() - 600)
+    main_time = last_assistant_time(lines)
+    sidechain = json.loads(lines[-2])
+    sidechain.update(isSidechain=True, uuid="side", timestamp=stamp(main_time + 200))
+    sidechain["message"]["usage"]["cache_creation"] = {"ephemeral_1h_input_tokens": 500}
+    lines.append(json.dumps(sidechain))
+    result = pyccsl.provide_cache_ttl({"transcript_path": write(tmp_path, lines)})
+    assert result == {"cache_expires_at": main_time + pyccsl.PROMPT_CACHE_TTL, "cache_ttl": pyccsl.PROMPT_CACHE_TTL}
+
+def test_tail_grows_past_turns_without_cache_use(tmp_path):
+    lines = make_transcript_lines(3, start=time.time() - 120)
+    expected = last_assistant_time(lines) + pyccsl.PROMPT_CACHE_TTL
+    filler = json.dumps({"type": "user", "message": {"role": "user", "content": "x" * 1000}})
+    lines += [filler] * (pyccsl.TRANSCRIPT_TAIL_BYTES // 500)
+    assert pyccsl.provide_cache_ttl({"transcript_path": write(tmp_path, lines)})["cache_expires_at"] == expected
+
+def test_unknown_without_cache_use(tmp_path):
+    lines = [json.dumps({"type": "user", "timestamp": stamp(time.time()), "message": {"role": "user", "content": "hi"}})]
+    assert pyccsl.provide_cache_ttl({"transcript_path": write(tmp_path, lines)}) == {}
+    assert pyccsl.provide_cache_ttl({"transcript_path": str(tmp_path / "missing.jsonl")}) == {}
+
+def test_field_counts_down_then_expires(tmp_path):
+    config = pyccsl.make_config("cache-ttl", theme="none", no_emoji=True)
+    recent = make_transcript_lines(1, start=time.time() - 60)
+    line = pyccsl.render({"transcript_path": write(tmp_path, recent), "cwd": str(tmp_path)}, config)
+    assert re.search(r"TTL: [34]:\d\d", line)
+
+    old = make_transcript_lines(1, seed=2, start=time.time() - 3 * 3600)
+    line = pyccsl.render({"transcript_path": write(tmp_path, old, "old.jsonl"), "cwd": str(tmp_path)}, config)
+    assert "TTL: expired" in line
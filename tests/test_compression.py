@@ -0,0 +1,42 @@
+"""Streaming reads of compressed transcripts."""
+import importlib
+import shutil
+import sys
+
+import pytest
+
+import pyccsl
+
+@pytest.mark.parametrize("suffix", sorted(pyccsl.TRANSCRIPT_CODECS))
+def test_compressed_transcript_matches_plain(transcript_factory, tmp_path, suffix):
+    codec = pyccsl.TRANSCRIPT_CODECS[suffix]
+    try:
+        module = importlib.import_module(codec)
+    except ImportError:
+        pytest.skip(f"{codec} is not installed")
+    path = transcript_factory(100)
+    compressed = tmp_path / f"transcript.jsonl{suffix}"
+    with open(path, "rb") as src:
+        if codec == "zstandard":
+            with open(compressed, "wb") as raw, module.ZstdCompressor().stream_writer(raw) as dst:
+                shutil.copyfileobj(src, dst)
+        else:
+            with module.open(compressed, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+
+    assert pyccsl.get_transcript_codec(str(compressed)) == codec
+    plain = pyccsl.update_transcript_state(path)
+    state = pyccsl.update_transcript_state(str(compressed))
+    assert state["entries"] == plain["entries"] == 300
+    assert state["tokens"] == plain["tokens"]
+    assert state["cost"] == pytest.approx(plain["cost"])
+
+def test_plain_transcript_has_no_codec(transcript_factory):
+    assert pyccsl.get_transcript_codec(transcript_factory(1)) is None
+
+def test_missing_codec_module_is_an_os_error(tmp_path, monkeypatch):
+    path = tmp_path / "transcript.jsonl.zst"
+    path.write_bytes(b"")
+    monkeypatch.setitem(sys.modules, "zstandard", None)
+    with pytest.raises(OSError):
+        pyccsl.open_transcript_stream(str(path))
@@ -0,0 +1,65 @@
+"""--deadline-ms: late providers, cached fallbacks and resumable catch-up."""
+import threading
+import time
+
+import pytest
+
+import pyccsl
+
+def test_values_appear_on_the_render_after_a_missed_deadline(transcript_factory, tmp_path):
+    input_data = {"session_id": "late1", "transcript_path": transcript_factory(3000), "cwd": str(tmp_path)}
+    config = pyccsl.make_config("cost", theme="none", deadline_ms=1)
+    first = pyccsl.render(input_data, config)
+    assert pyccsl.PENDING_MARKER in first
+
+    # The missed provider is finished by a detached _warm process
+    key = pyccsl.get_session_key(input_data)
+    for _ in range(200):
+        if pyccsl.load_provider_values(key).get("transcript"):
+            break
+        time.sleep(0.05)
+    second = pyccsl.render(input_data, config)
+    assert pyccsl.PENDING_MARKER not in second
+    assert "$" in second
+
+def test_stopped_catch_up_is_checkpointed_and_resumed(transcript_factory, monkeypatch):
+    path = transcript_factory(300)
+    monkeypatch.setattr(pyccsl, "TRANSCRIPT_READ_CHUNK", 4096)
+    stop = threading.Event()
+    stop.set()
+    monkeypatch.setattr(pyccsl, "_ingest_stop", stop)
+    partial = pyccsl.load_transcript_state(path)
+    assert 0 < partial["offset"] < 3 * 4096
+    checkpoint = pyccsl.read_cache_json(pyccsl.get_transcript_checkpoint_path(path))
+    assert checkpoint["offset"] == partial["offset"]
+
+    stop.clear()
+    resumed = pyccsl.load_transcript_state(path)
+    full = pyccsl.update_transcript_state(path)
+    assert resumed["entries"] == full["entries"] == 900
+    assert resumed["cost"] == pytest.approx(full["cost"])
+
+def test_long_catch_up_saves_progress_as_it_goes(transcript_factory, monkeypatch):
+    path = transcript_factory(300)
+    monkeypatch.setattr(pyccsl, "TRANSCRIPT_READ_CHUNK", 4096)
+    monkeypatch.setattr(pyccsl, "TRANSCRIPT_SAVE_INTERVAL", 0.0)
+    real_ingest = pyccsl.ingest_transcript_line
+    calls = []
+
+    def failing_ingest(state, line, debug=False):
+        calls.append(line)
+        if len(calls) == 600:
+            raise RuntimeError("process killed")
+        real_ingest(state, line, debug=debug)
+
+    monkeypatch.setattr(pyccsl, "ingest_transcript_line", failing_ingest)
+    with pytest.raises(RuntimeError):
+        pyccsl.load_transcript_state(path)
+    checkpoint = pyccsl.read_cache_json(pyccsl.get_transcript_checkpoint_path(path))
+    assert 0 < checkpoint["entries"] < 600
+    assert checkpoint["head_length"] > 0
+
+    monkeypatch.setattr(pyccsl, "ingest_transcript_line", real_ingest)
+    resumed = pyccsl.load_transcript_state(path)
+    assert resumed["entries"] == 900
+    assert resumed["cost"] == pytest.approx(pyccsl.update_transcript_state(path)["cost"])
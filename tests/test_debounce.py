@@ -0,0 +1,85 @@
+"""Coalescing refresh bursts with --debounce-ms."""
+import threading
+import time
+
+import pytest
+
+import pyccsl
+from conftest import make_transcript_lines
+
+@pytest.fixture
+def renders(monkeypatch):
+    """Count the full renders behind render_debounced()."""
+    calls = []
+    real_render = pyccsl.render_status
+
+    def counting_render(config, input_data, **kwargs):
+        calls.append(input_data)
+        return real_render(config, input_data, **kwargs)
+
+    monkeypatch.setattr(pyccsl, "render_status", counting_render)
+    return calls
+
+def payload(transcript_factory, tmp_path):
+    return {"session_id": "d1", "transcript_path": transcript_factory(10), "cwd": str(tmp_path)}
+
+def test_burst_inside_the_window_reuses_the_line(renders, transcript_factory, tmp_path):
+    config = pyccsl.make_config("cost,tokens", theme="none", debounce_ms=10_000)
+    input_data = payload(transcript_factory, tmp_path)
+    first, metrics, record = pyccsl.render_debounced(config, input_data)
+    assert metrics is not None
+    for _ in range(5):
+        output, metrics, reused = pyccsl.render_debounced(config, input_data)
+        assert output == first
+        assert metrics is None
+        assert reused == record
+    assert len(renders) == 1
+
+def test_changed_transcript_renders_again(renders, transcript_factory, tmp_path):
+    config = pyccsl.make_config("cost", theme="none", debounce_ms=10_000)
+    input_data = payload(transcript_factory, tmp_path)
+    first, _, _ = pyccsl.render_debounced(config, input_data)
+    with open(input_data["transcript_path"], "a") as f:
+        f.write("\n".join(make_transcript_lines(5, seed=2)) + "\n")
+    second, metrics, _ = pyccsl.render_debounced(config, input_data)
+    assert metrics is not None
+    assert second != first
+    assert len(renders) == 2
+
+def test_changed_payload_or_config_renders_again(renders, transcript_factory, tmp_path):
+    config = pyccsl.make_config("cost", theme="none", debounce_ms=10_000)
+    input_data = payload(transcript_factory, tmp_path)
+    pyccsl.render_debounced(config, input_data)
+    pyccsl.render_debounced(config, dict(input_data, model={"display_name": "Opus"}))
+    pyccsl.render_debounced(pyccsl.make_config("cost,tokens", theme="none", debounce_ms=10_000), input_data)
+    assert len(renders) == 3
+
+def test_expired_window_renders_again(renders, transcript_factory, tmp_path):
+    config = pyccsl.make_config("cost", theme="none", debounce_ms=50)
+    input_data = payload(transcript_factory, tmp_path)
+    pyccsl.render_debounced(config, input_data)
+    time.sleep(0.1)
+    _, metrics, _ = pyccsl.render_debounced(config, input_data)
+    assert metrics is not None
+    assert len(renders) == 2
+
+def test_waits_for_a_render_in_flight(renders, transcript_factory, tmp_path):
+    config = pyccsl.make_config("cost", theme="none", debounce_ms=10_000)
+    input_data = payload(transcript_factory, tmp_path)
+    key = pyccsl.get_session_key(input_data)
+    results = []
+    with pyccsl.cache_lock(f"{key}.render") as acquired:
+        assert acquired
+        waiter = threading.Thread(target=lambda: results.append(pyccsl.render_debounced(config, input_data)))
+        waiter.start()
+        # The in-flight render finishes while the second call waits for the lock
+        time.sleep(0.05)
+        output, model_info, metrics = pyccsl.render_status(config, input_data)
+        record = pyccsl.build_status_record(model_info, input_data, metrics, output)
+        pyccsl.write_cache_json(pyccsl.get_cache_path("sessions", f"{key}.render.json"),
+                                {"fingerprint": pyccsl.compute_input_fingerprint(config, input_data),
+                                 "finished_at": time.time(), "output": output, "record": record})
+    waiter.join(5)
+    assert results[0][0] == output
+    assert results[0][1] is None
+    assert len(renders) == 1
@@ -0,0 +1,63 @@
+"""Machine-readable output with --format json and both."""
+import json
+import os
+import subprocess
+import sys
+
+import pyccsl
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pyccsl.py")
+
+def run(input_data, *args):
+    result = subprocess.run([sys.executable, SCRIPT, "--theme", "none", *args], input=json.dumps(input_data),
+                            capture_output=True, text=True, timeout=30)
+    assert result.returncode == 0, result.stderr
+    return result.stdout.splitlines()
+
+def payload(transcript_factory, tmp_path):
+    return {"session_id": "f1", "transcript_path": transcript_factory(10), "cwd": str(tmp_path),
+            "model": {"id": "claude-sonnet-4-20250514", "display_name": "Sonnet 4"}}
+
+def test_json_has_every_metric_whatever_the_fields(transcript_factory, tmp_path):
+    input_data = payload(transcript_factory, tmp_path)
+    [line] = run(input_data, "--format", "json", "model")
+    record = json.loads(line)
+    assert record["version"] == pyccsl.__version__
+    assert record["session_id"] == "f1"
+    assert record["model"]["display_name"] == "Sonnet 4"
+    assert record["line"] == run(input_data, "model")[0]
+    metrics = record["metrics"]
+    expected = pyccsl.provide_transcript(input_data)
+    assert metrics["cost"] == expected["cost"]
+    assert metrics["message_count"] == 20
+    assert "model_costs" in metrics
+    # Display-only values stay out of the record
+    assert "badge" not in metrics
+    assert "cost_formatted" not in metrics
+
+def test_both_prints_the_line_then_the_record(transcript_factory, tmp_path):
+    input_data = payload(transcript_factory, tmp_path)
+    lines = run(input_data, "--format", "both", "model,cost")
+    assert len(lines) == 2
+    assert lines[0] == run(input_data, "model,cost")[0]
+    assert json.loads(lines[1])["line"] == lines[0]
+
+def test_json_includes_git_info(transcript_factory, tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "a.txt").write_text("a\n")
+    git = ["git", "-C", str(repo), "-c", "user.name=t", "-c", "user.email=t@example.com"]
+    for args in (["init", "-q", "-b", "feature"], ["add", "a.txt"], ["commit", "-q", "-m", "a"]):
+        subprocess.run(git + args, check=True)
+    (repo / "a.txt").write_text("b\n")
+    input_data = dict(payload(transcript_factory, tmp_path), cwd=str(repo))
+    [line] = run(input_data, "--format", "json", "cost")
+    git_info = json.loads(line)["metrics"]["git_info"]
+    assert git_info["branch"] == "feature"
+    assert git_info["modified_count"] == 1
+
+def test_debounced_render_reuses_the_record(transcript_factory, tmp_path):
+    input_data = payload(transcript_factory, tmp_path)
+    first = json.loads(run(input_data, "--format", "json", "--debounce-ms", "60000", "cost")[0])
+    second = json.loads(run(input_data, "--format", "json", "--debounce-ms", "60000", "cost")[0])
+    assert second == first
@@ -0,0 +1,149 @@
+"""Reading the git object database without running git."""
+import os
+import shutil
+import subprocess
+
+import pytest
+
+import pyccsl
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+
+def git(repo, *args, env=None, check=True):
+    """Run git in repo and return its stripped stdout."""
+    full_env = dict(os.environ, GIT_AUTHOR_NAME="t", GIT_AUTHOR_EMAIL="t@example.com",
+                    GIT_COMMITTER_NAME="t", GIT_COMMITTER_EMAIL="t@example.com", **(env or {}))
+    return subprocess.run(["git", "-C", str(repo), *args], check=check, capture_output=True,
+                          text=True, env=full_env).stdout.strip()
+
+@pytest.fixture
+def repo(tmp_path):
+    path = tmp_path / "repo"
+    path.mkdir()
+    git(path, "init", "-q", "-b", "main")
+    return path
+
+def commit_file(repo, name, content, message, env=None):
+    (repo / name).write_text(content)
+    git(repo, "add", name)
+    git(repo, "commit", "-q", "-m", message, env=env)
+    return git(repo, "rev-parse", "HEAD")
+
+def read_all(repo, shas):
+    store = pyccsl.open_git_object_store(str(repo / ".git"))
+    try:
+        return {sha: pyccsl.read_git_object(store, sha) for sha in shas}
+    finally:
+        pyccsl.close_git_object_store(store)
+
+@pytest.mark.parametrize("packed", [False, True])
+def test_objects_match_git_cat_file(repo, packed):
+    # Slowly growing file so the packed form uses delta chains
+    body = ""
+    for i in range(30):
+        body += f"line {i} " + "x" * 200 + "\n"
+        commit_file(repo, "file.txt", body, f"commit {i}")
+    if packed:
+        git(repo, "gc", "-q", "--aggressive")
+        assert not [d for d in os.listdir(repo / ".git" / "objects") if len(d) == 2]
+
+    shas = git(repo, "rev-list", "--objects", "--all").split("\n")
+    shas = [line.split(" ")[0] for line in shas]
+    found = read_all(repo, shas)
+    for sha in shas:
+        kind = git(repo, "cat-file", "-t", sha)
+        content = subprocess.run(["git", "-C", str(repo), "cat-file", kind, sha],
+                                 check=True, capture_output=True).stdout
+        assert found[sha] == (kind, content)
+
+def test_missing_object_is_none(repo):
+    commit_file(repo, "a", "a", "one")
+    assert read_all(repo, ["0" * 40])["0" * 40] is None
+
+def test_commit_timestamp_and_parents(repo):
+    first = commit_file(repo, "a", "a", "one")
+    second = commit_file(repo, "a", "b", "two", env={"GIT_COMMITTER_DATE": "1700000000 +0000"})
+    store = pyccsl.open_git_object_store(str(repo / ".git"))
+    try:
+        assert pyccsl.read_git_commit(store, second) == (1700000000, [first])
+    finally:
+        pyccsl.close_git_object_store(store)
+
+def test_stash_count_and_operation(repo):
+    commit_file(repo, "a", "a", "one")
+    for i in range(2):
+        (repo / "a").write_text(f"change {i}")
+        git(repo, "stash", "-q")
+    git_dir = str(repo / ".git")
+    assert pyccsl.count_git_stashes(git_dir) == 2
+    assert pyccsl.read_git_operation(git_dir) == (None, None)
+
+    git(repo, "checkout", "-q", "-b", "side")
+    commit_file(repo, "a", "side", "side")
+    git(repo, "checkout", "-q", "main")
+    commit_file(repo, "a", "main", "main")
+    # Conflicting merge stops with MERGE_HEAD in place
+    git(repo, "merge", "-q", "side", check=False)
+    assert pyccsl.read_git_operation(git_dir) == ("MERGING", None)
+
+def ahead_behind_from_git(repo, head, upstream):
+    left, right = git(repo, "rev-list", "--left-right", "--count", f"{head}...{upstream}").split()
+    return int(left), int(right)
+
+@pytest.mark.parametrize("packed", [False, True])
+@pytest.mark.parametrize("shared, behind, ahead", [(10, 3, 2), (20, 5, 5), (44, 7, 4)])
+def test_ahead_behind_with_equal_timestamps(repo, packed, shared, behind, ahead):
+    # Scripted history: every commit shares one committer timestamp, so the
+    # walk order among them comes down to the hashes
+    same_second = {"GIT_COMMITTER_DATE": "1700000000 +0000", "GIT_AUTHOR_DATE": "1700000000 +0000"}
+    for i in range(shared):
+        commit_file(repo, "base", str(i), f"base {i}", env=same_second)
+    git(repo, "checkout", "-q", "-b", "upstream")
+    for i in range(behind):
+        upstream = commit_file(repo, "theirs", str(i), f"theirs {i}", env=same_second)
+    git(repo, "checkout", "-q", "main")
+    for i in range(ahead):
+        head = commit_file(repo, "ours", str(i), f"ours {i}", env=same_second)
+    if packed:
+        git(repo, "gc", "-q")
+
+    expected = ahead_behind_from_git(repo, head, upstream)
+    assert expected == (ahead, behind)
+    assert pyccsl.walk_ahead_behind(str(repo / ".git"), head, upstream) == expected
+    assert pyccsl.get_ahead_behind(str(repo / ".git"), head, upstream) == expected
+    # Served from the shared cache the second time
+    assert pyccsl.get_ahead_behind(str(repo / ".git"), head, upstream) == expected
+
+def test_ahead_behind_across_merges(repo):
+    for i in range(5):
+        commit_file(repo, "base", str(i), f"base {i}")
+    git(repo, "checkout", "-q", "-b", "upstream")
+    for i in range(3):
+        commit_file(repo, "theirs", str(i), f"theirs {i}")
+    git(repo, "checkout", "-q", "main")
+    commit_file(repo, "ours", "1", "ours")
+    git(repo, "merge", "-q", "--no-edit", "upstream")
+    head = commit_file(repo, "ours", "2", "ours again")
+    git(repo, "checkout", "-q", "upstream")
+    upstream = commit_file(repo, "theirs", "x", "theirs again")
+
+    expected = ahead_behind_from_git(repo, head, upstream)
+    assert pyccsl.walk_ahead_behind(str(repo / ".git"), head, upstream) == expected
+
+def test_stale_ahead_behind_cache_format_is_ignored(repo):
+    base = commit_file(repo, "a", "a", "one")
+    head = commit_file(repo, "a", "b", "two")
+    path = pyccsl.get_cache_path("shared", "git-ahead-behind.json")
+    pyccsl.write_cache_json(path, {f"{head}:{base}": [34, 7]})
+    assert pyccsl.get_ahead_behind(str(repo / ".git"), head, base) == (1, 0)
+
+def test_unreadable_extras_keep_branch_and_file_count(repo, monkeypatch):
+    commit_file(repo, "a.txt", "a\n", "a")
+    (repo / "a.txt").write_text("b\n")
+
+    def broken_extras(cwd, debug=False):
+        raise ValueError("corrupt pack")
+
+    monkeypatch.setattr(pyccsl, "read_git_extras", broken_extras)
+    git_info = pyccsl.extract_git_status({"cwd": str(repo)})
+    assert git_info == dict(pyccsl.GIT_EXTRAS_DEFAULTS, branch="main", modified_count=1)
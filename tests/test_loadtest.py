@@ -0,0 +1,33 @@
+"""The multi-session 'loadtest' command."""
+import time
+
+import pyccsl
+
+def test_synthetic_turns_ingest_like_a_transcript():
+    text = pyccsl.synthetic_transcript_lines(3, 10, 5, time.time() - 3600)
+    state = pyccsl.new_transcript_state()
+    for line in text.splitlines():
+        pyccsl.ingest_transcript_line(state, line.encode("utf-8"))
+    metrics = pyccsl.get_transcript_metrics(state)
+    assert state["entries"] == 15
+    assert metrics["message_count"] == 10
+    assert metrics["cost"] > 0
+    assert pyccsl.get_tool_latency(state)["Bash"]["count"] == 5
+    # Appended batches continue the same chain
+    assert '"parentUuid": "s3-r14"' in pyccsl.synthetic_transcript_lines(3, 15, 1, time.time())
+
+def test_loadtest_reports_every_configuration(capsys):
+    argv = ["--sessions", "2", "--interval", "0.3", "--duration", "0.9", "--initial-turns", "20",
+            "--configs", "cached,daemon,no-git", "--", "--theme", "none", "cost"]
+    assert pyccsl.run_loadtest(argv) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].startswith("sessions=2 interval=0.3s duration=0.9s")
+    rows = {line.split()[0]: line.split() for line in lines[2:]}
+    assert list(rows) == ["cached", "daemon", "no-git"]
+    for row in rows.values():
+        assert int(row[1]) >= 2
+        assert float(row[2]) > 0
+
+def test_unknown_configuration_is_rejected(capsys):
+    assert pyccsl.run_loadtest(["--configs", "cached,warp"]) == 1
+    assert "warp" in capsys.readouterr().err
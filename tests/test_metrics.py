@@ -0,0 +1,19 @@
+"""OpenMetrics textfile export."""
+import pyccsl
+
+def test_every_sample_belongs_to_a_declared_family(transcript_factory):
+    metrics = pyccsl.provide_transcript({"transcript_path": transcript_factory(10)})
+    text = pyccsl.format_openmetrics({"session_id": "s1", "cwd": "/work/project"}, metrics)
+    types = {}
+    samples = []
+    for line in text.splitlines():
+        if line.startswith("# TYPE "):
+            _, _, name, metric_type = line.split(" ")
+            types[name] = metric_type
+        elif not line.startswith("#"):
+            samples.append(line.split("{")[0])
+    assert text.endswith("# EOF\n")
+    assert types["pyccsl_tokens_total"] == "counter"
+    assert types["pyccsl_cost_dollars_total"] == "counter"
+    assert "pyccsl_tokens_total" in samples
+    assert all(sample in types for sample in samples)
@@ -0,0 +1,100 @@
+"""Plugin fields: loading, TTL caching and bounded calls."""
+import textwrap
+import threading
+import time
+
+import pytest
+
+import pyccsl
+
+@pytest.fixture(autouse=True)
+def plugin_registry(monkeypatch, tmp_path):
+    """Give each test its own plugin directory and field registry."""
+    plugin_dir = tmp_path / "plugins"
+    plugin_dir.mkdir()
+    monkeypatch.setenv("PYCCSL_PLUGIN_DIR", str(plugin_dir))
+    monkeypatch.setattr(pyccsl, "_plugins_loaded", False)
+    monkeypatch.setattr(pyccsl, "PLUGIN_FIELDS", {})
+    monkeypatch.setattr(pyccsl, "PROVIDERS", dict(pyccsl.PROVIDERS))
+    monkeypatch.setattr(pyccsl, "FIELD_SOURCES", dict(pyccsl.FIELD_SOURCES))
+    monkeypatch.setattr(pyccsl, "FIELD_ORDER", list(pyccsl.FIELD_ORDER))
+    return plugin_dir
+
+def counting_provider(calls, text="v"):
+    def provider(inputs):
+        calls.append(inputs)
+        return f"{text}{len(calls)}"
+    return provider
+
+def test_plugins_load_from_the_plugin_directory(plugin_registry, tmp_path, capsys):
+    (plugin_registry / "hello.py").write_text(textwrap.dedent("""
+        def register(register_field):
+            register_field("hello", lambda inputs: "hi " + inputs["session_id"], inputs=("session_id",))
+    """))
+    (plugin_registry / "broken.py").write_text("raise RuntimeError('nope')\n")
+    config = pyccsl.make_config("folder,hello", theme="none")
+    assert "hello" in pyccsl.PLUGIN_FIELDS
+    assert "broken.py" in capsys.readouterr().err
+    assert "hi p1" in pyccsl.render({"session_id": "p1", "cwd": str(tmp_path)}, config)
+
+def test_plugin_fields_cannot_shadow_built_in_fields():
+    with pytest.raises(ValueError):
+        pyccsl.register_field("cost", lambda inputs: "x")
+
+def test_fresh_values_come_from_the_ttl_cache(tmp_path):
+    calls = []
+    pyccsl.register_field("count", counting_provider(calls), inputs=("cwd",), ttl=0.2)
+    payload = {"cwd": str(tmp_path)}
+    assert pyccsl.provide_plugin("count", payload) == {"text": "v1", "pending": False}
+    assert pyccsl.provide_plugin("count", payload) == {"text": "v1", "pending": False}
+    assert len(calls) == 1
+
+    # Other inputs have their own cache entry
+    assert pyccsl.provide_plugin("count", {"cwd": str(tmp_path / "other")})["text"] == "v2"
+
+    time.sleep(0.25)
+    assert pyccsl.provide_plugin("count", payload)["text"] == "v3"
+    assert calls[0] == {"cwd": str(tmp_path)}
+
+def test_failing_plugin_keeps_the_last_value(tmp_path):
+    state = {"fail": False}
+
+    def provider(inputs):
+        if state["fail"]:
+            raise RuntimeError("down")
+        return "ok"
+
+    pyccsl.register_field("flaky", provider, ttl=0.05)
+    payload = {"cwd": str(tmp_path)}
+    assert pyccsl.provide_plugin("flaky", payload)["text"] == "ok"
+    state["fail"] = True
+    time.sleep(0.1)
+    assert pyccsl.provide_plugin("flaky", payload) == {"text": "ok", "pending": False}
+
+def test_slow_plugin_is_finished_in_the_background(tmp_path, monkeypatch):
+    refreshes = []
+    monkeypatch.setattr(pyccsl, "refresh_plugin_in_background",
+                        lambda name, cache_key, input_data: refreshes.append(name))
+    release = threading.Event()
+    pyccsl.register_field("slow", lambda inputs: release.wait(5) and "late", timeout=0.05)
+    payload = {"cwd": str(tmp_path)}
+    started = time.monotonic()
+    assert pyccsl.provide_plugin("slow", payload) == {"text": None, "pending": True}
+    assert time.monotonic() - started < 1
+    assert refreshes == ["slow"]
+    release.set()
+
+def test_expensive_plugin_is_refreshed_by_a_detached_process(plugin_registry, tmp_path):
+    (plugin_registry / "costly.py").write_text(textwrap.dedent("""
+        def register(register_field):
+            register_field("costly", lambda inputs: "computed", expensive=True, ttl=60)
+    """))
+    pyccsl.load_plugins()
+    payload = {"cwd": str(tmp_path)}
+    assert pyccsl.provide_plugin("costly", payload) == {"text": None, "pending": True}
+    for _ in range(200):
+        result = pyccsl.provide_plugin("costly", payload)
+        if not result["pending"]:
+            break
+        time.sleep(0.05)
+    assert result == {"text": "computed", "pending": False}
@@ -0,0 +1,46 @@
+"""Building a session's caches ahead of its first render with 'prewarm'."""
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pyccsl
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pyccsl.py")
+
+def prewarm(input_data, *args):
+    started = time.monotonic()
+    result = subprocess.run([sys.executable, SCRIPT, "prewarm", *args], input=json.dumps(input_data),
+                            capture_output=True, text=True, timeout=30)
+    return result, time.monotonic() - started
+
+def wait_for_values(key, names):
+    for _ in range(400):
+        values = pyccsl.load_provider_values(key)
+        if all(values.get(name) for name in names):
+            return values
+        time.sleep(0.05)
+    return pyccsl.load_provider_values(key)
+
+def test_prewarm_detaches_and_fills_the_caches(transcript_factory, tmp_path):
+    input_data = {"session_id": "w1", "transcript_path": transcript_factory(3000), "cwd": str(tmp_path)}
+    result, elapsed = prewarm(input_data, "--theme", "none", "cost")
+    assert result.returncode == 0
+    assert result.stdout == ""
+    assert elapsed < 2
+
+    values = wait_for_values(pyccsl.get_session_key(input_data), ["transcript"])
+    assert values["transcript"]["message_count"] == 6000
+    assert os.path.exists(pyccsl.get_transcript_checkpoint_path(input_data["transcript_path"]))
+
+    # The first render then meets a tight deadline with the prewarmed values
+    line = pyccsl.render(input_data, pyccsl.make_config("cost", theme="none", deadline_ms=1))
+    assert pyccsl.PENDING_MARKER not in line
+
+def test_prewarm_always_builds_the_transcript_checkpoint(transcript_factory, tmp_path):
+    input_data = {"session_id": "w2", "transcript_path": transcript_factory(20), "cwd": str(tmp_path)}
+    result, _ = prewarm(input_data, "folder")
+    assert result.returncode == 0
+    values = wait_for_values(pyccsl.get_session_key(input_data), ["transcript"])
+    assert values["transcript"]["message_count"] == 40
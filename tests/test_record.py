@@ -0,0 +1,35 @@
+"""Recording payloads with --record and replaying them."""
+import json
+import os
+
+import pyccsl
+
+def count_records(record_dir):
+    with open(os.path.join(record_dir, "records.jsonl")) as f:
+        return sum(1 for line in f if line.strip())
+
+def test_replay_does_not_append_to_the_recording(transcript_factory, tmp_path, monkeypatch, capsys):
+    record_dir = str(tmp_path / "recording")
+    env_file = tmp_path / "pyccsl.env"
+    env_file.write_text(f"PYCCSL_RECORD_DIR={record_dir}\n")
+    monkeypatch.setenv("PYCCSL_RECORD_DIR", record_dir)
+    payload = {"session_id": "s1", "transcript_path": transcript_factory(5), "cwd": str(tmp_path)}
+    for _ in range(3):
+        pyccsl.record_invocation(record_dir, payload, ["--env", str(env_file), "--theme", "none", "cost"])
+    assert count_records(record_dir) == 3
+
+    assert pyccsl.run_replay([record_dir]) == 0
+    assert "calls=3 failures=0" in capsys.readouterr().out
+    assert count_records(record_dir) == 3
+
+def test_busy_recording_skips_the_call(transcript_factory, tmp_path):
+    record_dir = str(tmp_path / "recording")
+    payload = {"session_id": "s1", "transcript_path": transcript_factory(5), "cwd": str(tmp_path)}
+    pyccsl.record_invocation(record_dir, payload, [])
+    key = pyccsl.get_session_key(payload)
+    with pyccsl.cache_lock(f"record-{key}") as acquired:
+        assert acquired
+        pyccsl.record_invocation(record_dir, payload, [])
+    assert count_records(record_dir) == 1
+    with open(os.path.join(record_dir, "records.jsonl")) as f:
+        assert json.loads(f.readline())["transcript_length"] == os.path.getsize(payload["transcript_path"])
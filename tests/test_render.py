@@ -0,0 +1,34 @@
+"""Rendering through the library API."""
+import time
+
+import pyccsl
+from conftest import make_transcript_lines
+
+def test_deadline_is_measured_from_each_render(transcript_factory, tmp_path, monkeypatch):
+    # Long after import: a budget measured from START_TIME would already be spent
+    monkeypatch.setattr(pyccsl, "START_TIME", time.monotonic() - 60)
+    path = transcript_factory(20)
+    config = pyccsl.make_config("cost,tokens", theme="none", deadline_ms=2000)
+    output = pyccsl.render({"transcript_path": path, "cwd": str(tmp_path)}, config)
+    assert pyccsl.PENDING_MARKER not in output
+    assert "$" in output
+
+def test_session_renders_the_state_of_its_last_update(transcript_factory, tmp_path):
+    path = transcript_factory(10)
+    session = pyccsl.Session(path, cwd=str(tmp_path))
+    session.update()
+    config = pyccsl.make_config("cost", theme="none")
+    before = session.render(config)
+    assert pyccsl.format_cost(session.cost) in before
+
+    with open(path, "a") as f:
+        f.write("\n".join(make_transcript_lines(10, seed=2)) + "\n")
+    assert session.render(config) == before
+    session.update()
+    assert session.render(config) != before
+
+def test_session_message_count_counts_user_entries(transcript_factory, tmp_path):
+    session = pyccsl.Session(transcript_factory(10), cwd=str(tmp_path))
+    session.update()
+    # Each synthetic turn: a prompt, an assistant reply and a tool result
+    assert session.message_count == 20
@@ -0,0 +1,93 @@
+"""The main conversation versus subagent split."""
+import datetime
+import json
+
+import pytest
+
+import pyccsl
+
+MODEL = "claude-sonnet-4-20250514"
+START = 1_790_000_000.0
+
+def stamp(seconds):
+    return datetime.datetime.fromtimestamp(seconds, datetime.timezone.utc).isoformat().replace("+00:00", "Z")
+
+def user(uuid, parent, offset, content="go", **extra):
+    return dict({"type": "user", "uuid": uuid, "parentUuid": parent, "timestamp": stamp(START + offset),
+                 "message": {"role": "user", "content": content}}, **extra)
+
+def assistant(uuid, parent, offset, content=None, output_tokens=100, **extra):
+    return dict({"type": "assistant", "uuid": uuid, "parentUuid": parent, "timestamp": stamp(START + offset),
+                 "message": {"id": f"msg-{uuid}", "model": MODEL, "role": "assistant",
+                             "content": content or [{"type": "text", "text": "ok"}],
+                             "usage": {"input_tokens": 10, "output_tokens": output_tokens}}}, **extra)
+
+def task_result(uuid, parent, offset, tool_id):
+    return user(uuid, parent, offset, [{"type": "tool_result", "tool_use_id": tool_id, "content": "done"}])
+
+# Two subagents launched by one message, running interleaved: A for 20s, B for 30s
+SESSION = [
+    user("u1", None, 0),
+    assistant("a1", "u1", 4, [{"type": "tool_use", "id": "task-a", "name": "Task", "input": {}},
+                              {"type": "tool_use", "id": "task-b", "name": "Task", "input": {}}]),
+    user("sa1", None, 5, isSidechain=True),
+    user("sb1", None, 6, isSidechain=True),
+    assistant("sa2", "sa1", 7, output_tokens=300, isSidechain=True),
+    assistant("sb2", "sb1", 14, output_tokens=500, isSidechain=True),
+    task_result("r1", "a1", 24, "task-a"),
+    task_result("r2", "r1", 34, "task-b"),
+    assistant("a2", "r2", 40),
+]
+
+def metrics_of(entries):
+    state = pyccsl.new_transcript_state()
+    for entry in entries:
+        pyccsl.ingest_transcript_line(state, json.dumps(entry).encode("utf-8"))
+    return pyccsl.get_transcript_metrics(state)
+
+def test_costs_and_tokens_are_split():
+    metrics = metrics_of(SESSION)
+    per_turn = lambda output_tokens: pyccsl.calculate_cost_per_entry({"input_tokens": 10, "output_tokens": output_tokens}, MODEL)
+    assert metrics["subagent_cost"] == pytest.approx(per_turn(300) + per_turn(500))
+    assert metrics["main_cost"] == pytest.approx(2 * per_turn(100))
+    assert metrics["subagent_tokens"] == 10 + 300 + 10 + 500
+    assert metrics["main_tokens"] == metrics["context_size"] - metrics["subagent_tokens"]
+
+def test_response_times_are_measured_per_chain():
+    metrics = metrics_of(SESSION)
+    # Subagent A answered 2s after its prompt and B 8s after its own, not after A's
+    assert metrics["subagent_response_time"] == pytest.approx((2 + 8) / 2)
+    assert metrics["main_response_time"] == pytest.approx((4 + 6) / 2)
+
+def test_runs_and_peak_concurrency():
+    metrics = metrics_of(SESSION)
+    assert metrics["subagents"] == 2
+    assert metrics["peak_subagents"] == 2
+    assert metrics["subagent_run_time"] == pytest.approx((20 + 30) / 2)
+
+def test_sequential_subagents_peak_at_one():
+    entries = [user("u1", None, 0),
+               assistant("a1", "u1", 1, [{"type": "tool_use", "id": "t1", "name": "Task", "input": {}}]),
+               task_result("r1", "a1", 11, "t1"),
+               assistant("a2", "r1", 12, [{"type": "tool_use", "id": "t2", "name": "Agent", "input": {}}]),
+               task_result("r2", "a2", 17, "t2")]
+    metrics = metrics_of(entries)
+    assert (metrics["subagents"], metrics["peak_subagents"]) == (2, 1)
+    assert metrics["subagent_run_time"] == pytest.approx(7.5)
+
+def test_without_subagents_everything_is_main():
+    metrics = metrics_of(SESSION[:1] + [assistant("a1", "u1", 4)])
+    assert metrics["subagent_cost"] == 0
+    assert metrics["main_cost"] == metrics["cost"]
+    assert (metrics["subagents"], metrics["peak_subagents"]) == (0, 0)
+    assert "subagent_run_time" not in metrics
+
+def test_fields_show_the_split(tmp_path):
+    path = tmp_path / "t.jsonl"
+    path.write_text("\n".join(json.dumps(entry) for entry in SESSION) + "\n")
+    config = pyccsl.make_config("perf-subagents,subagent-cost", theme="none", no_emoji=True)
+    line = pyccsl.render({"transcript_path": str(path), "cwd": str(tmp_path)}, config)
+    metrics = metrics_of(SESSION)
+    share = metrics["subagent_cost"] / metrics["cost"] * 100
+    assert f"Agents: 2 (peak 2) {pyccsl.format_duration(25)}" in line
+    assert f"Sub: {pyccsl.format_cost(metrics['subagent_cost'])} ({share:.0f}%)" in line
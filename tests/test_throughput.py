@@ -0,0 +1,69 @@
+"""Output throughput: per-turn tokens per second and the badge's throughput input."""
+import datetime
+import json
+
+import pytest
+
+import pyccsl
+
+START = 1_790_000_000.0
+
+def stamp(seconds):
+    return datetime.datetime.fromtimestamp(seconds, datetime.timezone.utc).isoformat().replace("+00:00", "Z")
+
+def exchange(n, offset, seconds, output_tokens, message_id=None):
+    """A user prompt at START + offset answered after `seconds` with `output_tokens`."""
+    return [
+        json.dumps({"type": "user", "uuid": f"u{n}", "timestamp": stamp(START + offset),
+                    "message": {"role": "user", "content": "go"}}),
+        json.dumps({"type": "assistant", "uuid": f"a{n}", "parentUuid": f"u{n}", "timestamp": stamp(START + offset + seconds),
+                    "message": {"id": message_id or f"msg-{n}", "model": "claude-sonnet-4-20250514", "role": "assistant",
+                                "content": [{"type": "text", "text": "ok"}],
+                                "usage": {"input_tokens": 5, "output_tokens": output_tokens}}})
+    ]
+
+def metrics_of(lines):
+    state = pyccsl.new_transcript_state()
+    for line in lines:
+        pyccsl.ingest_transcript_line(state, line.encode("utf-8"))
+    return pyccsl.get_transcript_metrics(state)
+
+def test_throughput_is_output_tokens_over_response_time():
+    metrics = metrics_of(exchange(1, 0, 2.0, 100) + exchange(2, 60, 8.0, 200))
+    assert metrics["throughput"] == pytest.approx(300 / 10)
+    assert metrics["throughput_recent"] == pytest.approx(300 / 10)
+
+def test_each_message_counts_once():
+    lines = exchange(1, 0, 2.0, 100)
+    # A second content block of the same message repeats its usage
+    repeat = json.loads(lines[1])
+    repeat["uuid"] = "a1b"
+    repeat["timestamp"] = stamp(START + 3.0)
+    metrics = metrics_of(lines + [json.dumps(repeat)])
+    assert metrics["throughput"] == pytest.approx(50)
+
+def test_recent_window_covers_the_last_turns():
+    lines = []
+    for n in range(pyccsl.THROUGHPUT_WINDOW):
+        lines += exchange(n, n * 60, 1.0, 100)
+    lines += exchange(99, 3600, 10.0, 100)
+    metrics = metrics_of(lines)
+    turns = pyccsl.THROUGHPUT_WINDOW + 1
+    assert metrics["throughput"] == pytest.approx(100 * turns / (pyccsl.THROUGHPUT_WINDOW + 10.0))
+    assert metrics["throughput_recent"] == pytest.approx(100 * pyccsl.THROUGHPUT_WINDOW / (pyccsl.THROUGHPUT_WINDOW - 1 + 10.0))
+
+def test_no_throughput_without_output():
+    assert "throughput" not in metrics_of(exchange(1, 0, 2.0, 0))
+
+def test_slow_throughput_lowers_the_badge():
+    args = (0.9, 1.0, [80, 60, 40], [5, 10, 20])
+    assert pyccsl.calculate_performance_badge(*args, no_emoji=True) == "*ooo"
+    assert pyccsl.calculate_performance_badge(*args, no_emoji=True, throughput=70, throughput_thresholds=[60, 40, 20]) == "*ooo"
+    assert pyccsl.calculate_performance_badge(*args, no_emoji=True, throughput=30, throughput_thresholds=[60, 40, 20]) == "oo*o"
+    assert pyccsl.calculate_performance_badge(*args, no_emoji=True, throughput=5, throughput_thresholds=[60, 40, 20]) == "ooo*"
+
+def test_field_shows_recent_and_session_throughput(tmp_path):
+    path = tmp_path / "t.jsonl"
+    path.write_text("\n".join(exchange(1, 0, 2.0, 100) + exchange(2, 60, 8.0, 200)) + "\n")
+    config = pyccsl.make_config("perf-throughput", theme="none", no_emoji=True)
+    assert "Speed: 30 tok/s (avg 30)" in pyccsl.render({"transcript_path": str(path), "cwd": str(tmp_path)}, config)
@@ -0,0 +1,76 @@
+"""Tool latency: pairing tool_use blocks with their results."""
+import datetime
+import json
+
+import pytest
+
+import pyccsl
+
+START = 1_790_000_000.0
+
+def stamp(seconds):
+    return datetime.datetime.fromtimestamp(seconds, datetime.timezone.utc).isoformat().replace("+00:00", "Z")
+
+def call(uuid, offset, *tools):
+    """An assistant entry at START + offset calling (tool_use_id, name) pairs."""
+    return {"type": "assistant", "uuid": uuid, "timestamp": stamp(START + offset),
+            "message": {"id": f"msg-{uuid}", "role": "assistant",
+                        "content": [{"type": "tool_use", "id": tool_id, "name": name, "input": {}} for tool_id, name in tools]}}
+
+def result(uuid, parent, offset, *tool_ids):
+    """A user entry at START + offset answering the given tool_use ids."""
+    return {"type": "user", "uuid": uuid, "parentUuid": parent, "timestamp": stamp(START + offset),
+            "message": {"role": "user", "content": [{"type": "tool_result", "tool_use_id": tool_id, "content": "ok"}
+                                                    for tool_id in tool_ids]}}
+
+def state_of(entries):
+    state = pyccsl.new_transcript_state()
+    for entry in entries:
+        pyccsl.ingest_transcript_line(state, json.dumps(entry).encode("utf-8"))
+    return state
+
+def test_results_pair_with_their_calls():
+    state = state_of([call("a1", 0, ("t1", "Bash")), result("r1", "a1", 4, "t1"),
+                      call("a2", 10, ("t2", "Read")), result("r2", "a2", 10.5, "t2"),
+                      call("a3", 20, ("t3", "Bash")), result("r3", "a3", 22, "t3")])
+    tools = pyccsl.get_tool_latency(state)
+    assert list(tools) == ["Bash", "Read"]
+    assert tools["Bash"]["count"] == 2
+    assert tools["Bash"]["total"] == pytest.approx(6)
+    assert tools["Bash"]["mean"] == pytest.approx(3)
+    assert tools["Bash"]["max"] == pytest.approx(4)
+    assert tools["Read"]["total"] == pytest.approx(0.5)
+    assert state["pending_tools"] == {}
+
+def test_parallel_calls_answered_by_sibling_entries():
+    # Two tool calls in one message, answered by separate entries, the second chained to the first
+    state = state_of([call("a1", 0, ("t1", "Grep"), ("t2", "Glob")),
+                      result("r1", "a1", 1, "t1"),
+                      result("r2", "r1", 3, "t2")])
+    tools = pyccsl.get_tool_latency(state)
+    assert tools["Grep"]["total"] == pytest.approx(1)
+    assert tools["Glob"]["total"] == pytest.approx(3)
+    assert state["pending_tools"] == {}
+
+def test_unanswered_and_abandoned_calls_are_not_counted():
+    state = state_of([call("a1", 0, ("t1", "Bash")),
+                      call("a2", 10, ("t2", "Bash")), result("r2", "a2", 10 + pyccsl.TOOL_TIME_LIMIT + 1, "t2"),
+                      result("r9", "a9", 20, "unknown-id")])
+    assert pyccsl.get_tool_latency(state) == {}
+    assert list(state["pending_tools"]) == ["a1"]
+
+def test_pending_calls_are_bounded():
+    entries = [call(f"a{n}", n, (f"t{n}", "Bash")) for n in range(pyccsl.PENDING_TOOL_LIMIT + 10)]
+    assert len(state_of(entries)["pending_tools"]) == pyccsl.PENDING_TOOL_LIMIT
+
+def test_slowest_recent_tool_is_shown(tmp_path):
+    entries = [call("a1", 0, ("t1", "Bash")), result("r1", "a1", 75, "t1"),
+               call("a2", 80, ("t2", "Read")), result("r2", "a2", 81, "t2")]
+    metrics = pyccsl.get_transcript_metrics(state_of(entries))
+    assert (metrics["slowest_tool"], metrics["slowest_tool_time"]) == ("Bash", pytest.approx(75))
+
+    path = tmp_path / "t.jsonl"
+    path.write_text("\n".join(json.dumps(entry) for entry in entries) + "\n")
+    config = pyccsl.make_config("perf-slowest-tool", theme="none", no_emoji=True)
+    line = pyccsl.render({"transcript_path": str(path), "cwd": str(tmp_path)}, config)
+    assert f"Slowest: Bash {pyccsl.format_duration(75)}" in line
@@ -0,0 +1,93 @@
+"""Exporting a transcript timeline with 'export-trace'."""
+import datetime
+import json
+
+import pyccsl
+
+START = 1_790_000_000.0
+
+def stamp(seconds):
+    return datetime.datetime.fromtimestamp(seconds, datetime.timezone.utc).isoformat().replace("+00:00", "Z")
+
+def user(uuid, parent, offset, content="go", **extra):
+    return dict({"type": "user", "uuid": uuid, "parentUuid": parent, "timestamp": stamp(START + offset),
+                 "message": {"role": "user", "content": content}}, **extra)
+
+def assistant(uuid, parent, offset, message_id, content=None, **extra):
+    return dict({"type": "assistant", "uuid": uuid, "parentUuid": parent, "timestamp": stamp(START + offset),
+                 "message": {"id": message_id, "model": "claude-sonnet-4-20250514", "role": "assistant",
+                             "content": content or [{"type": "text", "text": "ok"}],
+                             "usage": {"input_tokens": 10, "output_tokens": 20}}}, **extra)
+
+def tool_use(tool_id, name):
+    return [{"type": "tool_use", "id": tool_id, "name": name, "input": {}}]
+
+def tool_result(tool_id):
+    return [{"type": "tool_result", "tool_use_id": tool_id, "content": "ok"}]
+
+def export(entries, tmp_path):
+    path = tmp_path / "t.jsonl"
+    path.write_text("\n".join(json.dumps(entry) for entry in entries) + "\n")
+    out = tmp_path / "trace.json"
+    assert pyccsl.run_export_trace([str(path), "-o", str(out)]) == 0
+    with open(out) as f:
+        return json.load(f)["traceEvents"]
+
+def spans(events, cat):
+    return [event for event in events if event.get("cat") == cat]
+
+def test_turns_and_tools_become_spans(tmp_path):
+    events = export([
+        user("u1", None, 0, sessionId="s1"),
+        assistant("a1", "u1", 2, "m1", tool_use("t1", "Bash")),
+        # A second content block of the same message is part of the same turn
+        assistant("a1b", "a1", 2.1, "m1", [{"type": "text", "text": "more"}]),
+        user("r1", "a1b", 5, tool_result("t1")),
+        assistant("a2", "r1", 6, "m2"),
+    ], tmp_path)
+    names = {event["args"]["name"] for event in events if event["ph"] == "M"}
+    assert names == {"Session s1", "Main: model", "Main: tools"}
+
+    turns = spans(events, "model")
+    assert [(turn["ts"], turn["dur"]) for turn in turns] == [(int(START * 1e6), 2_000_000), (int((START + 5) * 1e6), 1_000_000)]
+    assert turns[0]["args"]["output_tokens"] == 20
+    assert turns[0]["args"]["cost"] > 0
+    tools = spans(events, "tool")
+    assert [(tool["name"], tool["dur"], tool["tid"]) for tool in tools] == [("Bash", 3_000_000, 2)]
+
+def test_turn_without_a_new_input_is_an_instant(tmp_path):
+    events = export([user("u1", None, 0), assistant("a1", "u1", 2, "m1"), assistant("a2", "a1", 4, "m2")], tmp_path)
+    assert [turn["ph"] for turn in spans(events, "model")] == ["X", "i"]
+
+def test_subagents_get_their_own_tracks(tmp_path):
+    events = export([
+        user("u1", None, 0),
+        assistant("a1", "u1", 1, "m1", tool_use("task", "Task")),
+        user("s1", None, 2, isSidechain=True),
+        assistant("s2", "s1", 5, "sm1", isSidechain=True),
+        user("s3", None, 6, isSidechain=True),
+        assistant("s4", "s3", 7, "sm2", isSidechain=True),
+        user("r1", "a1", 8, tool_result("task")),
+    ], tmp_path)
+    names = [event["args"]["name"] for event in events if event["name"] == "thread_name"]
+    assert names == ["Main: model", "Main: tools", "Subagent 1: model", "Subagent 1: tools",
+                     "Subagent 2: model", "Subagent 2: tools"]
+    assert [(turn["tid"], turn["dur"]) for turn in spans(events, "model")] == [(1, 1_000_000), (3, 3_000_000), (5, 1_000_000)]
+    assert [(tool["name"], tool["dur"]) for tool in spans(events, "tool")] == [("Task", 7_000_000)]
+
+def test_many_subagents_with_bounded_tables(tmp_path, monkeypatch):
+    monkeypatch.setattr(pyccsl, "TRACE_TRACK_LIMIT", 4)
+    entries = [user("u1", None, 0), assistant("a1", "u1", 1, "m1")]
+    for n in range(20):
+        entries += [user(f"s{n}", None, 10 + n * 10, isSidechain=True),
+                    assistant(f"sa{n}", f"s{n}", 12 + n * 10, f"sm{n}", isSidechain=True)]
+    entries += [user("u2", "a1", 300), assistant("a2", "u2", 303, "m2")]
+    turns = spans(export(entries, tmp_path), "model")
+    assert len(turns) == 22
+    assert all(turn["ph"] == "X" for turn in turns)
+    assert [turn["dur"] for turn in turns if turn["tid"] == 1] == [1_000_000, 3_000_000]
+    assert sorted(turn["tid"] for turn in turns)[-1] == 1 + 2 * 20
+
+def test_unreadable_transcript_fails(tmp_path, capsys):
+    assert pyccsl.run_export_trace([str(tmp_path / "missing.jsonl")]) == 3
+    assert "Cannot export trace" in capsys.readouterr().err
@@ -0,0 +1,85 @@
+"""Incremental transcript ingestion, streaming quantiles and the sampling estimator."""
+import random
+import time
+
+import pytest
+
+import pyccsl
+
+def test_p2_quantiles_track_exact_percentiles():
+    rng = random.Random(7)
+    values = [rng.lognormvariate(1.0, 0.8) for _ in range(20000)]
+    estimators = {q: pyccsl.p2_new(q) for q in (0.5, 0.95, 0.99)}
+    for value in values:
+        for estimator in estimators.values():
+            pyccsl.p2_add(estimator, value)
+    ordered = sorted(values)
+    for q, estimator in estimators.items():
+        exact = pyccsl.percentile(ordered, q)
+        assert pyccsl.p2_value(estimator) == pytest.approx(exact, rel=0.05)
+
+def test_p2_is_exact_for_the_first_five_values():
+    estimator = pyccsl.p2_new(0.5)
+    for value in (5.0, 1.0, 3.0):
+        pyccsl.p2_add(estimator, value)
+    assert pyccsl.p2_value(estimator) == 3.0
+
+def test_incremental_ingestion_matches_a_full_read(transcript_factory):
+    path = transcript_factory(300)
+    with open(path) as f:
+        lines = f.readlines()
+    with open(path, "w") as f:
+        f.writelines(lines[:400])
+
+    state = pyccsl.update_transcript_state(path)
+    with open(path, "a") as f:
+        # Append in two steps, the first ending mid-line
+        f.write("".join(lines[400:600]) + lines[600][:10])
+    state = pyccsl.update_transcript_state(path, state)
+    with open(path, "a") as f:
+        f.write(lines[600][10:] + "".join(lines[601:]))
+    state = pyccsl.update_transcript_state(path, state)
+
+    full = pyccsl.update_transcript_state(path)
+    assert state["entries"] == full["entries"] == 900
+    assert state["tokens"] == full["tokens"]
+    assert state["cost"] == pytest.approx(full["cost"])
+
+def test_rewritten_transcript_is_read_again(transcript_factory):
+    path = transcript_factory(50, seed=1)
+    state = pyccsl.update_transcript_state(path)
+    path = transcript_factory(50, seed=2)
+    rewritten = pyccsl.update_transcript_state(path, state)
+    assert rewritten["cost"] == pytest.approx(pyccsl.update_transcript_state(path)["cost"])
+
+def test_sampling_estimate_is_close_to_the_exact_totals(transcript_factory):
+    path = transcript_factory(20000)
+    exact = pyccsl.get_transcript_metrics(pyccsl.update_transcript_state(path))
+    estimate = pyccsl.estimate_transcript_metrics(path)
+
+    assert estimate["estimated"] is True
+    assert 0 < estimate["sampled_fraction"] < 0.2
+    assert estimate["session_duration"] == pytest.approx(exact["session_duration"])
+    for key in ("cost", "context_size", "message_count"):
+        assert estimate[key] == pytest.approx(exact[key], rel=0.1)
+    assert abs(estimate["cost"] / exact["cost"] - 1) <= estimate["estimate_error"]
+
+def test_small_transcript_is_sampled_whole(transcript_factory):
+    path = transcript_factory(20)
+    estimate = pyccsl.estimate_transcript_metrics(path)
+    assert estimate["sampled_fraction"] == 1.0
+    assert estimate["cost"] == pytest.approx(pyccsl.update_transcript_state(path)["cost"])
+
+def read_rollup():
+    return pyccsl.read_cache_json(pyccsl.get_cache_path("shared", "usage-rollup.json")) or {"days": {}}
+
+def test_only_the_status_line_publishes_usage(transcript_factory):
+    # Recent usage: older buckets are pruned from the rollup
+    path = transcript_factory(20, start=time.time() - 3600)
+    pyccsl.load_transcript_state(path)
+    assert not read_rollup()["days"]
+
+    pyccsl.provide_transcript({"transcript_path": path})
+    rollup = read_rollup()
+    assert rollup["days"]
+    assert all(len(transcripts) == 1 for transcripts in rollup["days"].values())
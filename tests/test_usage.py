@@ -0,0 +1,90 @@
+"""Cross-session spend-today and window-tokens from the shared usage rollup."""
+import datetime
+import json
+import time
+
+import pytest
+
+import pyccsl
+from conftest import make_transcript_lines
+
+def recent_start():
+    """Start time for a short transcript that lies entirely within today."""
+    now = time.time()
+    midnight = datetime.datetime.combine(datetime.date.today(), datetime.time()).timestamp()
+    return max(now - 300, midnight + 1)
+
+def entry_tokens(lines):
+    total = 0
+    for line in lines:
+        usage = json.loads(line).get("message", {}).get("usage")
+        if usage:
+            total += usage["input_tokens"] + usage["cache_creation_input_tokens"] + usage["output_tokens"]
+    return total
+
+def write_rollup(hours):
+    """Write a rollup holding one session's {hour: tokens} buckets."""
+    rollup = {"days": {}, "hours": {str(hour): {"s1": {"cost": tokens / 1000, "tokens": tokens}}
+                                    for hour, tokens in hours.items()}}
+    pyccsl.write_cache_json(pyccsl.get_cache_path("shared", "usage-rollup.json"), rollup)
+
+def test_spend_today_sums_every_session(tmp_path):
+    start = recent_start()
+    sessions = []
+    for seed in (1, 2):
+        lines = make_transcript_lines(5, seed=seed, start=start)
+        path = tmp_path / f"s{seed}.jsonl"
+        path.write_text("\n".join(lines) + "\n")
+        sessions.append((str(path), lines))
+    costs = [pyccsl.provide_transcript({"transcript_path": path})["cost"] for path, _ in sessions]
+
+    usage = pyccsl.provide_usage({})
+    assert usage["spend_today"] == pytest.approx(sum(costs))
+    assert usage["window_tokens"] == sum(entry_tokens(lines) for _, lines in sessions)
+    assert usage["window_cost"] == pytest.approx(sum(costs))
+    assert 0 < usage["window_remaining"] <= pyccsl.USAGE_WINDOW_HOURS * 3600
+
+def test_republishing_does_not_double_count(tmp_path):
+    start = recent_start()
+    lines = make_transcript_lines(6, start=start)
+    path = tmp_path / "s.jsonl"
+    path.write_text("\n".join(lines[:9]) + "\n")
+    pyccsl.provide_transcript({"transcript_path": str(path)})
+    with open(path, "a") as f:
+        f.write("\n".join(lines[9:]) + "\n")
+    cost = pyccsl.provide_transcript({"transcript_path": str(path)})["cost"]
+    pyccsl.provide_transcript({"transcript_path": str(path)})
+
+    usage = pyccsl.provide_usage({})
+    assert usage["spend_today"] == pytest.approx(cost)
+    assert usage["window_tokens"] == entry_tokens(lines)
+
+def test_window_starts_after_the_previous_window_ended():
+    hour = int(time.time() // 3600)
+    # The window opened at hour - 7 ended at hour - 2; activity at hour - 1 opens the current one
+    write_rollup({hour - 7: 500, hour - 3: 70, hour - 1: 20, hour: 3})
+    usage = pyccsl.provide_usage({})
+    assert usage["window_tokens"] == 23
+    assert usage["window_cost"] == pytest.approx(0.023)
+    assert usage["window_remaining"] == pytest.approx((hour + 4) * 3600 - time.time(), abs=5)
+
+def test_expired_window_reports_nothing():
+    hour = int(time.time() // 3600)
+    write_rollup({hour - 6: 500, hour - 5: 40})
+    usage = pyccsl.provide_usage({})
+    assert usage["window_tokens"] == 0
+    assert usage["window_remaining"] == 0.0
+
+def test_fields_render_from_the_rollup(tmp_path):
+    hour = int(time.time() // 3600)
+    write_rollup({hour: 12_345})
+    today = datetime.datetime.now().strftime("%Y-%m-%d")
+    rollup_path = pyccsl.get_cache_path("shared", "usage-rollup.json")
+    rollup = pyccsl.read_cache_json(rollup_path)
+    rollup["days"][today] = {"s1": {"cost": 1.5, "tokens": 12_345}, "s2": {"cost": 0.25, "tokens": 1}}
+    pyccsl.write_cache_json(rollup_path, rollup)
+
+    config = pyccsl.make_config("spend-today,window-tokens", theme="none", no_emoji=True, numbers="raw")
+    line = pyccsl.render({"session_id": "u1", "cwd": str(tmp_path)}, config)
+    assert "Today: $1.75" in line
+    assert "5h: 12345 (" in line
@@ -0,0 +1,64 @@
+"""File-change detection used by --watch."""
+import os
+import select
+import sys
+import threading
+import time
+
+import pytest
+
+import pyccsl
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is Linux-only")
+def test_inotify_reports_writes_and_renames(tmp_path):
+    fd = pyccsl.open_inotify([str(tmp_path)])
+    assert fd is not None
+    try:
+        (tmp_path / "index.lock").write_text("x")
+        os.replace(tmp_path / "index.lock", tmp_path / "index")
+        ready, _, _ = select.select([fd], [], [], 2)
+        assert ready
+        assert os.read(fd, 4096)
+    finally:
+        os.close(fd)
+
+def test_inotify_without_watchable_directories(tmp_path):
+    assert pyccsl.open_inotify([str(tmp_path / "missing")]) is None
+
+def test_stat_signature_changes_on_append(tmp_path):
+    path = tmp_path / "t.jsonl"
+    path.write_text("a\n")
+    before = pyccsl.stat_signature([str(path), str(tmp_path / "missing")])
+    with open(path, "a") as f:
+        f.write("b\n")
+    after = pyccsl.stat_signature([str(path), str(tmp_path / "missing")])
+    assert before != after
+    assert after[1] is None
+
+def run_watch_until(config, input_data, renders, monkeypatch):
+    """Run run_watch until render_status has been called the given number of times; return the call times."""
+    calls = []
+    real_render = pyccsl.render_status
+
+    def counting_render(config, input_data, **kwargs):
+        calls.append(time.monotonic())
+        if len(calls) > renders:
+            raise KeyboardInterrupt
+        return real_render(config, input_data, **kwargs)
+
+    monkeypatch.setattr(pyccsl, "render_status", counting_render)
+    worker = threading.Thread(target=pyccsl.run_watch, args=(config, input_data), daemon=True)
+    worker.start()
+    worker.join(10)
+    assert not worker.is_alive()
+    return calls
+
+def test_watch_rerenders_time_based_fields_without_file_changes(transcript_factory, tmp_path, monkeypatch):
+    monkeypatch.setattr(pyccsl, "WATCH_TICK", 0.05)
+    config = pyccsl.make_config("cache-ttl,cost", theme="none", watch=True, watch_interval=5.0)
+    input_data = {"session_id": "w1", "transcript_path": transcript_factory(5), "cwd": str(tmp_path)}
+    calls = run_watch_until(config, input_data, 3, monkeypatch)
+    # Well under the 5 s wake-up interval: the renders came from the clock
+    assert calls[-1] - calls[0] < 2.0
+    line_path, _ = pyccsl.get_status_paths(input_data)
+    assert os.path.exists(line_path)